@@ -20,5 +20,101 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from embedding_based.metrics import *
-from embedding_based.utils import *
+"""
+The public names of the submodules below are available from the package
+itself. They are imported on first use, so importing the package is cheap
+and a script only pays for the parts it uses.
+"""
+
+import importlib
+
+# The public names of each submodule, which must match its __all__.
+_EXPORTS = (
+    (
+        "metrics",
+        (
+            "CorpusLevelScore",
+            "EvaluationResult",
+            "RunningScore",
+            "evaluate_all",
+            "average_sentence_level",
+            "average_corpus_level",
+            "extrema_sentence_level",
+            "extrema_corpus_level",
+            "greedy_match_corpus_level",
+            "greedy_match_sentence_level",
+        ),
+    ),
+    (
+        "utils",
+        (
+            "load_corpus_from_file",
+            "iter_corpus_chunks",
+            "evaluate_files",
+            "apply_metric_on_files",
+            "load_word2vec_binary",
+            "corpus_vocabulary",
+            "load_embeddings",
+            "reference_cache_key",
+            "load_reference_cache",
+            "embedding_file_fingerprint",
+            "score_systems",
+            "compare_systems",
+            "format_comparison",
+        ),
+    ),
+    (
+        "batch",
+        (
+            "BatchScores",
+            "ReferenceCache",
+            "SentenceMemo",
+            "METRICS",
+            "pad_corpus",
+            "score_all",
+            "average_scores",
+            "extrema_scores",
+            "greedy_match_scores",
+        ),
+    ),
+    (
+        "store",
+        (
+            "EmbeddingStore",
+            "save_embedding_store",
+            "load_embedding_store",
+            "is_embedding_store",
+        ),
+    ),
+    (
+        "intern",
+        (
+            "OOV_INDEX",
+            "InternedCorpus",
+            "intern_corpus",
+            "gather",
+            "vocabulary_fingerprint",
+        ),
+    ),
+)
+
+_MODULE_OF_NAME = {name: module for module, names in _EXPORTS for name in names}
+
+__all__ = [name for _, names in _EXPORTS for name in names]
+
+
+def __getattr__(name):
+    """
+    Import the submodule defining name and return name from it.
+    """
+    module = _MODULE_OF_NAME.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    # Later lookups find it without coming here.
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
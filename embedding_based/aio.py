@@ -0,0 +1,158 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+An asyncio interface to the sentence-level metrics.
+
+Awaiting a score never blocks the event loop. Concurrent awaits are coalesced
+by a `server.MicroBatcher` into vectorized batches scored on its own thread,
+so a high-concurrency caller gets batched throughput for free.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import asyncio
+
+from embedding_based.batch import METRICS
+from embedding_based.batch import _DEFAULT_DTYPE
+from embedding_based.server import MicroBatcher
+
+__all__ = [
+    "AsyncScorer",
+]
+
+# Defaults are tuned for many callers each awaiting one pair.
+_DEFAULT_MAX_BATCH_SIZE = 256
+_DEFAULT_MAX_WAIT = 0.002
+
+
+class AsyncScorer(object):
+    """
+    Score sentence pairs from coroutines.
+
+    Use it as an async context manager::
+
+        async with AsyncScorer(embeddings) as scorer:
+            score = await scorer.average_sentence_level(hypothesis, reference)
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        max_batch_size=_DEFAULT_MAX_BATCH_SIZE,
+        max_wait=_DEFAULT_MAX_WAIT,
+        dtype=_DEFAULT_DTYPE,
+        n_jobs=1,
+    ):
+        """
+        :param embeddings: a KeyedVectors or an EmbeddingStore.
+        :param max_batch_size: largest number of pairs scored in one batch.
+        :param max_wait: seconds to wait for more pairs after the first one
+            of a batch arrives.
+        :param dtype: the dtype to compute in, see `batch.score_all`.
+        :param n_jobs: number of worker processes, see `batch.score_all`.
+        """
+        self._batcher = MicroBatcher(
+            embeddings,
+            max_batch_size=max_batch_size,
+            max_wait=max_wait,
+            dtype=dtype,
+            n_jobs=n_jobs,
+        )
+
+    @property
+    def stats(self):
+        """
+        The ServerStats of the batches scored so far.
+        """
+        return self._batcher.stats
+
+    def start(self):
+        self._batcher.start()
+        return self
+
+    async def aclose(self):
+        """
+        Score the pending pairs, then stop the scoring thread.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self._batcher.close)
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def score_all(self, hypothesis_corpus, reference_corpus, metrics=METRICS):
+        """
+        Score many pairs at once, see `batch.score_all`.
+
+        :return: an OrderedDict mapping each metric name to a BatchScores.
+        """
+        self.start()
+        return await asyncio.wrap_future(
+            self._batcher.submit(hypothesis_corpus, reference_corpus, metrics)
+        )
+
+    async def score(self, hypothesis_sentence, reference_sentence, metric):
+        """
+        Score one pair by one metric.
+
+        :param hypothesis_sentence: a list of tokens.
+        :param reference_sentence: a list of tokens.
+        :param metric: name of the metric, one of `METRICS`.
+        :return: the sentence-level score.
+        """
+        results = await self.score_all(
+            [hypothesis_sentence], [reference_sentence], [metric]
+        )
+        return results[metric].scores[0]
+
+    async def average_sentence_level(self, hypothesis_sentence, reference_sentence):
+        """
+        Compute Average on sentence level, see `metrics.average_sentence_level`.
+        """
+        return await self.score(hypothesis_sentence, reference_sentence, "average")
+
+    async def extrema_sentence_level(self, hypothesis_sentence, reference_sentence):
+        """
+        Compute Extrema on sentence level, see `metrics.extrema_sentence_level`.
+        Like it, raise ValueError if either sentence is empty.
+        """
+        if not len(hypothesis_sentence) or not len(reference_sentence):
+            raise ValueError("empty vector")
+        return await self.score(hypothesis_sentence, reference_sentence, "extrema")
+
+    async def greedy_match_sentence_level(
+        self, hypothesis_sentence, reference_sentence
+    ):
+        """
+        Compute Greedy Matching on sentence level, see
+        `metrics.greedy_match_sentence_level`. Like it, raise ValueError if
+        either sentence is empty.
+        """
+        if not len(hypothesis_sentence) or not len(reference_sentence):
+            raise ValueError("empty vector")
+        return await self.score(hypothesis_sentence, reference_sentence, "greedy_match")
@@ -0,0 +1,832 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Batched, matrix-based engine for the embedding-based metrics.
+
+A corpus is turned into a padded token-index matrix plus an array of lengths.
+Every score of a block of sentence pairs is then computed with a few vectorized
+NumPy operations instead of one Python call per token.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import numpy as np
+import collections
+import functools
+
+from embedding_based.intern import OOV_INDEX
+from embedding_based.intern import InternedCorpus
+from embedding_based.intern import intern_corpus
+from embedding_based.intern import gather
+from embedding_based.intern import _segment_positions
+from embedding_based.parallel import map_blocks
+from embedding_based.schedule import contiguous_blocks
+from embedding_based.schedule import schedule_pairs
+from embedding_based.timing import StageTimer
+
+__all__ = [
+    "BatchScores",
+    "ReferenceCache",
+    "SentenceMemo",
+    "METRICS",
+    "pad_corpus",
+    "score_all",
+    "average_scores",
+    "extrema_scores",
+    "greedy_match_scores",
+]
+
+_EPSILON = 0.00000000001
+
+# Number of sentence pairs scored together in one block.
+_DEFAULT_BATCH_SIZE = 128
+
+# Dtypes the metrics can be computed in, float32 by default. Embeddings stored
+# in float16 are upcast as they are looked up, so the sums are never done in
+# half precision.
+_COMPUTE_DTYPES = (np.float32, np.float64)
+_DEFAULT_DTYPE = np.float32
+
+# Number of sentences a SentenceMemo keeps by default.
+_DEFAULT_MEMO_SIZE = 100000
+
+BatchScores = collections.namedtuple("BatchScores", ["scores", "skipped"])
+
+
+def pad_corpus(corpus, embeddings):
+    """
+    Turn a corpus into a padded matrix of row indices into the embedding matrix.
+    Both OOV words and padding get `OOV_INDEX`, the lengths tell them apart.
+
+    :param corpus: a list of sentences or an InternedCorpus.
+    :param embeddings: a gensim KeyedVectors.
+    :return: a tuple of (indices, lengths), a 2D and a 1D int ndarray.
+    """
+    return intern_corpus(corpus, embeddings).padded()
+
+
+def _check_dtype(dtype):
+    """
+    Raise ValueError if the metrics cannot be computed in dtype.
+
+    :return: a numpy dtype.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in _COMPUTE_DTYPES:
+        raise ValueError("cannot compute in %s, use float32 or float64" % dtype.name)
+    return dtype
+
+
+def _gather(vectors, indices, dtype=_DEFAULT_DTYPE):
+    """
+    Look up the vectors of an array of indices for computing in dtype.
+    """
+    return gather(vectors, indices, dtype=dtype)
+
+
+def _length_mask(lengths, max_length):
+    """
+    Return a 2D bool mask which is True for real tokens and False for padding.
+    """
+    return np.arange(max_length) < lengths[:, np.newaxis]
+
+
+def _row_norms(x):
+    return np.linalg.norm(x, axis=-1)
+
+
+def _cos_sim_rows(a, b):
+    """
+    Row-wise version of `metrics._cos_sim`: zero in, zero out.
+
+    :param a: ndarray of 2D.
+    :param b: ndarray of 2D.
+    :return: ndarray of 1D.
+    """
+    a_norm = _row_norms(a)
+    b_norm = _row_norms(b)
+    zero = (a_norm < _EPSILON) | (b_norm < _EPSILON)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sim = np.einsum("ij,ij->i", a, b) / a_norm / b_norm
+    return np.where(zero, 0.0, sim)
+
+
+def _normalize_rows(x):
+    """
+    Scale the vectors along the last axis to unit length.
+    Vectors with (nearly) zero norm become all zeros.
+    """
+    norms = _row_norms(x)[..., np.newaxis]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = x / norms
+    return np.where(norms < _EPSILON, 0.0, normalized)
+
+
+def _cos_sim_matrix(a, b):
+    """
+    Return the cosine similarities of all pairs of vectors from a and b.
+    Each side is normalized once, then one (batched) matmul does the rest.
+
+    :param a: ndarray of shape (..., n, vector_size).
+    :param b: ndarray of shape (..., m, vector_size).
+    :return: ndarray of shape (..., n, m).
+    """
+    return np.matmul(_normalize_rows(a), np.swapaxes(_normalize_rows(b), -1, -2))
+
+
+def _extrema_from_bounds(min_values, max_values):
+    """
+    Pick the Extrema value of each dimension: the minimum if its absolute
+    value is larger than the maximum, otherwise the maximum.
+    """
+    return np.where(np.abs(min_values) > max_values, min_values, max_values)
+
+
+def _segment_reduce(ufunc, values, lengths):
+    """
+    Reduce consecutive segments of values with a ufunc, e.g. np.add for
+    segment sums. Empty segments reduce to zeros.
+
+    :param ufunc: a binary ufunc.
+    :param values: ndarray whose first axis is split into segments.
+    :param lengths: the length of each segment.
+    :return: ndarray of shape `(len(lengths),) + values.shape[1:]`.
+    """
+    result = np.zeros((len(lengths),) + values.shape[1:], dtype=values.dtype)
+    nonempty = lengths > 0
+    # Dropping the starts of empty segments keeps each segment of reduceat
+    # ending where the next nonempty one begins.
+    starts = (np.cumsum(lengths) - lengths)[nonempty]
+    if len(starts):
+        result[nonempty] = ufunc.reduceat(values, starts, axis=0)
+    return result
+
+
+def _segment_extrema(vectors, lengths):
+    """
+    Compute the Extrema vector of consecutive segments of vectors.
+    Empty segments have no extrema and get zeros.
+
+    :param vectors: ndarray of shape (total_length, vector_size), the word
+        vectors of all the sentences one after another.
+    :param lengths: the number of words of each sentence.
+    :return: ndarray of shape (len(lengths), vector_size).
+    """
+    return _extrema_from_bounds(
+        _segment_reduce(np.minimum, vectors, lengths),
+        _segment_reduce(np.maximum, vectors, lengths),
+    )
+
+
+def _pad(values, lengths):
+    """
+    Lay out consecutive segments of values as the rows of a zero-padded array.
+
+    :param values: ndarray of shape (total_length, ...).
+    :param lengths: the length of each segment.
+    :return: ndarray of shape `(len(lengths), max_length) + values.shape[1:]`.
+    """
+    max_length = max(1, lengths.max()) if len(lengths) else 1
+    mask = _length_mask(lengths, max_length)
+    padded = np.zeros(mask.shape + values.shape[1:], dtype=values.dtype)
+    padded[mask] = values
+    return padded
+
+
+def _sentence_features(vectors, lengths, metrics):
+    """
+    Reduce a block of sentences to what the metrics need of one side of the
+    sentence pairs. The keys of the result are:
+
+    - lengths: the number of tokens of each sentence.
+    - sum: the sum of the word vectors, for Average.
+    - norm: the norm of all the word vectors, for Extrema.
+    - extrema: the Extrema vector, for Extrema.
+    - normalized: the padded unit word vectors, for Greedy Matching.
+
+    :param vectors: ndarray of shape (total_length, vector_size), the word
+        vectors of all the sentences one after another.
+    :param lengths: the number of tokens of each sentence.
+    :param metrics: names of the metrics.
+    :return: a dict of ndarrays.
+    """
+    features = {"lengths": lengths}
+    if "average" in metrics:
+        features["sum"] = _segment_reduce(np.add, vectors, lengths)
+    if "extrema" in metrics:
+        squares = np.einsum("ij,ij->i", vectors, vectors)
+        features["norm"] = np.sqrt(_segment_reduce(np.add, squares, lengths))
+        features["extrema"] = _segment_extrema(vectors, lengths)
+    if "greedy_match" in metrics:
+        features["normalized"] = _pad(_normalize_rows(vectors), lengths)
+    return features
+
+
+def _average_block(hyp, ref):
+    """
+    Score a block of pairs by Average.
+    A pair is skipped if none of the hypothesis words have embeddings.
+    """
+    skipped = _row_norms(hyp["sum"]) < _EPSILON
+    return _cos_sim_rows(hyp["sum"], ref["sum"]), skipped
+
+
+def _extrema_block(hyp, ref):
+    """
+    Score a block of pairs by Extrema.
+    A pair is skipped if none of the hypothesis words have embeddings.
+    """
+    skipped = hyp["norm"] < _EPSILON
+    return _cos_sim_rows(hyp["extrema"], ref["extrema"]), skipped
+
+
+def _greedy_match_block(hyp, ref):
+    """
+    Score a block of pairs by Greedy Matching.
+    The cosine similarities of all word pairs come from one batched matmul,
+    both directions of the match come from its row and column maxes.
+    """
+    hyp_lengths = hyp["lengths"]
+    ref_lengths = ref["lengths"]
+    sim = np.matmul(hyp["normalized"], np.swapaxes(ref["normalized"], -1, -2))
+    hyp_mask = _length_mask(hyp_lengths, sim.shape[1])
+    ref_mask = _length_mask(ref_lengths, sim.shape[2])
+    hyp_max = np.where(ref_mask[:, np.newaxis, :], sim, -np.inf).max(axis=2)
+    ref_max = np.where(hyp_mask[:, :, np.newaxis], sim, -np.inf).max(axis=1)
+    empty = (hyp_lengths == 0) | (ref_lengths == 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hyp_to_ref = np.where(hyp_mask, hyp_max, 0).sum(axis=1) / hyp_lengths
+        ref_to_hyp = np.where(ref_mask, ref_max, 0).sum(axis=1) / ref_lengths
+    scores = np.where(empty, 0.0, (hyp_to_ref + ref_to_hyp) / 2)
+    return scores, np.zeros(len(scores), dtype=bool)
+
+
+# Block functions of all metrics, by name.
+_BLOCK_FNS = collections.OrderedDict(
+    [
+        ("average", _average_block),
+        ("extrema", _extrema_block),
+        ("greedy_match", _greedy_match_block),
+    ]
+)
+
+METRICS = tuple(_BLOCK_FNS)
+
+
+class SentenceMemo(object):
+    """
+    A bounded LRU memo of the sentence vectors of single sentences, keyed by
+    their tokens. Repeated sentences then cost one dict lookup instead of an
+    embedding lookup and a reduction.
+
+    A memo is only valid for the embeddings it was filled from. Entries for
+    Greedy Matching hold every token vector of the sentence, so size the memo
+    with that in mind.
+    """
+
+    def __init__(self, max_size=_DEFAULT_MEMO_SIZE):
+        """
+        :param max_size: the most sentences to keep. The least recently used
+            ones are dropped beyond it.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, names):
+        """
+        Return the entry of key if it has all the arrays of names, else None.
+        """
+        entry = self._entries.get(key)
+        if entry is None or not all(name in entry for name in names):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Return the hit and miss counters and the current size.
+        """
+        lookups = self.hits + self.misses
+        return collections.OrderedDict(
+            [
+                ("hits", self.hits),
+                ("misses", self.misses),
+                ("hit_rate", self.hits / lookups if lookups else 0.0),
+                ("size", len(self)),
+            ]
+        )
+
+
+class ReferenceCache(object):
+    """
+    Sentence vectors of a reference corpus, computed once and reused.
+    Pass it in place of the reference corpus to score several hypothesis
+    corpora against the same references; only the hypothesis side is
+    recomputed then.
+    """
+
+    # Arrays making up a cache, see `_sentence_features`. Token vectors for
+    # Greedy Matching are kept unpadded, one row per token.
+    _ARRAYS = ("lengths", "sum", "average", "norm", "extrema", "tokens")
+
+    def __init__(self, metrics, **arrays):
+        """
+        Use `ReferenceCache.build` or `ReferenceCache.load` instead.
+        """
+        self.metrics = tuple(metrics)
+        self.arrays = arrays
+        self.offsets = np.concatenate([[0], np.cumsum(arrays["lengths"])])
+
+    # Arrays of a ReferenceCache needed by each metric.
+    _METRIC_ARRAYS = {
+        "average": ("sum", "average"),
+        "extrema": ("norm", "extrema"),
+        "greedy_match": ("tokens",),
+    }
+
+    def __len__(self):
+        return len(self.arrays["lengths"])
+
+    @classmethod
+    def build(
+        cls,
+        reference_corpus,
+        embeddings,
+        metrics=METRICS,
+        batch_size=_DEFAULT_BATCH_SIZE,
+        dtype=_DEFAULT_DTYPE,
+        memo=None,
+    ):
+        """
+        Compute the sentence vectors of a reference corpus.
+
+        :param reference_corpus: a list of sentences or an InternedCorpus.
+        :param embeddings: a gensim KeyedVectors.
+        :param metrics: names of the metrics to cache for. Greedy Matching
+            keeps every token vector, so leave it out if it is not needed.
+        :param batch_size: number of sentences processed together.
+        :param dtype: the dtype the vectors are computed and kept in.
+        :param memo: a SentenceMemo. If given, sentences found in it are not
+            computed again, and the others are added to it. The corpus must
+            be a list of sentences then.
+        :return: a ReferenceCache.
+        """
+        metrics = _check_metrics(metrics)
+        dtype = _check_dtype(dtype)
+        if memo is not None and len(reference_corpus):
+            return cls._build_memoized(
+                reference_corpus, embeddings, metrics, batch_size, dtype, memo
+            )
+        reference_corpus = intern_corpus(reference_corpus, embeddings)
+        parts = collections.defaultdict(list)
+        # An empty corpus still makes one (empty) block, so that every array
+        # gets its proper shape.
+        for start in range(0, max(1, len(reference_corpus)), batch_size):
+            block = reference_corpus[start : start + batch_size]
+            vectors = _gather(embeddings.vectors, block.indices, dtype)
+            features = _sentence_features(vectors, block.lengths, metrics)
+            if "normalized" in features:
+                del features["normalized"]
+                features["tokens"] = _normalize_rows(vectors)
+            if "sum" in features:
+                features["average"] = _normalize_rows(features["sum"])
+            for key, value in features.items():
+                parts[key].append(value)
+        return cls(
+            metrics, **{key: np.concatenate(values) for key, values in parts.items()}
+        )
+
+    @classmethod
+    def _build_memoized(cls, corpus, embeddings, metrics, batch_size, dtype, memo):
+        """
+        `ReferenceCache.build` with a SentenceMemo. The missing sentences are
+        computed together, each only once however often it repeats.
+        """
+        if isinstance(corpus, InternedCorpus):
+            raise ValueError("a SentenceMemo needs the tokens of the sentences")
+        names = [name for metric in metrics for name in cls._METRIC_ARRAYS[metric]]
+        entries = [None] * len(corpus)
+        missing = collections.OrderedDict()
+        dtype_name = dtype.name
+        for i, sentence in enumerate(corpus):
+            key = (dtype_name, tuple(sentence))
+            if key in missing:
+                # Computed along with its first occurrence.
+                missing[key].append(i)
+                memo.hits += 1
+                continue
+            entries[i] = memo.get(key, names)
+            if entries[i] is None:
+                missing[key] = [i]
+
+        if missing:
+            computed = cls.build(
+                [list(key[1]) for key in missing],
+                embeddings,
+                metrics,
+                batch_size,
+                dtype,
+            )
+            for j, (key, positions) in enumerate(missing.items()):
+                entry = computed._sentence(j)
+                memo.put(key, entry)
+                for i in positions:
+                    entries[i] = entry
+
+        arrays = {"lengths": np.array([entry["lengths"] for entry in entries])}
+        for name in names:
+            if name == "tokens":
+                arrays[name] = np.concatenate([entry[name] for entry in entries])
+            else:
+                arrays[name] = np.stack([entry[name] for entry in entries])
+        return cls(metrics, **arrays)
+
+    def _sentence(self, i):
+        """
+        Return the arrays of the i-th sentence as a dict, copied out of the
+        arrays of the whole corpus.
+        """
+        entry = {
+            name: np.copy(self.arrays[name][i])
+            for name in self.arrays
+            if name != "tokens"
+        }
+        if "tokens" in self.arrays:
+            entry["tokens"] = np.copy(
+                self.arrays["tokens"][self.offsets[i] : self.offsets[i + 1]]
+            )
+        return entry
+
+    def features(self, start, stop, metrics):
+        """
+        Return the features of sentences [start, stop) as `_sentence_features` does.
+        """
+        return self._features(
+            slice(start, stop), slice(self.offsets[start], self.offsets[stop]), metrics
+        )
+
+    def take_features(self, rows, metrics):
+        """
+        Return the features of the sentences rows, in that order.
+
+        :param rows: a 1D int ndarray.
+        """
+        return self._features(rows, _segment_positions(self.offsets, rows), metrics)
+
+    def _features(self, rows, token_rows, metrics):
+        missing = set(metrics) - set(self.metrics)
+        if missing:
+            raise ValueError("metrics %r are not cached" % sorted(missing))
+        lengths = self.arrays["lengths"][rows]
+        features = {"lengths": lengths}
+        if "average" in metrics:
+            features["sum"] = self.arrays["sum"][rows]
+        if "extrema" in metrics:
+            features["norm"] = self.arrays["norm"][rows]
+            features["extrema"] = self.arrays["extrema"][rows]
+        if "greedy_match" in metrics:
+            features["normalized"] = _pad(self.arrays["tokens"][token_rows], lengths)
+        return features
+
+    def save(self, path):
+        """
+        Save the cache to a .npz file.
+
+        :param path: a path-like object.
+        """
+        np.savez(path, metrics=np.array(self.metrics), **self.arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a cache saved by `ReferenceCache.save`.
+
+        :param path: a path-like object.
+        :return: a ReferenceCache.
+        """
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in cls._ARRAYS if key in data.files}
+            return cls(data["metrics"].tolist(), **arrays)
+
+
+def _check_metrics(metrics):
+    """
+    Raise ValueError on unknown metric names.
+
+    :return: the metric names as a list.
+    """
+    metrics = list(metrics)
+    for name in metrics:
+        if name not in _BLOCK_FNS:
+            raise ValueError("unknown metric %r" % name)
+    return metrics
+
+
+def _corpus_lengths(corpus):
+    """
+    Return the number of tokens of each sentence of a list of sentences, an
+    InternedCorpus or a ReferenceCache.
+    """
+    if isinstance(corpus, ReferenceCache):
+        return corpus.arrays["lengths"]
+    if isinstance(corpus, InternedCorpus):
+        return corpus.lengths
+    return np.array([len(sentence) for sentence in corpus], dtype=np.int64)
+
+
+def _count_tokens(timer, corpus, size):
+    """
+    Count the tokens of the first size sentences of a corpus in timer, and
+    those looked up and OOV if it is an InternedCorpus.
+    """
+    timer.count("tokens", _corpus_lengths(corpus)[:size].sum())
+    if isinstance(corpus, InternedCorpus):
+        indices = corpus.indices[: corpus.offsets[size]]
+        timer.count("looked_up_tokens", len(indices))
+        timer.count("oov_tokens", np.count_nonzero(indices == OOV_INDEX))
+
+
+def _take(corpus, rows):
+    """
+    Return the sentences of a list of sentences or an InternedCorpus selected
+    by rows, a slice or an int ndarray, as the same kind of corpus.
+    """
+    if isinstance(rows, slice):
+        return corpus[rows]
+    if isinstance(corpus, InternedCorpus):
+        return corpus.take(rows)
+    return [corpus[i] for i in rows]
+
+
+def _score_block(vectors, block, metrics, dtype=_DEFAULT_DTYPE):
+    """
+    Score one block of sentence pairs by several metrics.
+
+    :param vectors: the 2D embedding matrix.
+    :param block: a tuple of (hyp, ref). Each is either a tuple of (indices,
+        lengths) of the interned sentences, or their features taken from a
+        ReferenceCache.
+    :param metrics: names of the metrics.
+    :param dtype: the dtype to compute in.
+    :return: a list of (scores, skipped), one for each metric.
+    """
+    hyp, ref = block
+    if not isinstance(hyp, dict):
+        hyp = _sentence_features(_gather(vectors, hyp[0], dtype), hyp[1], metrics)
+    if not isinstance(ref, dict):
+        ref = _sentence_features(_gather(vectors, ref[0], dtype), ref[1], metrics)
+    return [_BLOCK_FNS[name](hyp, ref) for name in metrics]
+
+
+def score_all(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    metrics=METRICS,
+    batch_size=_DEFAULT_BATCH_SIZE,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+    timer=None,
+):
+    """
+    Score a corpus by several metrics at once.
+    Each block of sentences is looked up in the embeddings only once
+    and shared by all the metrics.
+
+    :param hypothesis_corpus: a list of sentences or an InternedCorpus.
+    :param reference_corpus: a list of sentences, an InternedCorpus or
+        a ReferenceCache.
+    :param embeddings: a gensim KeyedVectors.
+    :param metrics: names of the metrics, a subset of `METRICS`.
+    :param batch_size: number of sentence pairs in a block.
+    :param n_jobs: number of worker processes the blocks are spread over.
+        None or a negative value means using all the CPUs. The scores do
+        not depend on it. A `parallel.Workers` of embeddings.vectors runs the
+        blocks in its pool instead of a pool started for this call only.
+    :param dtype: the dtype to compute in, float32 or float64. Scores in
+        float32 are within 1e-6 of those in float64, see the README.
+    :param memo: a SentenceMemo. If given, the sentence vectors of each block
+        are looked up in it before being computed, in this process. Both
+        corpora must be lists of sentences then, or a ReferenceCache for the
+        references.
+    :param memory_budget: if given, the pairs are grouped into blocks of
+        similar lengths whose working memory fits in this many bytes, see
+        `schedule.schedule_pairs`, instead of blocks of batch_size pairs in
+        corpus order. This saves the padding of Greedy Matching when the
+        lengths vary widely. The scores are the same either way.
+    :param timer: a StageTimer to record the stages and counters listed in
+        `timing` in. The stages are timed in this process, so with n_jobs
+        the math of all the workers is one stage. With a memo, the sentences
+        are looked up block by block, along with the math, and their OOV
+        words are not counted.
+    :return: an OrderedDict mapping each metric name to a BatchScores.
+    """
+    metrics = _check_metrics(metrics)
+    dtype = _check_dtype(dtype)
+    timer = StageTimer() if timer is None else timer
+    with timer.stage("lookup"):
+        if memo is None:
+            hypothesis_corpus = intern_corpus(hypothesis_corpus, embeddings)
+        if memo is None and not isinstance(reference_corpus, ReferenceCache):
+            reference_corpus = intern_corpus(reference_corpus, embeddings)
+    size = min(len(hypothesis_corpus), len(reference_corpus))
+    timer.count("pairs", size)
+    _count_tokens(timer, hypothesis_corpus, size)
+    _count_tokens(timer, reference_corpus, size)
+    if memory_budget is None:
+        rows = contiguous_blocks(size, batch_size)
+    else:
+        rows = schedule_pairs(
+            _corpus_lengths(hypothesis_corpus)[:size],
+            _corpus_lengths(reference_corpus)[:size],
+            memory_budget,
+            embeddings.vectors.shape[1],
+            dtype.itemsize,
+        ).blocks
+
+    def corpus_block(corpus, block_rows):
+        if isinstance(corpus, ReferenceCache):
+            if isinstance(block_rows, slice):
+                return corpus.features(block_rows.start, block_rows.stop, metrics)
+            return corpus.take_features(block_rows, metrics)
+        block = _take(corpus, block_rows)
+        if memo is not None:
+            cache = ReferenceCache.build(
+                block, embeddings, metrics, batch_size, dtype, memo
+            )
+            return cache.features(0, len(block), metrics)
+        return block.indices, block.lengths
+
+    blocks = (
+        (
+            corpus_block(hypothesis_corpus, block_rows),
+            corpus_block(reference_corpus, block_rows),
+        )
+        for block_rows in rows
+    )
+    results = collections.OrderedDict(
+        (name, BatchScores(scores=np.zeros(size), skipped=np.zeros(size, dtype=bool)))
+        for name in metrics
+    )
+
+    with timer.stage("math"):
+        block_results = map_blocks(
+            functools.partial(_score_block, metrics=metrics, dtype=dtype),
+            embeddings.vectors,
+            blocks,
+            n_jobs,
+        )
+        for block_rows, block_result in zip(rows, block_results):
+            for result, (scores, skipped) in zip(results.values(), block_result):
+                result.scores[block_rows] = scores
+                result.skipped[block_rows] = skipped
+
+    for name, result in results.items():
+        timer.count("skipped_pairs." + name, np.count_nonzero(result.skipped))
+    return results
+
+
+def average_scores(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    batch_size=_DEFAULT_BATCH_SIZE,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+):
+    """
+    Compute Average of every sentence pair of two corpora.
+
+    :param hypothesis_corpus: a list of sentences.
+    :param reference_corpus: a list of sentences.
+    :param embeddings: a gensim KeyedVectors.
+    :param batch_size: number of sentence pairs scored together.
+    :param n_jobs: number of worker processes, see `score_all`.
+    :param dtype: the dtype to compute in, see `score_all`.
+    :param memo: a SentenceMemo, see `score_all`.
+    :param memory_budget: see `score_all`.
+    :return: a BatchScores.
+    """
+    return score_all(
+        hypothesis_corpus,
+        reference_corpus,
+        embeddings,
+        ["average"],
+        batch_size,
+        n_jobs,
+        dtype,
+        memo,
+        memory_budget=memory_budget,
+    )["average"]
+
+
+def extrema_scores(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    batch_size=_DEFAULT_BATCH_SIZE,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+):
+    """
+    Compute Extrema of every sentence pair of two corpora.
+
+    :param hypothesis_corpus: a list of sentences.
+    :param reference_corpus: a list of sentences.
+    :param embeddings: a gensim KeyedVectors.
+    :param batch_size: number of sentence pairs scored together.
+    :param n_jobs: number of worker processes, see `score_all`.
+    :param dtype: the dtype to compute in, see `score_all`.
+    :param memo: a SentenceMemo, see `score_all`.
+    :param memory_budget: see `score_all`.
+    :return: a BatchScores.
+    """
+    return score_all(
+        hypothesis_corpus,
+        reference_corpus,
+        embeddings,
+        ["extrema"],
+        batch_size,
+        n_jobs,
+        dtype,
+        memo,
+        memory_budget=memory_budget,
+    )["extrema"]
+
+
+def greedy_match_scores(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    batch_size=_DEFAULT_BATCH_SIZE,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+):
+    """
+    Compute Greedy Matching of every sentence pair of two corpora.
+
+    :param hypothesis_corpus: a list of sentences.
+    :param reference_corpus: a list of sentences.
+    :param embeddings: a gensim KeyedVectors.
+    :param batch_size: number of sentence pairs scored together.
+    :param n_jobs: number of worker processes, see `score_all`.
+    :param dtype: the dtype to compute in, see `score_all`.
+    :param memo: a SentenceMemo, see `score_all`.
+    :param memory_budget: see `score_all`.
+    :return: a BatchScores.
+    """
+    return score_all(
+        hypothesis_corpus,
+        reference_corpus,
+        embeddings,
+        ["greedy_match"],
+        batch_size,
+        n_jobs,
+        dtype,
+        memo,
+        memory_budget=memory_budget,
+    )["greedy_match"]
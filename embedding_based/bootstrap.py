@@ -0,0 +1,240 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Bootstrap confidence intervals and paired significance tests of
+sentence-level scores.
+
+The scores are resampled with replacement, many resamples at a time from
+one matrix of random indices, so thousands of resamples cost a few NumPy
+operations and nothing is embedded again.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import collections
+
+import numpy as np
+
+__all__ = [
+    "BootstrapInterval",
+    "PairedBootstrap",
+    "bootstrap_means",
+    "bootstrap_interval",
+    "paired_bootstrap",
+    "bootstrap_systems",
+    "format_bootstrap",
+]
+
+_DEFAULT_RESAMPLES = 1000
+_DEFAULT_CONFIDENCE = 0.95
+
+# The largest number of indices drawn at once, so that the index matrix of
+# a large corpus stays within about 128 MB.
+_MAX_INDICES = 1 << 24
+
+# The percentile interval of the mean of the scores.
+BootstrapInterval = collections.namedtuple(
+    "BootstrapInterval", ["mean", "low", "high", "standard_error"]
+)
+
+# The mean difference of two systems scored on the same pairs, its
+# percentile interval and the two-sided p-value of no difference.
+PairedBootstrap = collections.namedtuple(
+    "PairedBootstrap", ["difference", "low", "high", "p_value"]
+)
+
+
+def bootstrap_means(scores, resamples=_DEFAULT_RESAMPLES, seed=0):
+    """
+    Return the means of resamples of scores drawn with replacement.
+
+    :param scores: a 1D array of float, or a 2D array of shape
+        (systems, size) whose rows are resampled with the same indices.
+    :param resamples: number of resamples.
+    :param seed: seed of the resampling.
+    :return: ndarray of shape (resamples,), or (systems, resamples).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    size = scores.shape[-1]
+    if not size:
+        raise ValueError("cannot bootstrap an empty sample")
+    rng = np.random.RandomState(seed)
+    chunk = max(1, _MAX_INDICES // size)
+    means = []
+    for start in range(0, resamples, chunk):
+        indices = rng.randint(0, size, (min(chunk, resamples - start), size))
+        means.append(scores[..., indices].mean(axis=-1))
+    return np.concatenate(means, axis=-1)
+
+
+def _percentiles(means, confidence):
+    alpha = (1.0 - confidence) / 2
+    low, high = np.percentile(means, [100 * alpha, 100 * (1 - alpha)], axis=-1)
+    return low, high
+
+
+def bootstrap_interval(
+    scores, resamples=_DEFAULT_RESAMPLES, confidence=_DEFAULT_CONFIDENCE, seed=0
+):
+    """
+    Compute the percentile bootstrap interval of the mean of scores.
+
+    :param scores: a 1D array of float, e.g. the unskipped sentence-level
+        scores of a corpus.
+    :param resamples: number of resamples.
+    :param confidence: the probability covered by the interval.
+    :param seed: seed of the resampling.
+    :return: a BootstrapInterval.
+    """
+    means = bootstrap_means(scores, resamples, seed)
+    low, high = _percentiles(means, confidence)
+    return BootstrapInterval(
+        mean=float(np.mean(scores)),
+        low=float(low),
+        high=float(high),
+        standard_error=float(np.std(means)),
+    )
+
+
+def paired_bootstrap(
+    scores,
+    baseline_scores,
+    resamples=_DEFAULT_RESAMPLES,
+    confidence=_DEFAULT_CONFIDENCE,
+    seed=0,
+):
+    """
+    Compare two systems scored on the same sentence pairs by the paired
+    bootstrap: the pairs are resampled and both systems keep their scores on
+    each resampled pair.
+
+    The p-value is twice the fraction of resamples on the far side of zero,
+    counted as in a Monte Carlo test so that it is never below
+    2 / (resamples + 1), and capped at 1.
+
+    :param scores: a 1D array of float, the scores of the system.
+    :param baseline_scores: a 1D array of float of the same length, the
+        scores of the baseline on the same pairs.
+    :param resamples: number of resamples.
+    :param confidence: the probability covered by the interval.
+    :param seed: seed of the resampling.
+    :return: a PairedBootstrap of the system minus the baseline.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    baseline_scores = np.asarray(baseline_scores, dtype=np.float64)
+    if scores.shape != baseline_scores.shape:
+        raise ValueError(
+            "systems scored on different pairs: %r and %r"
+            % (scores.shape, baseline_scores.shape)
+        )
+    differences = bootstrap_means(scores - baseline_scores, resamples, seed)
+    low, high = _percentiles(differences, confidence)
+    tail = (min(np.sum(differences <= 0), np.sum(differences >= 0)) + 1) / (
+        len(differences) + 1
+    )
+    return PairedBootstrap(
+        difference=float(np.mean(scores - baseline_scores)),
+        low=float(low),
+        high=float(high),
+        p_value=float(min(1.0, 2 * tail)),
+    )
+
+
+def bootstrap_systems(
+    system_scores,
+    baseline=None,
+    resamples=_DEFAULT_RESAMPLES,
+    confidence=_DEFAULT_CONFIDENCE,
+    seed=0,
+):
+    """
+    Bootstrap the scores of several systems, each against a baseline.
+
+    Pairs skipped for a system (see `batch.BatchScores`) are left out of its
+    interval, and of its comparison with the baseline if skipped for either.
+    All systems and metrics are resampled with the same seed.
+
+    :param system_scores: an OrderedDict mapping each system name to an
+        OrderedDict, which maps each metric name to a BatchScores, as
+        returned by `utils.score_systems`.
+    :param baseline: the name of the baseline system, the first by default.
+    :param resamples: number of resamples.
+    :param confidence: the probability covered by the intervals.
+    :param seed: seed of the resampling.
+    :return: an OrderedDict mapping each system name to an OrderedDict, which
+        maps each metric name to a tuple of (BootstrapInterval,
+        PairedBootstrap), the latter None for the baseline.
+    """
+    if baseline is None:
+        baseline = next(iter(system_scores))
+    results = collections.OrderedDict()
+    for name, metric_scores in system_scores.items():
+        results[name] = collections.OrderedDict()
+        for metric, batch_scores in metric_scores.items():
+            interval = bootstrap_interval(
+                batch_scores.scores[~batch_scores.skipped], resamples, confidence, seed
+            )
+            paired = None
+            if name != baseline:
+                baseline_scores = system_scores[baseline][metric]
+                kept = ~(batch_scores.skipped | baseline_scores.skipped)
+                paired = paired_bootstrap(
+                    batch_scores.scores[kept],
+                    baseline_scores.scores[kept],
+                    resamples,
+                    confidence,
+                    seed,
+                )
+            results[name][metric] = interval, paired
+    return results
+
+
+def format_bootstrap(results):
+    """
+    Format the result of `bootstrap_systems` as a table, one row per system
+    and one column per metric. Each cell is the mean and its interval, then
+    for the systems other than the baseline, the difference from the baseline
+    and its p-value.
+
+    :param results: what `bootstrap_systems` returns.
+    :return: a string.
+    """
+    metrics = list(next(iter(results.values()), {}))
+    rows = [["system"] + metrics]
+    for name, cells in results.items():
+        row = [name]
+        for metric in metrics:
+            interval, paired = cells[metric]
+            cell = "%.4f [%.4f, %.4f]" % (interval.mean, interval.low, interval.high)
+            if paired is not None:
+                cell += " %+.4f p=%.3f" % (paired.difference, paired.p_value)
+            row.append(cell)
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
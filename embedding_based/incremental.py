@@ -0,0 +1,303 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Incremental scoring of two files that only grow, such as logs that new
+sentence pairs are appended to.
+
+A checkpoint keeps how far each file has been read, as a byte offset, and
+the running statistics behind each corpus-level score. A later run reads
+the files from there, scores only the appended pairs and merges them in,
+so its work is proportional to what was appended rather than to the whole
+files. Sentence-level scores are appended to their score files.
+
+A line is only scored once it ends with a newline, so a line still being
+written is left for the next run.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import collections
+import io
+import json
+import os
+
+from embedding_based.batch import METRICS
+from embedding_based.batch import _DEFAULT_DTYPE
+from embedding_based.batch import _check_dtype
+from embedding_based.batch import _check_metrics
+from embedding_based.metrics import RunningScore
+from embedding_based.parallel import open_workers
+from embedding_based.timing import StageTimer
+from embedding_based.utils import _DEFAULT_CHUNK_SIZE
+from embedding_based.utils import _score_chunk
+
+__all__ = [
+    "read_checkpoint",
+    "iter_appended_chunks",
+    "evaluate_appended",
+]
+
+_CHECKPOINT_VERSION = 1
+
+
+def read_checkpoint(path):
+    """
+    Read a checkpoint written by `evaluate_appended`.
+
+    :param path: a path-like object.
+    :return: a dict, or None if there is no checkpoint at path.
+    """
+    if not os.path.exists(path):
+        return None
+    with io.open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("version") != _CHECKPOINT_VERSION:
+        raise ValueError(
+            "%r is not a checkpoint of version %d" % (path, _CHECKPOINT_VERSION)
+        )
+    return checkpoint
+
+
+def _write_checkpoint(path, checkpoint):
+    """
+    Replace the checkpoint at path in one step, so that a crash leaves
+    either the old or the new one.
+    """
+    tmp_path = "%s.tmp" % path
+    with io.open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(checkpoint, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def iter_appended_chunks(
+    hypothesis_file, reference_file, offsets=(0, 0), chunk_size=_DEFAULT_CHUNK_SIZE
+):
+    """
+    Stream the pairs of complete lines of two files from byte offsets on.
+    Reading stops at the first line of either file not yet ended by a
+    newline.
+    :param hypothesis_file: a path-like object.
+    :param reference_file: a path-like object.
+    :param offsets: where to start reading each file, in bytes.
+    :param chunk_size: number of sentence pairs in a chunk.
+    :return: a generator of (hypothesis_chunk, reference_chunk, offsets),
+        two lists of sentences and the offsets just past them.
+    """
+    hypothesis_offset, reference_offset = offsets
+    with io.open(hypothesis_file, "rb") as hypothesis, io.open(
+        reference_file, "rb"
+    ) as reference:
+        for f, offset in (
+            (hypothesis, hypothesis_offset),
+            (reference, reference_offset),
+        ):
+            size = os.fstat(f.fileno()).st_size
+            if size < offset:
+                raise ValueError(
+                    "%r is shorter than its checkpoint; it was truncated or "
+                    "rewritten, remove the checkpoint to score it again" % f.name
+                )
+            f.seek(offset)
+        done = False
+        while not done:
+            hypothesis_chunk, reference_chunk = [], []
+            while len(hypothesis_chunk) < chunk_size:
+                h = hypothesis.readline()
+                r = reference.readline()
+                if not h.endswith(b"\n") or not r.endswith(b"\n"):
+                    done = True
+                    break
+                hypothesis_offset += len(h)
+                reference_offset += len(r)
+                hypothesis_chunk.append(h.decode("utf-8").split())
+                reference_chunk.append(r.decode("utf-8").split())
+            if hypothesis_chunk:
+                yield hypothesis_chunk, reference_chunk, (
+                    hypothesis_offset,
+                    reference_offset,
+                )
+
+
+def _checkpoint_config(hypothesis_file, reference_file, metrics, dtype, fingerprint):
+    """
+    Return what a checkpoint is only valid for, as a dict for JSON.
+    """
+    return {
+        "hypothesis_file": os.path.abspath(hypothesis_file),
+        "reference_file": os.path.abspath(reference_file),
+        "metrics": list(metrics),
+        "dtype": dtype.name,
+        "embeddings": fingerprint,
+    }
+
+
+def _truncate(path, size):
+    """
+    Cut a score file back to size bytes, dropping the scores of a run that
+    stopped before its checkpoint was written.
+    """
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with io.open(path, "r+b") as f:
+            f.truncate(size)
+
+
+def evaluate_appended(
+    hypothesis_file,
+    reference_file,
+    embeddings,
+    checkpoint,
+    metrics=METRICS,
+    chunk_size=_DEFAULT_CHUNK_SIZE,
+    score_files=None,
+    fingerprint=None,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    score_cache=None,
+    memo=None,
+    memory_budget=None,
+    timer=None,
+    partial=False,
+):
+    """
+    Like `utils.evaluate_files`, but only score the pairs appended to the
+    files since the last call with the same checkpoint, and merge them into
+    the statistics kept there. The first call, without a checkpoint file,
+    scores the files from the start.
+
+    The checkpoint is rewritten after every chunk. If a run stops half way,
+    the next one resumes from the last chunk checkpointed, and the scores
+    written past it are dropped from the score files first.
+
+    :param hypothesis_file: a path-like object.
+    :param reference_file: a path-like object.
+    :param embeddings: a KeyedVectors.
+    :param checkpoint: path of the checkpoint, a JSON file.
+    :param metrics: names of the metrics, see `evaluate_all`.
+    :param chunk_size: number of sentence pairs in a chunk.
+    :param score_files: if given, a dict mapping some metric names to paths.
+        Sentence-level scores of these metrics are appended there, one per
+        line, so each holds the scores of all the pairs checkpointed.
+    :param fingerprint: a string identifying the embeddings, such as
+        `utils.embedding_file_fingerprint`. A checkpoint is only resumed with
+        the same embeddings, metrics and dtype.
+    :param n_jobs: number of worker processes, see `batch.score_all`.
+        The pool is started once and shared by all the chunks.
+    :param dtype: the dtype to compute in, see `batch.score_all`.
+    :param score_cache: a ScoreCache to look the scores up in first.
+    :param memo: a SentenceMemo, which is kept across chunks.
+    :param memory_budget: the working memory of a block in bytes, to
+        group the pairs by length, see `batch.score_all`.
+    :param timer: a StageTimer, see `utils.evaluate_files`.
+    :param partial: if True, return the RunningScore of each metric, see
+        `utils.evaluate_files`.
+    :return: an OrderedDict mapping each metric name to a CorpusLevelScore
+        of all the pairs checkpointed.
+    """
+    metrics = _check_metrics(metrics)
+    dtype = _check_dtype(dtype)
+    score_files = score_files or {}
+    timer = StageTimer() if timer is None else timer
+    config = _checkpoint_config(
+        hypothesis_file,
+        reference_file,
+        metrics,
+        dtype,
+        fingerprint,
+    )
+    state = read_checkpoint(checkpoint)
+    if state is None:
+        state = {
+            "version": _CHECKPOINT_VERSION,
+            "config": config,
+            "offsets": [0, 0],
+            "pairs": 0,
+            "running": {name: RunningScore().state() for name in metrics},
+            "score_files": {name: 0 for name in score_files},
+        }
+    elif state["config"] != config:
+        raise ValueError(
+            "checkpoint %r was written for other files, embeddings or options; "
+            "remove it to score from the start" % checkpoint
+        )
+    if set(score_files) != set(state["score_files"]):
+        raise ValueError(
+            "checkpoint %r was written with score files of %s"
+            % (checkpoint, sorted(state["score_files"]))
+        )
+
+    running = collections.OrderedDict(
+        (name, RunningScore.from_state(state["running"][name])) for name in metrics
+    )
+    for name, path in score_files.items():
+        _truncate(path, state["score_files"][name])
+    outputs = {name: io.open(path, "a") for name, path in score_files.items()}
+    chunks = iter_appended_chunks(
+        hypothesis_file, reference_file, state["offsets"], chunk_size
+    )
+    try:
+        with open_workers(embeddings.vectors, n_jobs) as workers:
+            while True:
+                with timer.stage("load corpora"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                hypothesis_chunk, reference_chunk, offsets = chunk
+                _score_chunk(
+                    (hypothesis_chunk, reference_chunk),
+                    embeddings,
+                    metrics,
+                    running,
+                    outputs,
+                    timer,
+                    score_cache=score_cache,
+                    n_jobs=workers,
+                    dtype=dtype,
+                    memo=memo,
+                    memory_budget=memory_budget,
+                )
+                for output in outputs.values():
+                    output.flush()
+                state["offsets"] = list(offsets)
+                state["pairs"] += len(hypothesis_chunk)
+                state["running"] = {
+                    name: stats.state() for name, stats in running.items()
+                }
+                state["score_files"] = {
+                    name: os.fstat(output.fileno()).st_size
+                    for name, output in outputs.items()
+                }
+                _write_checkpoint(checkpoint, state)
+    finally:
+        for output in outputs.values():
+            output.close()
+    if not os.path.exists(checkpoint):
+        # Nothing to score yet; remember the options all the same.
+        _write_checkpoint(checkpoint, state)
+    if partial:
+        return running
+    return collections.OrderedDict(
+        (name, stats.corpus_score()) for name, stats in running.items()
+    )
@@ -0,0 +1,259 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Interning of tokenized corpora into arrays of row indices.
+
+A corpus is looked up in the embeddings once and kept as one flat int32
+array plus sentence offsets. OOV words get the reserved index `OOV_INDEX`,
+which `gather` maps to a shared zero row, so every metric can fetch the
+vectors of many sentences with a single fancy-indexing call.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import hashlib
+
+import numpy as np
+
+__all__ = [
+    "OOV_INDEX",
+    "InternedCorpus",
+    "intern_corpus",
+    "gather",
+    "vocabulary_fingerprint",
+]
+
+# Index of words that have no embedding.
+OOV_INDEX = -1
+
+
+def _get_index_fn(embeddings):
+    """
+    Return a function that maps a word to its row in the embedding matrix.
+
+    :param embeddings: a gensim KeyedVectors.
+    :return: a callable taking a word and a default.
+    """
+    key_to_index = getattr(embeddings, "key_to_index", None)
+    if key_to_index is not None:
+        return key_to_index.get
+
+    # gensim < 4.0 keeps the index in the Vocab objects.
+    vocab = embeddings.vocab
+
+    def get(word, default=None):
+        item = vocab.get(word)
+        return default if item is None else item.index
+
+    return get
+
+
+def _index_to_key(embeddings):
+    words = getattr(embeddings, "index_to_key", None)
+    if words is None:
+        # gensim < 4.0.
+        words = embeddings.index2word
+    return words
+
+
+def vocabulary_fingerprint(embeddings):
+    """
+    Return a hash of the vocabulary of embeddings, in row order.
+    Interned corpora are only valid with embeddings of the same fingerprint.
+
+    :param embeddings: a gensim KeyedVectors.
+    :return: a hex string.
+    """
+    digest = hashlib.sha1()
+    for word in _index_to_key(embeddings):
+        digest.update(word.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def gather(vectors, indices, dtype=None):
+    """
+    Look up the vectors of an array of indices. `OOV_INDEX` gets a zero vector.
+
+    :param vectors: the 2D embedding matrix.
+    :param indices: an int ndarray of any shape.
+    :param dtype: the dtype of the result, that of vectors if None.
+    :return: an ndarray of shape `indices.shape + (vector_size,)`.
+    """
+    if vectors.shape[0] == 0:
+        # every index is OOV_INDEX and there is no row to take
+        return np.zeros(indices.shape + vectors.shape[1:], dtype=dtype or vectors.dtype)
+    gathered = np.asarray(
+        vectors.take(np.maximum(indices, 0), axis=0),
+        dtype=dtype or vectors.dtype,
+    )
+    gathered[indices == OOV_INDEX] = 0
+    return gathered
+
+
+def _segment_positions(offsets, rows):
+    """
+    Return the positions of the items of some segments of a flat array,
+    segment after segment.
+
+    :param offsets: a 1D int ndarray, segment i is [offsets[i], offsets[i + 1]).
+    :param rows: a 1D int ndarray, the segments to take.
+    :return: a 1D int ndarray.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    ends = np.cumsum(lengths)
+    total = ends[-1] if len(ends) else 0
+    return np.arange(total) + np.repeat(starts - (ends - lengths), lengths)
+
+
+class InternedCorpus(object):
+    """
+    A corpus as row indices into an embedding matrix.
+    The indices of all sentences are concatenated into one int32 array.
+    """
+
+    def __init__(self, indices, offsets, fingerprint=None):
+        """
+        Use `intern_corpus` or `InternedCorpus.load` instead.
+
+        :param indices: a 1D int32 ndarray.
+        :param offsets: a 1D int ndarray, sentence i is indices[offsets[i]:offsets[i + 1]].
+        :param fingerprint: the vocabulary fingerprint of the embeddings.
+        """
+        self.indices = indices
+        self.offsets = offsets
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def __getitem__(self, item):
+        """
+        Return the indices of sentence item, or an InternedCorpus of a slice.
+        """
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("slices of an InternedCorpus must be contiguous")
+            stop = max(start, stop)
+            offsets = self.offsets[start : stop + 1]
+            return InternedCorpus(
+                self.indices[offsets[0] : offsets[-1]],
+                offsets - offsets[0],
+                self.fingerprint,
+            )
+        return self.indices[self.offsets[item] : self.offsets[item + 1]]
+
+    def take(self, rows):
+        """
+        Return an InternedCorpus of the sentences rows, in that order.
+
+        :param rows: a 1D int ndarray.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = self.offsets[rows + 1] - self.offsets[rows]
+        return InternedCorpus(
+            self.indices[_segment_positions(self.offsets, rows)],
+            np.concatenate([[0], np.cumsum(lengths)]).astype(self.offsets.dtype),
+            self.fingerprint,
+        )
+
+    def padded(self):
+        """
+        Return the corpus as a padded matrix. Padding gets `OOV_INDEX`,
+        the lengths tell it apart from OOV words.
+
+        :return: a tuple of (indices, lengths), a 2D and a 1D int ndarray.
+        """
+        lengths = self.lengths
+        max_length = max(1, lengths.max()) if len(lengths) else 1
+        mask = np.arange(max_length) < lengths[:, np.newaxis]
+        indices = np.full(mask.shape, OOV_INDEX, dtype=np.int32)
+        indices[mask] = self.indices
+        return indices, lengths
+
+    def save(self, path):
+        """
+        Save the corpus to a .npz file.
+
+        :param path: a path-like object.
+        """
+        np.savez(
+            path,
+            indices=self.indices,
+            offsets=self.offsets,
+            fingerprint=np.array(self.fingerprint or ""),
+        )
+
+    @classmethod
+    def load(cls, path, embeddings=None):
+        """
+        Load a corpus saved by `InternedCorpus.save`.
+
+        :param path: a path-like object.
+        :param embeddings: if given, check that the corpus was interned with
+            embeddings of the same vocabulary.
+        :return: an InternedCorpus.
+        """
+        with np.load(path) as data:
+            corpus = cls(data["indices"], data["offsets"], str(data["fingerprint"]))
+        if embeddings is not None:
+            if corpus.fingerprint != vocabulary_fingerprint(embeddings):
+                raise ValueError("%r was interned with other embeddings" % path)
+        return corpus
+
+
+def intern_corpus(corpus, embeddings, fingerprint=False):
+    """
+    Look up every word of a corpus in the embeddings.
+
+    :param corpus: a list of sentences, each a list of tokens.
+    :param embeddings: a gensim KeyedVectors.
+    :param fingerprint: if True, record the vocabulary fingerprint of
+        embeddings, which `InternedCorpus.load` can check later.
+    :return: an InternedCorpus.
+    """
+    if isinstance(corpus, InternedCorpus):
+        return corpus
+    corpus = list(corpus)
+    get = _get_index_fn(embeddings)
+    lengths = np.fromiter((len(sentence) for sentence in corpus), dtype=np.int64)
+    indices = np.fromiter(
+        (get(word, OOV_INDEX) for sentence in corpus for word in sentence),
+        dtype=np.int32,
+        count=lengths.sum(),
+    )
+    return InternedCorpus(
+        indices,
+        np.concatenate([[0], np.cumsum(lengths)]),
+        vocabulary_fingerprint(embeddings) if fingerprint else None,
+    )
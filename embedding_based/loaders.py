@@ -0,0 +1,338 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Readers of word embedding files that do not need gensim.
+
+Three formats are read, each optionally gzipped:
+
+- word2vec binary: a "vocab_size vector_size" header line, then each word,
+  a space and its vector as little-endian float32.
+- word2vec text: the same header, then one "word x1 x2 ..." line per word.
+  fastText .vec files are in this format.
+- GloVe text: like word2vec text without the header.
+
+The file is read in large chunks and the vectors of a chunk are decoded
+together into a matrix preallocated from the header, so words are the only
+thing handled one at a time.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+
+import numpy as np
+
+from embedding_based.store import EmbeddingStore
+from embedding_based.store import _check_store_dtype
+
+__all__ = [
+    "EMBEDDING_FORMATS",
+    "open_embedding_file",
+    "detect_embedding_format",
+    "read_word2vec_binary",
+    "read_word2vec_text",
+    "read_glove_text",
+    "read_embeddings",
+]
+
+EMBEDDING_FORMATS = ("word2vec_binary", "word2vec_text", "glove_text")
+
+# Bytes read from an embedding file at a time.
+_CHUNK_SIZE = 1 << 22
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_embedding_file(path):
+    """
+    Open an embedding file for reading bytes, decompressing it on the fly if
+    it is gzipped.
+
+    :param path: a path-like object.
+    :return: a binary file object.
+    """
+    with io.open(path, "rb") as f:
+        gzipped = f.read(len(_GZIP_MAGIC)) == _GZIP_MAGIC
+    if gzipped:
+        import gzip
+
+        return gzip.open(path, "rb")
+    return io.open(path, "rb")
+
+
+def _parse_header(line):
+    """
+    Return (vocab_size, vector_size) if line is a word2vec header, else None.
+    """
+    fields = line.split()
+    if len(fields) != 2:
+        return None
+    try:
+        return int(fields[0]), int(fields[1])
+    except ValueError:
+        return None
+
+
+def _is_text_vector(line, vector_size):
+    """
+    Tell whether line is a word followed by vector_size numbers.
+    """
+    fields = line.rstrip().rsplit(b" ", vector_size)
+    if len(fields) != vector_size + 1:
+        return False
+    try:
+        [float(field) for field in fields[1:]]
+    except ValueError:
+        return False
+    return True
+
+
+def detect_embedding_format(path):
+    """
+    Tell the format of an embedding file from its first lines.
+
+    :param path: a path-like object, possibly gzipped.
+    :return: one of `EMBEDDING_FORMATS`.
+    """
+    with open_embedding_file(path) as f:
+        header = _parse_header(f.readline())
+        if header is None:
+            return "glove_text"
+        # A binary vector is a fixed number of bytes that are very unlikely
+        # to read as numbers; a text line is at most a few dozen bytes a number.
+        line = f.readline(64 * header[1] + 1024)
+    if _is_text_vector(line, header[1]):
+        return "word2vec_text"
+    return "word2vec_binary"
+
+
+class _Collector(object):
+    """
+    The words and vectors read so far, in a matrix preallocated from the
+    vocabulary size if it is known and grown by doubling otherwise.
+    Only the first vector of a repeated word is kept.
+    """
+
+    def __init__(self, vector_size, capacity, dtype):
+        self.words = []
+        self.seen = set()
+        self.vectors = np.empty((capacity, vector_size), dtype=dtype)
+
+    def accept(self, word, vocabulary):
+        if (vocabulary is None or word in vocabulary) and word not in self.seen:
+            self.seen.add(word)
+            return True
+        return False
+
+    def extend(self, words, vectors):
+        size = len(self.words)
+        if size + len(words) > len(self.vectors):
+            capacity = max(size + len(words), 2 * len(self.vectors))
+            grown = np.empty((capacity, self.vectors.shape[1]), self.vectors.dtype)
+            grown[:size] = self.vectors[:size]
+            self.vectors = grown
+        self.vectors[size : size + len(words)] = vectors
+        self.words.extend(words)
+
+    def store(self):
+        size = len(self.words)
+        vectors = self.vectors
+        if size < len(vectors):
+            # Copy, so that the unused rows are freed.
+            vectors = vectors[:size].copy()
+        return EmbeddingStore(self.words, vectors)
+
+
+def _read_binary_records(f, vocab_size, vector_size, vocabulary, collector):
+    row_bytes = vector_size * 4
+    buf = b""
+    remaining = vocab_size
+    while remaining:
+        chunk = f.read(_CHUNK_SIZE)
+        if not chunk:
+            raise EOFError("%d words missing at the end of the file" % remaining)
+        buf += chunk
+        pos = 0
+        words = []
+        offsets = []
+        while remaining:
+            end = buf.find(b" ", pos)
+            if end < 0 or len(buf) < end + 1 + row_bytes:
+                break
+            # The origin C tool writes a newline after each vector.
+            word = buf[pos:end].lstrip(b"\n").decode("utf-8")
+            if collector.accept(word, vocabulary):
+                words.append(word)
+                offsets.append(end + 1)
+            pos = end + 1 + row_bytes
+            remaining -= 1
+        if words:
+            # Joining the byte strings of the rows is one copy per row in C,
+            # then the whole chunk is decoded at once.
+            rows = b"".join([buf[offset : offset + row_bytes] for offset in offsets])
+            vectors = np.frombuffer(rows, dtype="<f4").reshape(
+                (len(words), vector_size)
+            )
+            collector.extend(words, vectors)
+        buf = buf[pos:]
+
+
+def read_word2vec_binary(path, vocabulary=None, dtype=np.float32):
+    """
+    Read a word2vec binary file as written by the origin C tool.
+
+    :param path: a path-like object, possibly gzipped.
+    :param vocabulary: if given, a set of words. Only these words are kept,
+        so memory scales with the vocabulary instead of the file.
+    :param dtype: np.float32 or np.float16, the dtype the vectors are kept in.
+    :return: an EmbeddingStore.
+    """
+    dtype = _check_store_dtype(dtype)
+    with open_embedding_file(path) as f:
+        header = _parse_header(f.readline())
+        if header is None:
+            raise ValueError("%r has no word2vec header" % path)
+        vocab_size, vector_size = header
+        capacity = (
+            vocab_size if vocabulary is None else min(vocab_size, len(vocabulary))
+        )
+        collector = _Collector(vector_size, capacity, dtype)
+        _read_binary_records(f, vocab_size, vector_size, vocabulary, collector)
+    return collector.store()
+
+
+def _parse_text_vectors(lines, vector_size):
+    """
+    Split lines of text into words and a matrix of their vectors.
+    Words may contain spaces, the vector is the last vector_size fields.
+    """
+    words = []
+    numbers = []
+    for line in lines:
+        fields = line.rstrip().rsplit(b" ", vector_size)
+        if len(fields) != vector_size + 1:
+            raise ValueError(
+                "expected a word and %d numbers, got %r" % (vector_size, line[:100])
+            )
+        words.append(fields[0].decode("utf-8"))
+        numbers.append(line[len(fields[0]) + 1 :].rstrip() + b"\n")
+    vectors = np.loadtxt(io.BytesIO(b"".join(numbers)), dtype=np.float32, ndmin=2)
+    return words, vectors.reshape((len(words), vector_size))
+
+
+def _read_text_records(f, vector_size, vocabulary, collector):
+    while True:
+        lines = f.readlines(_CHUNK_SIZE)
+        if not lines:
+            return
+        # Decoding the words only is cheap, so the lines of unwanted words
+        # are dropped before their numbers are parsed.
+        kept = []
+        for line in lines:
+            if not line.strip():
+                continue
+            word = line.split(b" ", 1)[0].decode("utf-8")
+            if vocabulary is None or word in vocabulary:
+                kept.append(line)
+        if not kept:
+            continue
+        words, vectors = _parse_text_vectors(kept, vector_size)
+        accepted = [collector.accept(word, vocabulary) for word in words]
+        if not all(accepted):
+            words = [word for word, keep in zip(words, accepted) if keep]
+            vectors = vectors[np.array(accepted)]
+        collector.extend(words, vectors)
+
+
+def read_word2vec_text(path, vocabulary=None, dtype=np.float32):
+    """
+    Read a word2vec or fastText text file, which has a header line.
+
+    :param path: a path-like object, possibly gzipped.
+    :param vocabulary: if given, a set of words to keep.
+    :param dtype: np.float32 or np.float16, the dtype the vectors are kept in.
+    :return: an EmbeddingStore.
+    """
+    dtype = _check_store_dtype(dtype)
+    with open_embedding_file(path) as f:
+        header = _parse_header(f.readline())
+        if header is None:
+            raise ValueError("%r has no word2vec header" % path)
+        vocab_size, vector_size = header
+        capacity = (
+            vocab_size if vocabulary is None else min(vocab_size, len(vocabulary))
+        )
+        collector = _Collector(vector_size, capacity, dtype)
+        _read_text_records(f, vector_size, vocabulary, collector)
+    return collector.store()
+
+
+def read_glove_text(path, vocabulary=None, dtype=np.float32):
+    """
+    Read a GloVe text file, which has no header line. The vector size is that
+    of the first line.
+
+    :param path: a path-like object, possibly gzipped.
+    :param vocabulary: if given, a set of words to keep.
+    :param dtype: np.float32 or np.float16, the dtype the vectors are kept in.
+    :return: an EmbeddingStore.
+    """
+    dtype = _check_store_dtype(dtype)
+    with open_embedding_file(path) as f:
+        first = f.readline()
+        if not first.strip():
+            return EmbeddingStore([], np.zeros((0, 0), dtype=dtype))
+        vector_size = len(first.split()) - 1
+        collector = _Collector(vector_size, 1024, dtype)
+        words, vectors = _parse_text_vectors([first], vector_size)
+        if collector.accept(words[0], vocabulary):
+            collector.extend(words, vectors)
+        _read_text_records(f, vector_size, vocabulary, collector)
+    return collector.store()
+
+
+_READERS = {
+    "word2vec_binary": read_word2vec_binary,
+    "word2vec_text": read_word2vec_text,
+    "glove_text": read_glove_text,
+}
+
+
+def read_embeddings(path, format=None, vocabulary=None, dtype=np.float32):
+    """
+    Read an embedding file in any of `EMBEDDING_FORMATS`.
+
+    :param path: a path-like object, possibly gzipped.
+    :param format: one of `EMBEDDING_FORMATS`, detected from the file if None.
+    :param vocabulary: if given, a set of words to keep.
+    :param dtype: np.float32 or np.float16, the dtype the vectors are kept in.
+    :return: an EmbeddingStore.
+    """
+    if format is None:
+        format = detect_embedding_format(path)
+    if format not in _READERS:
+        raise ValueError("unknown embedding format %r" % format)
+    return _READERS[format](path, vocabulary=vocabulary, dtype=dtype)
@@ -28,8 +28,25 @@ from __future__ import print_function
 import numpy as np
 import collections
 
+from embedding_based.batch import _EPSILON
+from embedding_based.batch import _DEFAULT_DTYPE
+from embedding_based.batch import _check_dtype
+from embedding_based.batch import _cos_sim_matrix
+from embedding_based.batch import _extrema_from_bounds
+from embedding_based.batch import average_scores
+from embedding_based.batch import extrema_scores
+from embedding_based.batch import greedy_match_scores
+from embedding_based.batch import score_all
+from embedding_based.batch import METRICS
+from embedding_based.intern import intern_corpus
+from embedding_based.score_cache import cached_score_all
+from embedding_based.intern import gather
+
 __all__ = [
     "CorpusLevelScore",
+    "EvaluationResult",
+    "RunningScore",
+    "evaluate_all",
     "average_sentence_level",
     "average_corpus_level",
     "extrema_sentence_level",
@@ -38,8 +55,6 @@ __all__ = [
     "greedy_match_sentence_level",
 ]
 
-_EPSILON = 0.00000000001
-
 # See https://en.wikipedia.org/wiki/1.96 for details of this magic number.
 _95_CI_DEVIATE = 1.96
 
@@ -47,12 +62,19 @@ CorpusLevelScore = collections.namedtuple(
     "CorpusLevelScore", ["mean", "confidence_interval", "standard_deviation"]
 )
 
+EvaluationResult = collections.namedtuple(
+    "EvaluationResult", ["sentence_scores", "corpus_score"]
+)
+
 
 def _compute_corpus_score(scores):
     """
     Compute various statistics from a list of scores.
     The scores come from evaluating a list of sentence pairs.
     The function combines them by mean and standard derivation.
+    The confidence interval is that of the original script, which divides by
+    n instead of its square root; see the `bootstrap` module for intervals
+    and significance tests between systems.
 
     :param scores: a list of float.
     :return: a CorpusLevelScore.
@@ -64,6 +86,119 @@ def _compute_corpus_score(scores):
     )
 
 
+class RunningScore(object):
+    """
+    Running statistics of a stream of scores, kept in constant memory.
+    The scores are combined as in `_compute_corpus_score`.
+
+    Statistics of separate parts of a corpus, such as shards scored on
+    different machines, combine by `RunningScore.merge` into those of the
+    whole corpus, in any order and grouping. `RunningScore.state` turns them
+    into a few numbers of JSON to ship between processes.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        # Sum of squared deviations from the mean.
+        self.m2 = 0.0
+        # Number of pairs left out of the statistics, see `_unskipped`.
+        self.skipped = 0
+
+    def _combine(self, count, mean, m2):
+        """
+        Add the statistics of other scores, by the parallel algorithm of
+        Chan et al. for the variance.
+        """
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    def update(self, scores, skipped=0):
+        """
+        Add a batch of scores.
+
+        :param scores: a list of float.
+        :param skipped: number of pairs of the batch left out of scores.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        self.skipped += int(skipped)
+        if not len(scores):
+            return
+        mean = scores.mean()
+        self._combine(len(scores), mean, np.square(scores - mean).sum())
+
+    def merge(self, other):
+        """
+        Add the statistics of another RunningScore.
+
+        :param other: a RunningScore.
+        :return: self.
+        """
+        self._combine(other.count, other.mean, other.m2)
+        self.skipped += other.skipped
+        return self
+
+    def state(self):
+        """
+        Return the statistics as a dict of plain numbers, for JSON.
+
+        :return: a dict.
+        """
+        return {
+            "count": self.count,
+            "mean": float(self.mean),
+            "m2": float(self.m2),
+            "skipped": self.skipped,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Make a RunningScore from what `RunningScore.state` returned.
+
+        :param state: a dict.
+        :return: a RunningScore.
+        """
+        running = cls()
+        running.count = int(state["count"])
+        running.mean = float(state["mean"])
+        running.m2 = float(state["m2"])
+        running.skipped = int(state.get("skipped", 0))
+        return running
+
+    def corpus_score(self):
+        """
+        Return the statistics of all the scores seen so far.
+
+        :return: a CorpusLevelScore.
+        """
+        if not self.count:
+            return CorpusLevelScore(
+                mean=np.nan, confidence_interval=np.nan, standard_deviation=np.nan
+            )
+        std = np.sqrt(self.m2 / self.count)
+        return CorpusLevelScore(
+            mean=self.mean,
+            confidence_interval=_95_CI_DEVIATE * std / self.count,
+            standard_deviation=std,
+        )
+
+
+def _unskipped(batch_scores):
+    """
+    Return the scores of the pairs that were not skipped.
+
+    :param batch_scores: a BatchScores.
+    :return: ndarray of 1D.
+    """
+    return batch_scores.scores[~batch_scores.skipped]
+
+
 def _cos_sim(a, b):
     """
     Return the cosine similarity of two vector a and b.
@@ -77,74 +212,96 @@ def _cos_sim(a, b):
     if a_norm < _EPSILON or b_norm < _EPSILON:
         # zero in, zero out.
         return 0
-    return np.dot(a, b) / np.linalg.norm(a) / np.linalg.norm(b)
+    return np.dot(a, b) / a_norm / b_norm
 
 
-def _embedding_sum(sentence, embeddings):
+def _embedding_sum(sentence, embeddings, dtype=_DEFAULT_DTYPE):
     """
     Return the sum of embeddings of words in sentence.
 
     :param sentence: a list of tokens.
     :param embeddings: a KeyedVectors.
+    :param dtype: the dtype to compute in.
     :return: a 1D ndarray of len `embeddings.vector_size`.
     """
-    total = sum(_map_to_embeddings(sentence, embeddings))
-    return total
+    return _map_to_embeddings(sentence, embeddings, dtype).sum(axis=0)
 
 
-def _get_average(sentence, embeddings):
-    total = _embedding_sum(sentence, embeddings)
+def _get_average(sentence, embeddings, dtype=_DEFAULT_DTYPE):
+    total = _embedding_sum(sentence, embeddings, dtype)
     total_norm = np.linalg.norm(total)
     if total_norm < _EPSILON:
-        return np.zeros(embeddings.vector_size)
+        return np.zeros(embeddings.vector_size, dtype=total.dtype)
     return total / total_norm
 
 
-def average_sentence_level(hypothesis_sentence, reference_sentence, embeddings):
+def average_sentence_level(
+    hypothesis_sentence,
+    reference_sentence,
+    embeddings,
+    dtype=_DEFAULT_DTYPE,
+    score_cache=None,
+):
     """
     Compute Average on sentence level.
 
     :param hypothesis_sentence:
     :param reference_sentence:
     :param embeddings:
+    :param dtype: the dtype to compute in, float32 or float64.
+    :param score_cache: a ScoreCache to look the score up in first.
     :return:
     """
+    if score_cache is not None:
+        return score_cache.score(
+            "average_sentence_level",
+            hypothesis_sentence,
+            reference_sentence,
+            lambda: average_sentence_level(
+                hypothesis_sentence, reference_sentence, embeddings, dtype
+            ),
+            dtype,
+        )
     return _cos_sim(
-        a=_get_average(hypothesis_sentence, embeddings),
-        b=_get_average(reference_sentence, embeddings),
+        a=_get_average(hypothesis_sentence, embeddings, dtype),
+        b=_get_average(reference_sentence, embeddings, dtype),
     )
 
 
-def average_corpus_level(hypothesis_corpus, reference_corpus, embeddings):
+def average_corpus_level(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+):
     """
     Compute Average on corpus level.
 
     :param hypothesis_corpus:
     :param reference_corpus:
     :param embeddings:
+    :param n_jobs: number of worker processes, see `batch.score_all`.
+    :param dtype: the dtype to compute in, see `batch.score_all`.
+    :param memo: a SentenceMemo, so that repeated sentences are computed
+        once, see `batch.score_all`.
+    :param memory_budget: the working memory of a block in bytes, to
+        group the pairs by length, see `batch.score_all`.
     :return:
     """
     assert len(hypothesis_corpus) == len(reference_corpus)
-    scores = []
-
-    for hypothesis, reference in zip(hypothesis_corpus, reference_corpus):
-        X = _embedding_sum(hypothesis, embeddings)
-        Y = _embedding_sum(reference, embeddings)
-        # if none of the words in ground truth have embeddings, skip
-        if np.linalg.norm(X) < _EPSILON:
-            continue
-
-        # if none of the words have embeddings in response, count result as zero
-        if np.linalg.norm(Y) < _EPSILON:
-            scores.append(0)
-            continue
-
-        # Normalize to unit vectors.
-        X /= np.linalg.norm(X)
-        Y /= np.linalg.norm(Y)
-        scores.append(_cos_sim(X, Y))
-
-    return _compute_corpus_score(scores)
+    scores = average_scores(
+        hypothesis_corpus,
+        reference_corpus,
+        embeddings,
+        n_jobs=n_jobs,
+        dtype=dtype,
+        memo=memo,
+        memory_budget=memory_budget,
+    )
+    return _compute_corpus_score(_unskipped(scores))
 
 
 def _get_extrema(vectors):
@@ -154,76 +311,107 @@ def _get_extrema(vectors):
     :param vectors: a list of 1D vectors all having the same shape.
     :return: the Extrema vector.
     """
-    max_values = np.max(vectors, axis=0)
-    min_values = np.min(vectors, axis=0)
-    return np.array(
-        [
-            min_v if np.abs(min_v) > max_v else max_v
-            for min_v, max_v in zip(min_values, max_values)
-        ]
-    )
+    vectors = np.asarray(vectors)
+    return _extrema_from_bounds(np.min(vectors, axis=0), np.max(vectors, axis=0))
 
 
-def _map_to_embeddings(words, embeddings):
+def _map_to_embeddings(words, embeddings, dtype=_DEFAULT_DTYPE):
     """
     Map each word in words to its embedding. OOV word maps to zeros.
-    Thus the dimension of words may not match that of the returned list.
+    The words are interned first, so the vectors come from one gather.
 
     :param words: a list of strings.
     :param embeddings: a gensim KeyedVectors.
-    :return:  a list of ndarrays.
+    :param dtype: the dtype of the result, float32 or float64.
+    :return: a 2D ndarray, one row for each word.
     """
-
-    def get(word):
-        try:
-            return embeddings[word]
-        except KeyError:
-            return np.zeros(embeddings.vector_size)
-
-    return list(map(get, words))
+    indices = intern_corpus([words], embeddings).indices
+    return gather(embeddings.vectors, indices, _check_dtype(dtype))
 
 
-def extrema_sentence_level(hypothesis_sentence, reference_sentence, embeddings):
+def extrema_sentence_level(
+    hypothesis_sentence,
+    reference_sentence,
+    embeddings,
+    dtype=_DEFAULT_DTYPE,
+    score_cache=None,
+):
     """
     Compute Extrema on sentence level.
 
     :param hypothesis_sentence:
     :param reference_sentence:
     :param embeddings:
+    :param dtype: the dtype to compute in, float32 or float64.
+    :param score_cache: a ScoreCache to look the score up in first.
     :return:
     """
-    hypothesis = _map_to_embeddings(hypothesis_sentence, embeddings)
-    reference = _map_to_embeddings(reference_sentence, embeddings)
+    if score_cache is not None:
+        return score_cache.score(
+            "extrema_sentence_level",
+            hypothesis_sentence,
+            reference_sentence,
+            lambda: extrema_sentence_level(
+                hypothesis_sentence, reference_sentence, embeddings, dtype
+            ),
+            dtype,
+        )
+    hypothesis = _map_to_embeddings(hypothesis_sentence, embeddings, dtype)
+    reference = _map_to_embeddings(reference_sentence, embeddings, dtype)
     return _cos_sim(
         a=_get_extrema(hypothesis),
         b=_get_extrema(reference),
     )
 
 
-def extrema_corpus_level(hypothesis_corpus, reference_corpus, embeddings):
+def extrema_corpus_level(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+):
     """
     Compute Extrema on corpus level.
 
     :param hypothesis_corpus:
     :param reference_corpus:
     :param embeddings:
+    :param n_jobs: number of worker processes, see `batch.score_all`.
+    :param dtype: the dtype to compute in, see `batch.score_all`.
+    :param memo: a SentenceMemo, so that repeated sentences are computed
+        once, see `batch.score_all`.
+    :param memory_budget: the working memory of a block in bytes, to
+        group the pairs by length, see `batch.score_all`.
     :return:
     """
-    scores = []
-    for hypothesis, reference in zip(hypothesis_corpus, reference_corpus):
-        X = _map_to_embeddings(hypothesis, embeddings)
-        Y = _map_to_embeddings(reference, embeddings)
+    scores = extrema_scores(
+        hypothesis_corpus,
+        reference_corpus,
+        embeddings,
+        n_jobs=n_jobs,
+        dtype=dtype,
+        memo=memo,
+        memory_budget=memory_budget,
+    )
+    return _compute_corpus_score(_unskipped(scores))
 
-        if np.linalg.norm(X) < _EPSILON:
-            continue
-        if np.linalg.norm(Y) < _EPSILON:
-            scores.append(0)
-            continue
 
-        value = _cos_sim(_get_extrema(X), _get_extrema(Y))
-        scores.append(value)
+def _greedy_match_matrix(a, b):
+    """
+    Return the matrix of cosine similarities of every word of a and b.
 
-    return _compute_corpus_score(scores)
+    :param a: a list of word vectors.
+    :param b: a list of word vectors.
+    :return: ndarray of shape (len(a), len(b)).
+    """
+    if not len(a) or not len(b):
+        raise ValueError("empty vector")
+    # Lists of vectors keep the dtype of their vectors, at least float32.
+    dtype = np.result_type(np.asarray(a), np.asarray(b), np.float32)
+    return _cos_sim_matrix(np.asarray(a, dtype=dtype), np.asarray(b, dtype=dtype))
 
 
 def _greedy_match(a, b):
@@ -235,53 +423,157 @@ def _greedy_match(a, b):
     :param b: a list of word vectors.
     :return: The greedy-matched value.
     """
-    sum_max_cosine = sum(max(_cos_sim(a_i, b_i) for b_i in b) for a_i in a)
-    if not len(a):
-        raise ValueError("empty vector")
-    return sum_max_cosine / len(a)
+    return _greedy_match_matrix(a, b).max(axis=1).mean()
 
 
 def _greedy_average(a, b):
     """
     Compute the average of greedy matching a on b and b on a.
+    Both directions come from the row and column maxes of one matrix.
 
     :param a: a list of word vectors.
     :param b: a list of word vectors.
     :return: The averaged greedy-matched value.
     """
-    # return np.mean([_greedy_match(*args) for args in ((a, b), (b, a))])
-    return (_greedy_match(a, b) + _greedy_match(b, a)) / 2
+    sim = _greedy_match_matrix(a, b)
+    return (sim.max(axis=1).mean() + sim.max(axis=0).mean()) / 2
 
 
-def greedy_match_sentence_level(hypothesis_sentence, reference_sentence, embeddings):
+def greedy_match_sentence_level(
+    hypothesis_sentence,
+    reference_sentence,
+    embeddings,
+    dtype=_DEFAULT_DTYPE,
+    score_cache=None,
+):
     """
     Compute Greedy Matching on sentence level.
 
     :param hypothesis_sentence:
     :param reference_sentence:
     :param embeddings:
+    :param dtype: the dtype to compute in, float32 or float64.
+    :param score_cache: a ScoreCache to look the score up in first.
     :return:
     """
-    hyp = _map_to_embeddings(hypothesis_sentence, embeddings)
-    ref = _map_to_embeddings(reference_sentence, embeddings)
+    if score_cache is not None:
+        return score_cache.score(
+            "greedy_match_sentence_level",
+            hypothesis_sentence,
+            reference_sentence,
+            lambda: greedy_match_sentence_level(
+                hypothesis_sentence, reference_sentence, embeddings, dtype
+            ),
+            dtype,
+        )
+    hyp = _map_to_embeddings(hypothesis_sentence, embeddings, dtype)
+    ref = _map_to_embeddings(reference_sentence, embeddings, dtype)
     return _greedy_average(hyp, ref)
 
 
-def greedy_match_corpus_level(hypothesis_corpus, reference_corpus, embeddings):
+def greedy_match_corpus_level(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+):
     """
     Compute Greedy Matching on corpus level.
 
     :param hypothesis_corpus:
     :param reference_corpus:
     :param embeddings:
+    :param n_jobs: number of worker processes, see `batch.score_all`.
+    :param dtype: the dtype to compute in, see `batch.score_all`.
+    :param memo: a SentenceMemo, so that repeated sentences are computed
+        once, see `batch.score_all`.
+    :param memory_budget: the working memory of a block in bytes, to
+        group the pairs by length, see `batch.score_all`.
     :return:
     """
-    scores = []
-    for hypothesis, reference in zip(hypothesis_corpus, reference_corpus):
-        X = _map_to_embeddings(hypothesis, embeddings)
-        Y = _map_to_embeddings(reference, embeddings)
-        if len(X) == 0 or len(Y) == 0:
-            scores.append(0)
-            continue
-        scores.append(_greedy_average(X, Y))
-    return _compute_corpus_score(scores)
+    scores = greedy_match_scores(
+        hypothesis_corpus,
+        reference_corpus,
+        embeddings,
+        n_jobs=n_jobs,
+        dtype=dtype,
+        memo=memo,
+        memory_budget=memory_budget,
+    )
+    return _compute_corpus_score(_unskipped(scores))
+
+
+def evaluate_all(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    metrics=METRICS,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    score_cache=None,
+    memo=None,
+    memory_budget=None,
+    timer=None,
+):
+    """
+    Compute several metrics on both sentence level and corpus level in one pass.
+    Each sentence is looked up in the embeddings only once.
+
+    Unlike the `*_sentence_level` functions, an empty sentence scores zero
+    instead of raising an error.
+
+    :param hypothesis_corpus: a list of sentences.
+    :param reference_corpus: a list of sentences or a ReferenceCache.
+    :param embeddings: a KeyedVectors.
+    :param metrics: names of the metrics, any of "average", "extrema"
+        and "greedy_match".
+    :param n_jobs: number of worker processes, see `batch.score_all`.
+    :param dtype: the dtype to compute in, see `batch.score_all`.
+    :param score_cache: a ScoreCache. If given, only the pairs missing from
+        it are scored, see `score_cache.cached_score_all`.
+    :param memo: a SentenceMemo, see `batch.score_all`.
+    :param memory_budget: the working memory of a block in bytes, to
+        group the pairs by length, see `batch.score_all`.
+    :param timer: a StageTimer to record the stages and counters of the
+        scoring in, see `timing`.
+    :return: an OrderedDict mapping each metric name to an EvaluationResult.
+    """
+    assert len(hypothesis_corpus) == len(reference_corpus)
+    if score_cache is not None:
+        results = cached_score_all(
+            hypothesis_corpus,
+            reference_corpus,
+            embeddings,
+            score_cache,
+            metrics,
+            n_jobs=n_jobs,
+            dtype=dtype,
+            memo=memo,
+            memory_budget=memory_budget,
+            timer=timer,
+        )
+    else:
+        results = score_all(
+            hypothesis_corpus,
+            reference_corpus,
+            embeddings,
+            metrics,
+            n_jobs=n_jobs,
+            dtype=dtype,
+            memo=memo,
+            memory_budget=memory_budget,
+            timer=timer,
+        )
+    return collections.OrderedDict(
+        (
+            name,
+            EvaluationResult(
+                sentence_scores=result.scores,
+                corpus_score=_compute_corpus_score(_unskipped(result)),
+            ),
+        )
+        for name, result in results.items()
+    )
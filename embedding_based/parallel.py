@@ -0,0 +1,228 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Run work on blocks of sentence pairs in a process pool.
+
+The embedding matrix is never pickled. A memory-mapped matrix is reopened
+from its file by each worker, any other matrix is copied once into shared
+memory which the workers attach to.
+
+A `Workers` keeps the pool and the shared matrix for a whole run. Pass it as
+the n_jobs of `map_blocks`, and so of `batch.score_all` and the functions
+built on it, to reuse them across calls.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import contextlib
+import os
+
+import numpy as np
+
+__all__ = [
+    "Workers",
+    "open_workers",
+    "map_blocks",
+]
+
+# The matrix a worker process computes with, set by `_init_worker`.
+_worker_vectors = None
+# Keeps the shared memory of a worker alive as long as the worker.
+_worker_shm = None
+
+
+def _resolve_n_jobs(n_jobs):
+    """
+    Turn n_jobs into a number of processes. None or a negative value means
+    using all the CPUs.
+    """
+    if n_jobs is None or n_jobs < 0:
+        return os.cpu_count() or 1
+    return max(1, n_jobs)
+
+
+@contextlib.contextmanager
+def _shared_matrix(vectors):
+    """
+    Make vectors available to other processes.
+
+    :param vectors: a 2D ndarray or np.memmap.
+    :return: a context manager yielding a picklable spec for `_attach_matrix`.
+    """
+    if isinstance(vectors, np.memmap) and vectors.filename is not None:
+        yield (
+            "memmap",
+            vectors.filename,
+            vectors.dtype.str,
+            vectors.shape,
+            vectors.offset,
+        )
+        return
+
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, vectors.nbytes))
+    try:
+        shared = np.ndarray(vectors.shape, dtype=vectors.dtype, buffer=shm.buf)
+        shared[...] = vectors
+        del shared
+        yield "shm", shm.name, vectors.dtype.str, vectors.shape, 0
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _attach_matrix(spec):
+    """
+    Open the matrix described by a spec from `_shared_matrix`.
+
+    :return: a tuple of (matrix, shared memory or None).
+    """
+    kind, name, dtype, shape, offset = spec
+    if kind == "memmap":
+        matrix = np.memmap(name, dtype=dtype, mode="r", shape=shape, offset=offset)
+        return matrix, None
+
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf), shm
+
+
+def _init_worker(spec):
+    global _worker_vectors, _worker_shm
+    _worker_vectors, _worker_shm = _attach_matrix(spec)
+
+
+def _run_block(args):
+    fn, block = args
+    return fn(_worker_vectors, block)
+
+
+class Workers(object):
+    """
+    A process pool whose workers share one embedding matrix.
+    The matrix is shared and the pool started once, then reused by every
+    `map` until `close`.
+
+    Use it as a context manager::
+
+        with Workers(embeddings.vectors, n_jobs=4) as workers:
+            for system in systems:
+                score_all(system, references, embeddings, n_jobs=workers)
+    """
+
+    def __init__(self, vectors, n_jobs=None):
+        """
+        :param vectors: the 2D embedding matrix.
+        :param n_jobs: number of worker processes. None or a negative value
+            means using all the CPUs. With 1, blocks run in this process.
+        """
+        self.vectors = vectors
+        self.n_jobs = _resolve_n_jobs(n_jobs)
+        self._pool = None
+        self._shared = contextlib.ExitStack()
+        if self.n_jobs == 1:
+            return
+
+        import multiprocessing
+
+        try:
+            spec = self._shared.enter_context(_shared_matrix(vectors))
+            self._pool = multiprocessing.Pool(
+                self.n_jobs, initializer=_init_worker, initargs=(spec,)
+            )
+        except BaseException:
+            self._shared.close()
+            raise
+
+    def map(self, fn, blocks):
+        """
+        Apply fn to every block. The results come back in the order of blocks.
+
+        :param fn: a picklable function taking (vectors, block).
+        :param blocks: an iterable of picklable blocks.
+        :return: a generator of the results of fn.
+        """
+        if self._pool is None:
+            for block in blocks:
+                yield fn(self.vectors, block)
+            return
+        for result in self._pool.imap(_run_block, ((fn, block) for block in blocks)):
+            yield result
+
+    def close(self):
+        """
+        Stop the workers and free the shared matrix.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@contextlib.contextmanager
+def open_workers(vectors, n_jobs=1):
+    """
+    Get the Workers of a run.
+
+    :param vectors: the 2D embedding matrix.
+    :param n_jobs: a number of worker processes, see `Workers`, or a Workers.
+    :return: a context manager yielding n_jobs itself if it is a Workers, left
+        open, or else a new Workers closed on exit.
+    """
+    if isinstance(n_jobs, Workers):
+        if n_jobs.vectors is not vectors:
+            raise ValueError("the Workers were started for another matrix")
+        yield n_jobs
+        return
+    with Workers(vectors, n_jobs) as workers:
+        yield workers
+
+
+def map_blocks(fn, vectors, blocks, n_jobs=1):
+    """
+    Apply fn to every block, in parallel if n_jobs is not 1.
+    The results come back in the order of blocks.
+
+    :param fn: a picklable function taking (vectors, block).
+    :param vectors: the 2D embedding matrix.
+    :param blocks: an iterable of picklable blocks.
+    :param n_jobs: number of worker processes. None or a negative value means
+        using all the CPUs. A Workers of vectors runs the blocks in its pool,
+        which is left open for later calls.
+    :return: a generator of the results of fn.
+    """
+    with open_workers(vectors, n_jobs) as workers:
+        for result in workers.map(fn, blocks):
+            yield result
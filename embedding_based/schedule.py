@@ -0,0 +1,167 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Scheduling of sentence pairs into blocks of similar lengths.
+
+Greedy Matching pads every sentence of a block to the longest one and
+compares all word pairs of the block in one dense matmul, so a block mixing
+short and long sentences spends most of its work on padding. The pairs are
+bucketed by the lengths of both sides instead, half an octave wide, and each
+bucket is cut into blocks that fit in a memory budget.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import collections
+
+import numpy as np
+
+__all__ = [
+    "Schedule",
+    "schedule_pairs",
+    "contiguous_blocks",
+    "padding_waste",
+]
+
+# Number of length buckets per doubling of the length.
+_BUCKETS_PER_OCTAVE = 2
+
+# Working arrays of a pair of sentences of lengths (h, r), in items:
+# the similarity matrix and two temporaries of its size, and the word
+# vectors both unpadded and padded.
+_SIMILARITY_ARRAYS = 3
+_VECTOR_ARRAYS = 2
+
+# A schedule of the pairs of two corpora.
+# - blocks: a list of int ndarrays, the indices of the pairs of each block.
+# - padding_waste: the fraction of the similarity matrices of Greedy
+#   Matching that is padding, see `padding_waste`.
+Schedule = collections.namedtuple("Schedule", ["blocks", "padding_waste"])
+
+
+def _bucket(lengths):
+    """
+    Return the length bucket of each sentence. Empty sentences share the
+    bucket of sentences of one word.
+    """
+    return np.ceil(_BUCKETS_PER_OCTAVE * np.log2(np.maximum(lengths, 1))).astype(int)
+
+
+def _block_items(size, hyp_length, ref_length, vector_size):
+    """
+    Return the number of items of the working arrays of a block of size
+    pairs padded to (hyp_length, ref_length). Blocks of empty sentences
+    are still padded to one word.
+    """
+    hyp_length = max(1, hyp_length)
+    ref_length = max(1, ref_length)
+    return size * (
+        _SIMILARITY_ARRAYS * hyp_length * ref_length
+        + _VECTOR_ARRAYS * (hyp_length + ref_length) * vector_size
+    )
+
+
+def padding_waste(hyp_lengths, ref_lengths, blocks):
+    """
+    Return the fraction of the similarity matrices of Greedy Matching that
+    is padding, when the pairs are scored in the given blocks. The other
+    metrics reduce the unpadded vectors and waste nothing.
+
+    :param hyp_lengths: an int ndarray, the lengths of the hypotheses.
+    :param ref_lengths: an int ndarray, the lengths of the references.
+    :param blocks: an iterable of int ndarrays or slices selecting the pairs
+        of each block.
+    :return: a float in [0, 1], 1 if all the sentences are empty.
+    """
+    hyp_lengths = np.asarray(hyp_lengths, dtype=np.int64)
+    ref_lengths = np.asarray(ref_lengths, dtype=np.int64)
+    used = 0
+    padded = 0
+    for block in blocks:
+        hyp = hyp_lengths[block]
+        ref = ref_lengths[block]
+        if len(hyp):
+            used += int((hyp * ref).sum())
+            padded += len(hyp) * max(1, hyp.max()) * max(1, ref.max())
+    return float(1.0 - used / padded) if padded else 0.0
+
+
+def contiguous_blocks(size, batch_size):
+    """
+    Return the blocks of batch_size consecutive pairs, as `score_all` makes
+    without a schedule.
+
+    :return: a list of slices.
+    """
+    return [
+        slice(start, min(start + batch_size, size))
+        for start in range(0, size, batch_size)
+    ]
+
+
+def schedule_pairs(hyp_lengths, ref_lengths, memory_budget, vector_size, itemsize=4):
+    """
+    Group sentence pairs into blocks of similar lengths.
+
+    The pairs are sorted by the length buckets of both sides, then by their
+    lengths. Each bucket is cut into blocks as large as fit in memory_budget
+    when padded to the longest sentences of the bucket, which are at most
+    about 1.4 times as long as its shortest. A block always holds at least
+    one pair, even if the pair alone is over budget.
+
+    :param hyp_lengths: an int ndarray, the lengths of the hypotheses.
+    :param ref_lengths: an int ndarray, the lengths of the references.
+    :param memory_budget: the largest working memory of a block, in bytes.
+    :param vector_size: the dimension of the word vectors.
+    :param itemsize: the size in bytes of the dtype computed in.
+    :return: a Schedule.
+    """
+    hyp_lengths = np.asarray(hyp_lengths, dtype=np.int64)
+    ref_lengths = np.asarray(ref_lengths, dtype=np.int64)
+    if memory_budget <= 0:
+        raise ValueError("memory_budget must be positive, got %r" % memory_budget)
+    max_items = memory_budget // itemsize
+    hyp_buckets = _bucket(hyp_lengths)
+    ref_buckets = _bucket(ref_lengths)
+    order = np.lexsort((ref_lengths, hyp_lengths, ref_buckets, hyp_buckets))
+
+    # Start of each bucket in order, and the end of the last one.
+    sorted_buckets = np.stack([hyp_buckets[order], ref_buckets[order]])
+    changes = np.flatnonzero((np.diff(sorted_buckets, axis=1) != 0).any(axis=0))
+    bounds = np.concatenate([[0], changes + 1, [len(order)]]) if len(order) else [0]
+
+    blocks = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        bucket = order[start:stop]
+        size = max(
+            1,
+            max_items
+            // _block_items(
+                1, hyp_lengths[bucket].max(), ref_lengths[bucket].max(), vector_size
+            ),
+        )
+        blocks.extend(bucket[i : i + size] for i in range(0, len(bucket), size))
+    return Schedule(blocks, padding_waste(hyp_lengths, ref_lengths, blocks))
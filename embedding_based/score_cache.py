@@ -0,0 +1,367 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+A persistent cache of sentence-level scores.
+
+Scores are kept in an SQLite file keyed by the metric, the tokens of both
+sentences, the dtype computed in and a fingerprint of the embeddings. A cached
+pair is answered without touching the embeddings at all. The least recently
+used entries are evicted once the cache grows past its size cap.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import collections
+import hashlib
+
+import numpy as np
+
+from embedding_based.batch import BatchScores
+from embedding_based.batch import METRICS
+from embedding_based.batch import ReferenceCache
+from embedding_based.batch import _DEFAULT_DTYPE
+from embedding_based.batch import _check_dtype
+from embedding_based.batch import _check_metrics
+from embedding_based.batch import score_all
+from embedding_based.intern import vocabulary_fingerprint
+
+__all__ = [
+    "ScoreCache",
+    "embedding_fingerprint",
+    "cached_score_all",
+]
+
+_DEFAULT_MAX_ENTRIES = 10000000
+
+# Number of rows sampled from the embedding matrix for its fingerprint.
+_FINGERPRINT_ROWS = 1024
+
+# Most keys in one SQL statement, below the SQLite limit of host parameters.
+_KEYS_PER_QUERY = 500
+
+# Most LRU timestamps of hits kept in memory before they are written back.
+_USED_FLUSH_SIZE = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    key BLOB PRIMARY KEY,
+    score REAL NOT NULL,
+    skipped INTEGER NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_used ON scores (used);
+"""
+
+
+def embedding_fingerprint(embeddings):
+    """
+    Return a hash of embeddings for keying cached scores.
+    It covers the vocabulary, the shape and dtype of the matrix, and a sample
+    of its rows, so hashing a large matrix stays cheap.
+
+    :param embeddings: a KeyedVectors or an EmbeddingStore.
+    :return: a hex string.
+    """
+    vectors = embeddings.vectors
+    digest = hashlib.sha1()
+    digest.update(vocabulary_fingerprint(embeddings).encode("utf-8"))
+    digest.update(("%r %s" % (vectors.shape, vectors.dtype.str)).encode("utf-8"))
+    step = max(1, len(vectors) // _FINGERPRINT_ROWS)
+    digest.update(np.ascontiguousarray(vectors[::step]).tobytes())
+    return digest.hexdigest()
+
+
+def _sentence_key(sentence):
+    # The unit separator cannot be part of a whitespace-split token.
+    return "\x1f".join(sentence)
+
+
+class ScoreCache(object):
+    """
+    Sentence-level scores in an SQLite file, shared across runs.
+    """
+
+    def __init__(self, path, fingerprint, max_entries=_DEFAULT_MAX_ENTRIES):
+        """
+        :param path: the SQLite file, created if not existing.
+        :param fingerprint: a string identifying the embeddings, e.g. from
+            `embedding_fingerprint`. Scores of other embeddings are never hit.
+        :param max_entries: the size cap. Least recently used entries beyond
+            it are evicted.
+
+        Lookups never write to the file: the recency of hits is kept in memory
+        and written back in batches, before evictions and on close. The file
+        is meant for one writer at a time, as the row count is kept in memory
+        too.
+        """
+        import sqlite3
+
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path)
+        # A write-ahead log makes each commit of put_many an append instead of
+        # a rewrite of the journal.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        # A logical clock for the LRU order, persisted as the `used` column.
+        self._clock = self._conn.execute("SELECT MAX(used) FROM scores").fetchone()[0]
+        self._clock = self._clock or 0
+        self._size = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        # The `used` of hits not written back yet, by key.
+        self._used = {}
+
+    def __len__(self):
+        return self._size
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stats(self):
+        """
+        Return the hit and miss counters of this process.
+        """
+        lookups = self.hits + self.misses
+        return collections.OrderedDict(
+            [
+                ("hits", self.hits),
+                ("misses", self.misses),
+                ("hit_rate", self.hits / lookups if lookups else 0.0),
+            ]
+        )
+
+    def _key(self, metric, dtype, hypothesis, reference):
+        text = "\x00".join(
+            [
+                self.fingerprint,
+                np.dtype(dtype).name,
+                metric,
+                _sentence_key(hypothesis),
+                _sentence_key(reference),
+            ]
+        )
+        return hashlib.sha1(text.encode("utf-8")).digest()
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def _write_used(self):
+        # Must run in a transaction.
+        self._conn.executemany(
+            "UPDATE scores SET used = ? WHERE key = ?",
+            ((clock, key) for key, clock in self._used.items()),
+        )
+        self._used.clear()
+
+    def flush(self):
+        """
+        Write back the recency of the hits kept in memory.
+        """
+        if self._used:
+            with self._conn:
+                self._write_used()
+
+    def get_many(
+        self, metric, hypothesis_corpus, reference_corpus, dtype=_DEFAULT_DTYPE
+    ):
+        """
+        Look up the scores of many pairs.
+
+        :param metric: name of the metric.
+        :param hypothesis_corpus: a list of sentences.
+        :param reference_corpus: a list of sentences.
+        :param dtype: the dtype the scores were computed in.
+        :return: a tuple of (found, BatchScores), found being a bool ndarray
+            of the pairs that are cached. Other pairs score zero.
+        """
+        keys = [
+            self._key(metric, dtype, hypothesis, reference)
+            for hypothesis, reference in zip(hypothesis_corpus, reference_corpus)
+        ]
+        rows = {}
+        for start in range(0, len(keys), _KEYS_PER_QUERY):
+            chunk = keys[start : start + _KEYS_PER_QUERY]
+            rows.update(
+                (key, (score, skipped))
+                for key, score, skipped in self._conn.execute(
+                    "SELECT key, score, skipped FROM scores WHERE key IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    chunk,
+                )
+            )
+        found = np.array([key in rows for key in keys], dtype=bool)
+        result = BatchScores(
+            scores=np.zeros(len(keys)), skipped=np.zeros(len(keys), dtype=bool)
+        )
+        for i in np.flatnonzero(found):
+            result.scores[i], result.skipped[i] = rows[keys[i]]
+        if rows:
+            self._used.update(dict.fromkeys(rows, self._tick()))
+            if len(self._used) >= _USED_FLUSH_SIZE:
+                self.flush()
+        self.hits += int(found.sum())
+        self.misses += len(keys) - int(found.sum())
+        return found, result
+
+    def put_many(
+        self, metric, hypothesis_corpus, reference_corpus, scores, dtype=_DEFAULT_DTYPE
+    ):
+        """
+        Store the scores of many pairs, then evict down to the size cap.
+
+        :param metric: name of the metric.
+        :param hypothesis_corpus: a list of sentences.
+        :param reference_corpus: a list of sentences.
+        :param scores: a BatchScores of the pairs.
+        :param dtype: the dtype the scores were computed in.
+        """
+        clock = self._tick()
+        rows = [
+            (
+                self._key(metric, dtype, hypothesis, reference),
+                float(score),
+                int(skipped),
+                clock,
+            )
+            for hypothesis, reference, score, skipped in zip(
+                hypothesis_corpus, reference_corpus, scores.scores, scores.skipped
+            )
+        ]
+        with self._conn:
+            # A key always maps to the same score, so a stored row is kept and
+            # only marked as used.
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO scores VALUES (?, ?, ?, ?)", rows
+            ).rowcount
+            if inserted < len(rows):
+                self._used.update((row[0], clock) for row in rows)
+            self._size += inserted
+            excess = self._size - self.max_entries
+            if excess > 0:
+                self._write_used()
+                self._conn.execute(
+                    "DELETE FROM scores WHERE key IN "
+                    "(SELECT key FROM scores ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+                self._size -= excess
+
+    def score(self, metric, hypothesis, reference, compute, dtype=_DEFAULT_DTYPE):
+        """
+        Return the cached score of one pair, computing and storing it on a miss.
+
+        :param metric: a name for compute, such as that of a sentence-level
+            function. Use other names than those of `METRICS`, which key the
+            scores of `cached_score_all` along with their skipped flags.
+        :param hypothesis: a list of tokens.
+        :param reference: a list of tokens.
+        :param compute: a callable taking no argument that returns the score.
+        :param dtype: the dtype the score is computed in.
+        :return: the score.
+        """
+        found, result = self.get_many(metric, [hypothesis], [reference], dtype)
+        if found[0]:
+            return result.scores[0]
+        score = compute()
+        self.put_many(
+            metric,
+            [hypothesis],
+            [reference],
+            BatchScores(scores=np.array([score]), skipped=np.zeros(1, dtype=bool)),
+            dtype,
+        )
+        return score
+
+
+def cached_score_all(
+    hypothesis_corpus,
+    reference_corpus,
+    embeddings,
+    score_cache,
+    metrics=METRICS,
+    dtype=_DEFAULT_DTYPE,
+    timer=None,
+    **kwargs
+):
+    """
+    `batch.score_all` in front of a ScoreCache. Only the pairs missing from
+    the cache are scored, then stored.
+
+    :param hypothesis_corpus: a list of sentences.
+    :param reference_corpus: a list of sentences. A ReferenceCache has no
+        tokens to key on and is not supported.
+    :param embeddings: a KeyedVectors or an EmbeddingStore.
+    :param score_cache: a ScoreCache.
+    :param metrics: names of the metrics.
+    :param dtype: the dtype to compute in.
+    :param timer: a StageTimer, see `batch.score_all`. Only the pairs
+        missing from the cache are counted as scored; the others are counted
+        as "cached_pairs".
+    :param kwargs: other keyword arguments of `batch.score_all`.
+    :return: an OrderedDict mapping each metric name to a BatchScores.
+    """
+    if isinstance(reference_corpus, ReferenceCache):
+        raise ValueError("a ReferenceCache cannot be used with a ScoreCache")
+    metrics = _check_metrics(metrics)
+    dtype = _check_dtype(dtype)
+    size = min(len(hypothesis_corpus), len(reference_corpus))
+    hypothesis_corpus = hypothesis_corpus[:size]
+    reference_corpus = reference_corpus[:size]
+
+    results = collections.OrderedDict()
+    missing = np.zeros(size, dtype=bool)
+    for name in metrics:
+        found, results[name] = score_cache.get_many(
+            name, hypothesis_corpus, reference_corpus, dtype
+        )
+        missing |= ~found
+    if timer is not None:
+        timer.count("cached_pairs", size - np.count_nonzero(missing))
+    if not missing.any():
+        return results
+
+    indices = np.flatnonzero(missing)
+    hypotheses = [hypothesis_corpus[i] for i in indices]
+    references = [reference_corpus[i] for i in indices]
+    scored = score_all(
+        hypotheses, references, embeddings, metrics, dtype=dtype, timer=timer, **kwargs
+    )
+    for name, result in scored.items():
+        results[name].scores[indices] = result.scores
+        results[name].skipped[indices] = result.skipped
+        score_cache.put_many(name, hypotheses, references, result, dtype)
+    return results
@@ -0,0 +1,460 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+A local scoring server that keeps the embeddings loaded.
+
+Clients POST batches of sentence pairs as JSON and get back sentence-level
+scores. Requests arriving close together are coalesced into one call of
+`batch.score_all`, so many small requests cost about as much as one large one.
+
+Endpoints:
+
+- POST /score: `{"hypotheses": [...], "references": [...], "metrics": [...]}`,
+  where each sentence is a list of tokens or a whitespace-separated string and
+  metrics is optional. The response maps "scores" and "skipped" to a dict of
+  lists, one per metric.
+- GET /stats: throughput and latency percentiles, see `ServerStats.snapshot`.
+- GET /health: `{"status": "ok"}`.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import collections
+import concurrent.futures
+import contextlib
+import json
+import logging
+import queue
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from urllib.request import Request
+from urllib.request import urlopen
+
+import numpy as np
+
+from embedding_based.batch import BatchScores
+from embedding_based.batch import METRICS
+from embedding_based.batch import _DEFAULT_DTYPE
+from embedding_based.batch import _check_dtype
+from embedding_based.batch import _check_metrics
+from embedding_based.batch import score_all
+from embedding_based.parallel import open_workers
+
+__all__ = [
+    "ServerStats",
+    "MicroBatcher",
+    "make_server",
+    "request_scores",
+]
+
+logger = logging.getLogger(__name__)
+
+# Largest number of sentence pairs coalesced into one batch. A single request
+# larger than this is still scored as a whole.
+_DEFAULT_MAX_BATCH_SIZE = 1024
+
+# Seconds to wait for more requests after the first one of a batch arrives.
+_DEFAULT_MAX_WAIT = 0.002
+
+# Number of recent requests the latency percentiles are computed over.
+_LATENCY_WINDOW = 10000
+
+
+class ServerStats(object):
+    """
+    Thread-safe counters of a scoring server.
+    """
+
+    def __init__(self, window=_LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self.started = time.time()
+        self.requests = 0
+        self.pairs = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record_batch(self):
+        with self._lock:
+            self.batches += 1
+
+    def record_request(self, pairs, latency):
+        """
+        :param pairs: number of sentence pairs of the request.
+        :param latency: seconds from submitting the request to its scores.
+        """
+        with self._lock:
+            self.requests += 1
+            self.pairs += pairs
+            self._latencies.append(latency)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        """
+        Return the stats as a dict of JSON-serializable values. Throughput is
+        averaged over the uptime, latency percentiles (in milliseconds) over
+        the most recent requests.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            uptime = time.time() - self.started
+            stats = collections.OrderedDict(
+                [
+                    ("uptime", uptime),
+                    ("requests", self.requests),
+                    ("pairs", self.pairs),
+                    ("batches", self.batches),
+                    ("errors", self.errors),
+                    (
+                        "pairs_per_batch",
+                        self.pairs / self.batches if self.batches else 0.0,
+                    ),
+                    ("requests_per_second", self.requests / uptime if uptime else 0.0),
+                    ("pairs_per_second", self.pairs / uptime if uptime else 0.0),
+                ]
+            )
+        for q in (50, 90, 99):
+            stats["latency_p%d_ms" % q] = (
+                float(np.percentile(latencies, q)) if len(latencies) else None
+            )
+        return stats
+
+
+# A request waiting in the queue of a MicroBatcher.
+_Pending = collections.namedtuple(
+    "_Pending", ["hypotheses", "references", "metrics", "future", "submitted"]
+)
+
+
+class MicroBatcher(object):
+    """
+    Score requests from many threads in batches on one scoring thread.
+
+    The scoring thread takes the first request in the queue, then keeps
+    taking requests until max_batch_size pairs are collected or max_wait
+    seconds have passed, scores them all with one `batch.score_all` call and
+    hands each request its slice of the scores.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        max_batch_size=_DEFAULT_MAX_BATCH_SIZE,
+        max_wait=_DEFAULT_MAX_WAIT,
+        dtype=_DEFAULT_DTYPE,
+        n_jobs=1,
+        stats=None,
+    ):
+        """
+        :param embeddings: a KeyedVectors or an EmbeddingStore.
+        :param max_batch_size: largest number of pairs of a batch.
+        :param max_wait: seconds to wait for a batch to fill up.
+        :param dtype: the dtype to compute in, see `batch.score_all`.
+        :param n_jobs: number of worker processes, see `batch.score_all`.
+            The pool is started with the scoring thread and shared by all the
+            batches.
+        :param stats: a ServerStats to record to, a new one if None.
+        """
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.dtype = _check_dtype(dtype)
+        self.n_jobs = n_jobs
+        self.stats = stats or ServerStats()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._workers = None
+        self._closing = None
+
+    def start(self):
+        """
+        Start the scoring thread.
+        """
+        if self._thread is None:
+            self._closing = contextlib.ExitStack()
+            self._workers = self._closing.enter_context(
+                open_workers(self.embeddings.vectors, self.n_jobs)
+            )
+            self._thread = threading.Thread(target=self._run, name="MicroBatcher")
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Score what is already queued, then stop the scoring thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._closing.close()
+            self._closing = self._workers = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, hypotheses, references, metrics=METRICS):
+        """
+        Queue a request for scoring.
+
+        :param hypotheses: a list of sentences.
+        :param references: a list of sentences, as many as hypotheses.
+        :param metrics: names of the metrics.
+        :return: a concurrent.futures.Future of an OrderedDict mapping each
+            metric name to a BatchScores.
+        """
+        if len(hypotheses) != len(references):
+            raise ValueError(
+                "%d hypotheses but %d references" % (len(hypotheses), len(references))
+            )
+        future = concurrent.futures.Future()
+        self._queue.put(
+            _Pending(
+                hypotheses=list(hypotheses),
+                references=list(references),
+                metrics=_check_metrics(metrics),
+                future=future,
+                submitted=time.time(),
+            )
+        )
+        return future
+
+    def score(self, hypotheses, references, metrics=METRICS, timeout=None):
+        """
+        Like `submit` but wait for the scores.
+        """
+        return self.submit(hypotheses, references, metrics).result(timeout)
+
+    def _collect(self):
+        """
+        Take the next batch of requests off the queue.
+
+        :return: a tuple of (batch, stop). stop is True if `close` was called.
+        """
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        size = len(first.hypotheses)
+        deadline = time.time() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                pending = self._queue.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                break
+            if pending is None:
+                return batch, True
+            batch.append(pending)
+            size += len(pending.hypotheses)
+        return batch, False
+
+    def _score_batch(self, batch):
+        hypotheses = []
+        references = []
+        for pending in batch:
+            hypotheses.extend(pending.hypotheses)
+            references.extend(pending.references)
+        metrics = [name for name in METRICS if any(name in p.metrics for p in batch)]
+        try:
+            results = score_all(
+                hypotheses,
+                references,
+                self.embeddings,
+                metrics,
+                n_jobs=self._workers,
+                dtype=self.dtype,
+            )
+        except Exception as e:
+            if len(batch) > 1:
+                # Score the requests one by one, so that only the ones
+                # failing by themselves fail.
+                for pending in batch:
+                    self._score_batch([pending])
+                return
+            self.stats.record_error()
+            batch[0].future.set_exception(e)
+            return
+        self.stats.record_batch()
+        start = 0
+        for pending in batch:
+            stop = start + len(pending.hypotheses)
+            pending.future.set_result(
+                collections.OrderedDict(
+                    (
+                        name,
+                        BatchScores(
+                            scores=results[name].scores[start:stop],
+                            skipped=results[name].skipped[start:stop],
+                        ),
+                    )
+                    for name in pending.metrics
+                )
+            )
+            self.stats.record_request(
+                len(pending.hypotheses), time.time() - pending.submitted
+            )
+            start = stop
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if batch:
+                self._score_batch(batch)
+
+
+def _parse_sentence(sentence):
+    if isinstance(sentence, str):
+        return sentence.split()
+    if not isinstance(sentence, list):
+        raise ValueError("a sentence is a string or a list of tokens")
+    for token in sentence:
+        if not isinstance(token, str):
+            raise ValueError("a token is a string, got %r" % (token,))
+    return sentence
+
+
+class _ScoringServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, batcher):
+        HTTPServer.__init__(self, address, _Handler)
+        self.batcher = batcher
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self.batcher.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Serve the endpoints listed in the module docstring.
+    """
+
+    server_version = "EmbeddingBased"
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.server.batcher.stats.snapshot())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "no such endpoint %r" % self.path})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self._send_json(404, {"error": "no such endpoint %r" % self.path})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            future = self.server.batcher.submit(
+                [_parse_sentence(s) for s in request["hypotheses"]],
+                [_parse_sentence(s) for s in request["references"]],
+                request.get("metrics", METRICS),
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": "bad request: %s" % e})
+            return
+        try:
+            results = future.result()
+        except Exception as e:
+            logger.exception("scoring failed")
+            self._send_json(500, {"error": "scoring failed: %s" % e})
+            return
+        self._send_json(
+            200,
+            {
+                "scores": {name: r.scores.tolist() for name, r in results.items()},
+                "skipped": {name: r.skipped.tolist() for name, r in results.items()},
+            },
+        )
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(embeddings, host="127.0.0.1", port=0, **batcher_options):
+    """
+    Make a scoring server. Call `serve_forever()` on it to serve, and
+    `shutdown()` then `server_close()` from another thread to stop it; the
+    batcher is started here and closed by `server_close()`.
+
+    :param embeddings: a KeyedVectors or an EmbeddingStore.
+    :param host: the address to bind to. Keep it local, there is no
+        authentication.
+    :param port: the port to bind to, 0 for any free port.
+    :param batcher_options: keyword arguments of `MicroBatcher`.
+    :return: a socketserver.BaseServer with a `batcher` attribute.
+    """
+    batcher = MicroBatcher(embeddings, **batcher_options)
+    server = _ScoringServer((host, port), batcher)
+    batcher.start()
+    return server
+
+
+def request_scores(url, hypotheses, references, metrics=METRICS, timeout=None):
+    """
+    Score sentence pairs on a running server.
+
+    :param url: the base URL of the server, e.g. "http://127.0.0.1:8750".
+    :param hypotheses: a list of sentences.
+    :param references: a list of sentences.
+    :param metrics: names of the metrics.
+    :param timeout: seconds to wait for the response.
+    :return: a dict mapping each metric name to a list of scores.
+    """
+    request = Request(
+        url.rstrip("/") + "/score",
+        data=json.dumps(
+            {
+                "hypotheses": list(hypotheses),
+                "references": list(references),
+                "metrics": list(metrics),
+            }
+        ).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))["scores"]
@@ -0,0 +1,165 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+A compact, pre-indexed on-disk format for word embeddings.
+
+A store is a directory holding the vocabulary, one word per line, and the
+embedding matrix as a ``.npy`` file. The matrix is opened with `np.memmap`,
+so many processes can share one page-cached copy and start up in no time.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+
+import numpy as np
+
+__all__ = [
+    "EmbeddingStore",
+    "save_embedding_store",
+    "load_embedding_store",
+    "is_embedding_store",
+]
+
+_VOCAB_FILE = "vocab.txt"
+_VECTORS_FILE = "vectors.npy"
+
+# Dtypes a store can be saved in.
+_STORE_DTYPES = (np.float32, np.float16)
+
+
+class EmbeddingStore(object):
+    """
+    Word embeddings backed by a plain (possibly memory-mapped) matrix.
+    It can be used anywhere a gensim KeyedVectors is accepted.
+    """
+
+    def __init__(self, words, vectors):
+        """
+        :param words: a list of words, one for each row of vectors.
+        :param vectors: a 2D ndarray.
+        """
+        if len(words) != len(vectors):
+            raise ValueError("%d words for %d vectors" % (len(words), len(vectors)))
+        self.index_to_key = list(words)
+        self.key_to_index = {word: index for index, word in enumerate(words)}
+        self.vectors = vectors
+
+    @property
+    def vector_size(self):
+        return self.vectors.shape[1]
+
+    def __len__(self):
+        return len(self.index_to_key)
+
+    def __contains__(self, word):
+        return word in self.key_to_index
+
+    def __getitem__(self, word):
+        """
+        Return the vector of word. Raise KeyError if word is OOV.
+        float16 vectors are handed out as float32.
+        """
+        vector = self.vectors[self.key_to_index[word]]
+        if vector.dtype == np.float16:
+            return vector.astype(np.float32)
+        return np.array(vector)
+
+
+def _check_store_dtype(dtype):
+    """
+    Raise ValueError if embeddings cannot be stored in dtype.
+
+    :return: a numpy dtype.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in _STORE_DTYPES:
+        raise ValueError("unsupported dtype %r" % dtype.name)
+    return dtype
+
+
+def _vocab_path(path):
+    return os.path.join(path, _VOCAB_FILE)
+
+
+def _vectors_path(path):
+    return os.path.join(path, _VECTORS_FILE)
+
+
+def is_embedding_store(path):
+    """
+    Tell whether path is a directory saved by `save_embedding_store`.
+
+    :param path: a path-like object.
+    :return: bool.
+    """
+    return os.path.isfile(_vocab_path(path)) and os.path.isfile(_vectors_path(path))
+
+
+def save_embedding_store(embeddings, path, dtype=np.float32):
+    """
+    Save embeddings to a store directory.
+
+    :param embeddings: a gensim KeyedVectors or an EmbeddingStore.
+    :param path: the directory to save to, created if not existing.
+    :param dtype: np.float32 or np.float16.
+    """
+    dtype = _check_store_dtype(dtype)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    words = getattr(embeddings, "index_to_key", None)
+    if words is None:
+        # gensim < 4.0.
+        words = embeddings.index2word
+    with io.open(_vocab_path(path), "w", encoding="utf-8", newline="\n") as f:
+        f.writelines("%s\n" % word for word in words)
+    np.save(
+        _vectors_path(path),
+        np.ascontiguousarray(embeddings.vectors, dtype=dtype),
+    )
+
+
+def load_embedding_store(path, mmap=True, dtype=None):
+    """
+    Load a store directory saved by `save_embedding_store`.
+
+    :param path: the directory of the store.
+    :param mmap: if True, the matrix is memory-mapped read-only instead of
+        read into memory.
+    :param dtype: np.float32 or np.float16 to convert the matrix to, if it
+        was saved in the other one. The converted matrix is read into memory.
+        None keeps the dtype it was saved in.
+    :return: an EmbeddingStore.
+    """
+    with io.open(_vocab_path(path), encoding="utf-8", newline="\n") as f:
+        # Words are only separated by "\n": splitlines() would also break
+        # words at "\r", "\x85", "\u2028" and the other Unicode line breaks.
+        words = f.read().split("\n")[:-1]
+    vectors = np.load(_vectors_path(path), mmap_mode="r" if mmap else None)
+    if dtype is not None and vectors.dtype != _check_store_dtype(dtype):
+        vectors = vectors.astype(dtype)
+    return EmbeddingStore(words, vectors)
@@ -31,6 +31,7 @@ from embedding_based.origin import greedy_match_score
 from embedding_based.metrics import average_corpus_level
 from embedding_based.metrics import extrema_corpus_level
 from embedding_based.metrics import greedy_match_corpus_level
+from embedding_based.metrics import evaluate_all
 
 from embedding_based.tests import EMBEDDINGS, PREDICTED, GROUND_TRUTH
 from embedding_based.utils import load_word2vec_binary as _load_word2vec_binary
@@ -120,3 +121,21 @@ class TestAgainstBaseline(unittest.TestCase):
             our_fn=greedy_match_corpus_level,
             their_fn=greedy_match_score,
         )
+
+
+class TestEvaluateAll(unittest.TestCase):
+    embeddings = TEST_DATA.embeddings
+
+    def test_evaluate_all(self):
+        predicted, _ = TEST_DATA.predicted
+        ground_truth, _ = TEST_DATA.ground_truth
+        results = evaluate_all(predicted, ground_truth, self.embeddings)
+        for name, corpus_fn in (
+            ("average", average_corpus_level),
+            ("extrema", extrema_corpus_level),
+            ("greedy_match", greedy_match_corpus_level),
+        ):
+            expected = corpus_fn(predicted, ground_truth, self.embeddings)
+            self.assertEqual(len(results[name].sentence_scores), len(predicted))
+            for our, their in zip(results[name].corpus_score, expected):
+                self.assertAlmostEqual(our, their)
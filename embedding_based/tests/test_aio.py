@@ -0,0 +1,115 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import unittest
+
+from embedding_based.aio import AsyncScorer
+from embedding_based.metrics import average_sentence_level
+from embedding_based.metrics import extrema_sentence_level
+from embedding_based.metrics import greedy_match_sentence_level
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+
+
+class TestAsyncScorer(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    hypothesis_corpus = load_corpus_from_file(PREDICTED) + [
+        "foo trees".split(),
+        "human foo bar".split(),
+    ]
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH) + [
+        "graph foo".split(),
+        "foo bar".split(),
+    ]
+
+    def test_sentence_level(self):
+        async def score_all(scorer):
+            return await asyncio.gather(
+                *(
+                    fn(hypothesis, reference)
+                    for fn in (
+                        scorer.average_sentence_level,
+                        scorer.extrema_sentence_level,
+                        scorer.greedy_match_sentence_level,
+                    )
+                    for hypothesis, reference in zip(
+                        self.hypothesis_corpus, self.reference_corpus
+                    )
+                )
+            )
+
+        async def main():
+            async with AsyncScorer(self.embeddings, max_wait=0.1) as scorer:
+                return await score_all(scorer), scorer.stats.snapshot()
+
+        scores, stats = asyncio.run(main())
+        expected = [
+            fn(hypothesis, reference, self.embeddings)
+            for fn in (
+                average_sentence_level,
+                extrema_sentence_level,
+                greedy_match_sentence_level,
+            )
+            for hypothesis, reference in zip(
+                self.hypothesis_corpus, self.reference_corpus
+            )
+        ]
+        for score, expected_score in zip(scores, expected):
+            self.assertAlmostEqual(score, expected_score, places=6)
+        self.assertEqual(stats["requests"], len(expected))
+        self.assertLess(stats["batches"], len(expected))
+
+    def test_max_batch_size(self):
+        async def main():
+            async with AsyncScorer(
+                self.embeddings, max_batch_size=4, max_wait=1
+            ) as scorer:
+                await asyncio.gather(
+                    *(
+                        scorer.average_sentence_level(["human"], ["graph"])
+                        for _ in range(8)
+                    )
+                )
+                return scorer.stats.snapshot()
+
+        stats = asyncio.run(main())
+        self.assertGreaterEqual(stats["batches"], 2)
+
+    def test_empty_sentence(self):
+        async def main():
+            async with AsyncScorer(self.embeddings) as scorer:
+                for sentence_fn in (
+                    scorer.extrema_sentence_level,
+                    scorer.greedy_match_sentence_level,
+                ):
+                    for pair in (([], ["human"]), (["human"], []), ([], [])):
+                        with self.assertRaises(ValueError):
+                            await sentence_fn(*pair)
+                self.assertEqual(scorer.stats.snapshot()["requests"], 0)
+                return await scorer.average_sentence_level([], ["human"])
+
+        self.assertEqual(asyncio.run(main()), 0)
@@ -0,0 +1,126 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import numpy as np
+
+from embedding_based.batch import pad_corpus
+from embedding_based.batch import average_scores
+from embedding_based.batch import extrema_scores
+from embedding_based.batch import greedy_match_scores
+from embedding_based.batch import score_all
+from embedding_based.batch import METRICS
+
+from embedding_based.metrics import average_sentence_level
+from embedding_based.metrics import extrema_sentence_level
+from embedding_based.metrics import greedy_match_sentence_level
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+
+
+class TestBatch(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    hypothesis_corpus = load_corpus_from_file(PREDICTED) + [
+        "foo trees".split(),
+        "human foo bar".split(),
+    ]
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH) + [
+        "graph foo".split(),
+        "foo bar".split(),
+    ]
+
+    def test_pad_corpus(self):
+        indices, lengths = pad_corpus([["human", "foo"], []], self.embeddings)
+        self.assertEqual(indices.shape, (2, 2))
+        self.assertEqual(lengths.tolist(), [2, 0])
+        self.assertEqual(indices[0, 0], self.embeddings.key_to_index["human"])
+        self.assertEqual(indices[0, 1], -1, msg="OOV word gets index -1")
+        self.assertEqual(indices[1].tolist(), [-1, -1], msg="padding gets index -1")
+
+    def _test_against_sentence_level(self, batch_fn, sentence_fn):
+        result = batch_fn(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        for score, hypothesis, reference in zip(
+            result.scores, self.hypothesis_corpus, self.reference_corpus
+        ):
+            self.assertAlmostEqual(
+                score, sentence_fn(hypothesis, reference, self.embeddings), places=6
+            )
+        return result
+
+    def test_average_scores(self):
+        result = self._test_against_sentence_level(
+            average_scores, average_sentence_level
+        )
+        self.assertFalse(result.skipped.any())
+
+    def test_extrema_scores(self):
+        self._test_against_sentence_level(extrema_scores, extrema_sentence_level)
+
+    def test_greedy_match_scores(self):
+        self._test_against_sentence_level(
+            greedy_match_scores, greedy_match_sentence_level
+        )
+
+    def test_skipped(self):
+        result = average_scores(
+            [["foo"], [], ["human"]], [["human"], ["human"], ["foo"]], self.embeddings
+        )
+        self.assertEqual(result.skipped.tolist(), [True, True, False])
+        self.assertEqual(result.scores[2], 0.0, msg="OOV reference scores zero")
+
+    def test_batch_size(self):
+        for batch_fn in (average_scores, extrema_scores, greedy_match_scores):
+            expected = batch_fn(
+                self.hypothesis_corpus, self.reference_corpus, self.embeddings
+            )
+            actual = batch_fn(
+                self.hypothesis_corpus,
+                self.reference_corpus,
+                self.embeddings,
+                batch_size=3,
+            )
+            self.assertTrue(np.allclose(expected.scores, actual.scores))
+            self.assertTrue((expected.skipped == actual.skipped).all())
+
+    def test_score_all(self):
+        results = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        self.assertEqual(list(results), list(METRICS))
+        for name, batch_fn in (
+            ("average", average_scores),
+            ("extrema", extrema_scores),
+            ("greedy_match", greedy_match_scores),
+        ):
+            expected = batch_fn(
+                self.hypothesis_corpus, self.reference_corpus, self.embeddings
+            )
+            self.assertTrue(np.allclose(results[name].scores, expected.scores))
+            self.assertTrue((results[name].skipped == expected.skipped).all())
+        with self.assertRaises(ValueError):
+            score_all([], [], self.embeddings, metrics=["bleu"])
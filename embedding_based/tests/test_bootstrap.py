@@ -0,0 +1,129 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import collections
+import unittest
+
+import numpy as np
+
+from embedding_based.batch import BatchScores
+from embedding_based.bootstrap import bootstrap_interval
+from embedding_based.bootstrap import bootstrap_means
+from embedding_based.bootstrap import bootstrap_systems
+from embedding_based.bootstrap import format_bootstrap
+from embedding_based.bootstrap import paired_bootstrap
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import compare_systems
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import score_systems
+
+
+class TestBootstrap(unittest.TestCase):
+    rng = np.random.RandomState(0)
+    scores = rng.rand(2000)
+
+    def test_bootstrap_means(self):
+        means = bootstrap_means(self.scores, resamples=500, seed=1)
+        self.assertEqual(means.shape, (500,))
+        np.testing.assert_array_equal(
+            means, bootstrap_means(self.scores, resamples=500, seed=1)
+        )
+        # The same as resampling one at a time with the same indices.
+        rng = np.random.RandomState(1)
+        indices = rng.randint(0, len(self.scores), (500, len(self.scores)))
+        np.testing.assert_allclose(means, self.scores[indices].mean(axis=1))
+        # Rows of a 2D array are resampled together.
+        stacked = bootstrap_means(np.stack([self.scores, 2 * self.scores]), 500, 1)
+        np.testing.assert_allclose(stacked, [means, 2 * means])
+        with self.assertRaises(ValueError):
+            bootstrap_means([])
+
+    def test_bootstrap_interval(self):
+        interval = bootstrap_interval(self.scores, resamples=2000)
+        self.assertAlmostEqual(interval.mean, self.scores.mean())
+        self.assertLess(interval.low, interval.mean)
+        self.assertGreater(interval.high, interval.mean)
+        # Close to the normal interval of the mean.
+        standard_error = self.scores.std() / np.sqrt(len(self.scores))
+        self.assertAlmostEqual(interval.standard_error, standard_error, delta=1e-3)
+        self.assertAlmostEqual(
+            interval.high - interval.low, 2 * 1.96 * standard_error, delta=2e-3
+        )
+
+    def test_paired_bootstrap(self):
+        better = self.scores + 0.02 + 0.05 * self.rng.randn(len(self.scores))
+        result = paired_bootstrap(better, self.scores)
+        self.assertAlmostEqual(result.difference, np.mean(better - self.scores))
+        self.assertGreater(result.low, 0)
+        self.assertLess(result.p_value, 0.01)
+
+        same = paired_bootstrap(self.scores, self.scores)
+        self.assertEqual((same.difference, same.p_value), (0.0, 1.0))
+
+        # A difference that is only noise is not significant.
+        noisy = self.scores + 0.05 * self.rng.randn(len(self.scores))
+        noisy -= np.mean(noisy - self.scores)
+        self.assertGreater(paired_bootstrap(noisy, self.scores).p_value, 0.5)
+        with self.assertRaises(ValueError):
+            paired_bootstrap(self.scores, self.scores[1:])
+
+    def test_bootstrap_systems(self):
+        embeddings = load_word2vec_binary(EMBEDDINGS)
+        systems = collections.OrderedDict([("a", PREDICTED), ("b", GROUND_TRUTH)])
+        system_scores = score_systems(
+            GROUND_TRUTH, systems, embeddings, metrics=["average", "greedy_match"]
+        )
+        comparison = compare_systems(
+            GROUND_TRUTH, systems, embeddings, metrics=["average", "greedy_match"]
+        )
+        results = bootstrap_systems(system_scores, resamples=200)
+        self.assertEqual(list(results), ["a", "b"])
+        for name, cells in results.items():
+            for metric, (interval, paired) in cells.items():
+                self.assertAlmostEqual(interval.mean, comparison[name][metric].mean)
+                self.assertEqual(paired is None, name == "a")
+        table = format_bootstrap(results).splitlines()
+        self.assertEqual(len(table), 3)
+        self.assertIn("p=", table[2])
+        self.assertNotIn("p=", table[1])
+
+    def test_skipped_pairs(self):
+        scores = BatchScores(
+            scores=np.array([0.5, 0.0, 0.7, 0.9]),
+            skipped=np.array([False, True, False, False]),
+        )
+        baseline = BatchScores(
+            scores=np.array([0.4, 0.6, 0.6, 0.0]),
+            skipped=np.array([False, False, False, True]),
+        )
+        results = bootstrap_systems(
+            collections.OrderedDict(
+                [("base", {"average": baseline}), ("new", {"average": scores})]
+            ),
+            resamples=100,
+        )
+        interval, paired = results["new"]["average"]
+        self.assertAlmostEqual(interval.mean, 0.7)
+        # Only the pairs kept by both systems are compared.
+        self.assertAlmostEqual(paired.difference, 0.1)
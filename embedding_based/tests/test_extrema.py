@@ -23,6 +23,7 @@
 import unittest
 import numpy as np
 
+from embedding_based.batch import _segment_extrema
 from embedding_based.metrics import _get_extrema
 from embedding_based.metrics import extrema_sentence_level
 from embedding_based.tests import EMBEDDINGS
@@ -43,6 +44,24 @@ class TestExtrema(unittest.TestCase):
         expected = np.abs(_get_extrema(vectors) - extrema) < 1e-5
         self.assertTrue(expected.all())
 
+    def test_get_extrema_ties(self):
+        vectors = np.array([[-2.0, -1.0], [2.0, 0.0]])
+        self.assertEqual(_get_extrema(vectors).tolist(), [2.0, -1.0])
+
+    def test_segment_extrema(self):
+        vectors = np.random.RandomState(0).randn(10, 4)
+        lengths = np.array([0, 3, 1, 0, 6, 0])
+        extrema = _segment_extrema(vectors, lengths)
+        self.assertEqual(extrema.shape, (len(lengths), 4))
+        start = 0
+        for length, actual in zip(lengths, extrema):
+            if length:
+                expected = _get_extrema(vectors[start : start + length])
+                self.assertTrue((actual == expected).all())
+            else:
+                self.assertTrue((actual == 0).all(), msg="empty segment gets zeros")
+            start += length
+
     def test_extrema_sentence_level(self):
         reference = "graphs eps eps".split()
         score_1 = extrema_sentence_level(
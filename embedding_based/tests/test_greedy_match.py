@@ -0,0 +1,62 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import numpy as np
+
+from embedding_based.metrics import _cos_sim
+from embedding_based.metrics import _greedy_match
+from embedding_based.metrics import _greedy_average
+from embedding_based.metrics import greedy_match_sentence_level
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.utils import load_word2vec_binary
+
+
+class TestGreedyMatch(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+
+    def test_greedy_match(self):
+        a = np.array([[1.0, 0.0], [0.0, 1.0]])
+        b = np.array([[1.0, 0.0], [0.0, 0.0]])
+        self.assertAlmostEqual(_greedy_match(a, b), 0.5)
+        self.assertAlmostEqual(_greedy_match(b, a), 0.5)
+        self.assertAlmostEqual(_greedy_average(a, b), 0.5)
+        with self.assertRaises(ValueError):
+            _greedy_match([], b)
+
+    def test_greedy_match_against_cos_sim(self):
+        rng = np.random.RandomState(0)
+        a = list(rng.randn(5, 10))
+        b = list(rng.randn(3, 10))
+        expected = sum(max(_cos_sim(a_i, b_i) for b_i in b) for a_i in a) / len(a)
+        self.assertAlmostEqual(_greedy_match(a, b), expected)
+
+    def test_greedy_match_sentence_level(self):
+        reference = "graph trees minors".split()
+        score_1 = greedy_match_sentence_level(
+            "human interface time".split(), reference, self.embeddings
+        )
+        score_2 = greedy_match_sentence_level(
+            "minors trees graph".split(), reference, self.embeddings
+        )
+        self.assertGreater(score_2, score_1)
+        self.assertAlmostEqual(score_2, 1.0, places=6)
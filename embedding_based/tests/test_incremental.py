@@ -0,0 +1,150 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from embedding_based.incremental import evaluate_appended
+from embedding_based.incremental import iter_appended_chunks
+from embedding_based.incremental import read_checkpoint
+from embedding_based.utils import evaluate_files
+from embedding_based.utils import load_word2vec_binary
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+
+
+class TestIncremental(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hypothesis_file = self.path("hypothesis.txt")
+        self.reference_file = self.path("reference.txt")
+        self.checkpoint = self.path("checkpoint.json")
+        with io.open(PREDICTED) as f:
+            self.hypothesis_lines = f.readlines()
+        with io.open(GROUND_TRUTH) as f:
+            self.reference_lines = f.readlines()
+        # Make them differ, so that the scores vary.
+        self.reference_lines = self.reference_lines[1:] + self.reference_lines[:1]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def append(self, hypothesis_lines, reference_lines):
+        with io.open(self.hypothesis_file, "a") as f:
+            f.writelines(hypothesis_lines)
+        with io.open(self.reference_file, "a") as f:
+            f.writelines(reference_lines)
+
+    def evaluate(self, **kwargs):
+        return evaluate_appended(
+            self.hypothesis_file,
+            self.reference_file,
+            self.embeddings,
+            self.checkpoint,
+            chunk_size=2,
+            score_files={"average": self.path("average.txt")},
+            **kwargs
+        )
+
+    def test_matches_full_run(self):
+        self.append(self.hypothesis_lines[:3], self.reference_lines[:3])
+        self.evaluate()
+        self.append(self.hypothesis_lines[3:], self.reference_lines[3:])
+        incremental = self.evaluate()
+        # Nothing appended: nothing scored, same result.
+        self.assertEqual(self.evaluate(), incremental)
+
+        full = evaluate_files(
+            self.hypothesis_file,
+            self.reference_file,
+            self.embeddings,
+            score_files={"average": self.path("full.txt")},
+        )
+        for name in full:
+            np.testing.assert_allclose(incremental[name], full[name], rtol=1e-9)
+        with io.open(self.path("average.txt")) as f, io.open(
+            self.path("full.txt")
+        ) as g:
+            self.assertEqual(f.read(), g.read())
+        checkpoint = read_checkpoint(self.checkpoint)
+        self.assertEqual(checkpoint["pairs"], len(self.hypothesis_lines))
+        self.assertEqual(
+            checkpoint["offsets"],
+            [
+                os.path.getsize(self.hypothesis_file),
+                os.path.getsize(self.reference_file),
+            ],
+        )
+
+    def test_incomplete_lines_wait(self):
+        self.append(self.hypothesis_lines[:2], self.reference_lines[:2])
+        self.append(["human interface"], ["computer\n"])
+        self.evaluate()
+        self.assertEqual(read_checkpoint(self.checkpoint)["pairs"], 2)
+        self.append([" computer\n"], [])
+        self.evaluate()
+        self.assertEqual(read_checkpoint(self.checkpoint)["pairs"], 3)
+        chunks = list(iter_appended_chunks(self.hypothesis_file, self.reference_file))
+        self.assertEqual(chunks[-1][0][-1], ["human", "interface", "computer"])
+
+    def test_scores_past_checkpoint_are_dropped(self):
+        self.append(self.hypothesis_lines[:3], self.reference_lines[:3])
+        self.evaluate()
+        with io.open(self.path("average.txt"), "a") as f:
+            f.write("0.5\n")
+        self.append(self.hypothesis_lines[3:], self.reference_lines[3:])
+        self.evaluate()
+        with io.open(self.path("average.txt")) as f:
+            self.assertEqual(len(f.readlines()), len(self.hypothesis_lines))
+
+    def test_invalid_checkpoint(self):
+        self.append(self.hypothesis_lines, self.reference_lines)
+        self.evaluate()
+        with self.assertRaises(ValueError):
+            self.evaluate(dtype=np.float64)
+        with self.assertRaises(ValueError):
+            evaluate_appended(
+                self.hypothesis_file,
+                self.reference_file,
+                self.embeddings,
+                self.checkpoint,
+            )
+        with io.open(self.hypothesis_file, "w") as f:
+            f.writelines(self.hypothesis_lines[:1])
+        with self.assertRaises(ValueError):
+            self.evaluate()
+
+
+if __name__ == "__main__":
+    unittest.main()
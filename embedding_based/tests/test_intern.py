@@ -0,0 +1,118 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from embedding_based.batch import score_all
+from embedding_based.intern import OOV_INDEX
+from embedding_based.intern import InternedCorpus
+from embedding_based.intern import intern_corpus
+from embedding_based.intern import gather
+from embedding_based.intern import vocabulary_fingerprint
+from embedding_based.store import EmbeddingStore
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+
+
+class TestIntern(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+
+    def test_intern_corpus(self):
+        corpus = intern_corpus([["human", "foo"], [], ["trees"]], self.embeddings)
+        self.assertEqual(len(corpus), 3)
+        self.assertEqual(corpus.indices.dtype, np.int32)
+        self.assertEqual(corpus.lengths.tolist(), [2, 0, 1])
+        self.assertEqual(
+            corpus[0].tolist(), [self.embeddings.key_to_index["human"], OOV_INDEX]
+        )
+        self.assertEqual(len(corpus[1]), 0)
+        self.assertEqual(corpus[1:].lengths.tolist(), [0, 1])
+        self.assertEqual(corpus[1:][1].tolist(), corpus[2].tolist())
+        self.assertIs(intern_corpus(corpus, self.embeddings), corpus)
+
+    def test_padded(self):
+        corpus = intern_corpus([["human", "foo"], [], ["trees"]], self.embeddings)
+        indices, lengths = corpus.padded()
+        self.assertEqual(indices.shape, (3, 2))
+        self.assertEqual(indices[2].tolist(), [corpus[2][0], OOV_INDEX])
+        indices, lengths = intern_corpus([], self.embeddings).padded()
+        self.assertEqual(indices.shape, (0, 1))
+
+    def test_gather(self):
+        indices = intern_corpus([["human", "foo"]], self.embeddings).indices
+        vectors = gather(self.embeddings.vectors, indices)
+        self.assertEqual(vectors.dtype, self.embeddings.vectors.dtype)
+        self.assertTrue((vectors[0] == self.embeddings["human"]).all())
+        self.assertTrue((vectors[1] == 0).all(), msg="OOV word gets a zero row")
+
+    def test_empty_vocabulary(self):
+        embeddings = load_word2vec_binary(EMBEDDINGS, vocabulary={"zzz"})
+        self.assertEqual(embeddings.vectors.shape[0], 0)
+        vectors = gather(embeddings.vectors, np.full((2, 3), OOV_INDEX))
+        self.assertEqual(vectors.shape, (2, 3, embeddings.vector_size))
+        self.assertTrue((vectors == 0).all())
+        corpus = [["zzz"], ["zzz", "yyy"]]
+        expected = score_all(corpus, corpus, self.embeddings)
+        actual = score_all(corpus, corpus, embeddings)
+        for name, result in expected.items():
+            self.assertTrue(np.array_equal(actual[name].scores, result.scores))
+
+    def test_score_all(self):
+        hypothesis_corpus = load_corpus_from_file(PREDICTED)
+        reference_corpus = load_corpus_from_file(GROUND_TRUTH)
+        expected = score_all(hypothesis_corpus, reference_corpus, self.embeddings)
+        actual = score_all(
+            intern_corpus(hypothesis_corpus, self.embeddings),
+            intern_corpus(reference_corpus, self.embeddings),
+            self.embeddings,
+        )
+        for name, result in expected.items():
+            self.assertTrue(np.array_equal(actual[name].scores, result.scores))
+
+    def test_save_and_load(self):
+        path = tempfile.mkdtemp()
+        try:
+            file = os.path.join(path, "corpus.npz")
+            corpus = intern_corpus(
+                load_corpus_from_file(PREDICTED), self.embeddings, fingerprint=True
+            )
+            self.assertEqual(
+                corpus.fingerprint, vocabulary_fingerprint(self.embeddings)
+            )
+            corpus.save(file)
+            loaded = InternedCorpus.load(file, self.embeddings)
+            self.assertTrue(np.array_equal(loaded.indices, corpus.indices))
+            self.assertTrue(np.array_equal(loaded.offsets, corpus.offsets))
+
+            other = EmbeddingStore(["human"], np.ones((1, 3), dtype=np.float32))
+            with self.assertRaises(ValueError):
+                InternedCorpus.load(file, other)
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,84 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import importlib
+import os
+import subprocess
+import sys
+import unittest
+
+import embedding_based
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def loaded_modules(statement, modules):
+    """
+    Run statement in a fresh interpreter and return which of modules it loads.
+    """
+    probe = "%s; import sys; print(' '.join(m for m in %r if m in sys.modules))" % (
+        statement,
+        modules,
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.check_output(
+        [sys.executable, "-c", probe], env=env, universal_newlines=True
+    )
+    return output.split()
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_exports_match_all(self):
+        for module, names in embedding_based._EXPORTS:
+            self.assertEqual(
+                list(names),
+                importlib.import_module("embedding_based." + module).__all__,
+            )
+
+    def test_attributes(self):
+        from embedding_based.batch import score_all
+
+        self.assertIs(embedding_based.score_all, score_all)
+        self.assertIn("score_all", dir(embedding_based))
+        with self.assertRaises(AttributeError):
+            embedding_based.no_such_name
+
+    def test_star_import(self):
+        namespace = {}
+        exec("from embedding_based import *", namespace)
+        self.assertTrue(set(embedding_based.__all__) <= set(namespace))
+
+    def test_package_loads_nothing(self):
+        self.assertEqual(
+            loaded_modules(
+                "import embedding_based", ["numpy", "embedding_based.metrics"]
+            ),
+            [],
+        )
+
+    def test_utils_loads_no_optional_modules(self):
+        modules = ["gensim", "scipy", "sqlite3", "multiprocessing", "gzip"]
+        self.assertEqual(loaded_modules("import embedding_based.utils", modules), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
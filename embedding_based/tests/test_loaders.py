@@ -0,0 +1,168 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from embedding_based import loaders
+from embedding_based.loaders import detect_embedding_format
+from embedding_based.loaders import read_embeddings
+from embedding_based.loaders import read_glove_text
+from embedding_based.loaders import read_word2vec_binary
+from embedding_based.loaders import read_word2vec_text
+from embedding_based.tests import EMBEDDINGS
+
+try:
+    from gensim.models import KeyedVectors
+except ImportError:
+    KeyedVectors = None
+
+
+def _write_text(path, words, vectors, header=True):
+    with io.open(path, "wb") as f:
+        if header:
+            f.write(("%d %d\n" % vectors.shape).encode("utf-8"))
+        for word, vector in zip(words, vectors):
+            numbers = " ".join(repr(float(x)) for x in vector)
+            f.write(("%s %s\n" % (word, numbers)).encode("utf-8"))
+
+
+def _write_binary(path, words, vectors):
+    with io.open(path, "wb") as f:
+        f.write(("%d %d\n" % vectors.shape).encode("utf-8"))
+        for word, vector in zip(words, vectors):
+            f.write(word.encode("utf-8") + b" ")
+            f.write(vector.astype("<f4").tobytes() + b"\n")
+
+
+def _gzip(path):
+    with io.open(path, "rb") as f, gzip.open(path + ".gz", "wb") as g:
+        shutil.copyfileobj(f, g)
+    return path + ".gz"
+
+
+class TestLoaders(unittest.TestCase):
+    embeddings = read_word2vec_binary(EMBEDDINGS)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.words = self.embeddings.index_to_key
+        self.vectors = self.embeddings.vectors
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def _assert_loaded(self, store, words=None):
+        words = self.words if words is None else words
+        self.assertEqual(store.index_to_key, list(words))
+        for word in words:
+            np.testing.assert_allclose(store[word], self.embeddings[word], atol=1e-6)
+
+    def test_formats(self):
+        paths = {
+            "word2vec_binary": self._path("vectors.bin"),
+            "word2vec_text": self._path("vectors.vec"),
+            "glove_text": self._path("glove.txt"),
+        }
+        _write_binary(paths["word2vec_binary"], self.words, self.vectors)
+        _write_text(paths["word2vec_text"], self.words, self.vectors)
+        _write_text(paths["glove_text"], self.words, self.vectors, header=False)
+        readers = {
+            "word2vec_binary": read_word2vec_binary,
+            "word2vec_text": read_word2vec_text,
+            "glove_text": read_glove_text,
+        }
+        for name, path in paths.items():
+            for path in (path, _gzip(path)):
+                self.assertEqual(detect_embedding_format(path), name)
+                self._assert_loaded(readers[name](path))
+                self._assert_loaded(read_embeddings(path))
+                store = read_embeddings(path, format=name, dtype=np.float16)
+                self.assertEqual(store.vectors.dtype, np.float16)
+
+    def test_vocabulary(self):
+        path = self._path("vectors.vec")
+        _write_text(path, self.words, self.vectors)
+        vocabulary = {"graph", "trees", "unknown"}
+        for path in (EMBEDDINGS, path):
+            store = read_embeddings(path, vocabulary=vocabulary)
+            self._assert_loaded(store, [w for w in self.words if w in vocabulary])
+
+    def test_chunk_boundaries(self):
+        paths = {
+            read_word2vec_binary: self._path("vectors.bin"),
+            read_word2vec_text: self._path("vectors.vec"),
+            read_glove_text: self._path("glove.txt"),
+        }
+        _write_binary(paths[read_word2vec_binary], self.words, self.vectors)
+        _write_text(paths[read_word2vec_text], self.words, self.vectors)
+        _write_text(paths[read_glove_text], self.words, self.vectors, header=False)
+        vocabulary = {"graph", "trees", "unknown"}
+        for chunk_size in (1, 7, 100):
+            with mock.patch.object(loaders, "_CHUNK_SIZE", chunk_size):
+                for reader, path in paths.items():
+                    self._assert_loaded(reader(path))
+                    self._assert_loaded(
+                        reader(path, vocabulary=vocabulary),
+                        [w for w in self.words if w in vocabulary],
+                    )
+
+    def test_repeated_and_spaced_words(self):
+        path = self._path("glove.txt")
+        words = ["a", "b c", "a"]
+        vectors = np.arange(6, dtype=np.float32).reshape((3, 2))
+        _write_text(path, words, vectors, header=False)
+        store = read_glove_text(path)
+        # The first vector of a repeated word is kept.
+        self.assertEqual(store.index_to_key, ["a", "b c"])
+        np.testing.assert_array_equal(store.vectors, vectors[:2])
+
+    def test_truncated_binary(self):
+        path = self._path("vectors.bin")
+        _write_binary(path, self.words, self.vectors)
+        with io.open(path, "rb") as f:
+            data = f.read()
+        with io.open(path, "wb") as f:
+            f.write(data[:-100])
+        with self.assertRaises(EOFError):
+            read_word2vec_binary(path)
+
+    @unittest.skipIf(KeyedVectors is None, "gensim is not installed")
+    def test_against_gensim(self):
+        expected = KeyedVectors.load_word2vec_format(EMBEDDINGS, binary=True)
+        self.assertEqual(self.embeddings.index_to_key, expected.index_to_key)
+        np.testing.assert_array_equal(self.embeddings.vectors, expected.vectors)
+        path = self._path("vectors.txt")
+        expected.save_word2vec_format(path, binary=False)
+        store = read_embeddings(path)
+        self.assertEqual(store.index_to_key, expected.index_to_key)
+        np.testing.assert_allclose(store.vectors, expected.vectors, atol=1e-6)
@@ -20,11 +20,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import json
 import unittest
 import numpy as np
 
 from embedding_based.metrics import _cos_sim
 from embedding_based.metrics import _map_to_embeddings
+from embedding_based.metrics import _compute_corpus_score
+from embedding_based.metrics import RunningScore
 
 from embedding_based.tests import EMBEDDINGS
 from embedding_based.utils import load_word2vec_binary
@@ -46,3 +49,36 @@ class TestMetricHelpers(unittest.TestCase):
             len(_map_to_embeddings(["computer", "trees", "graph"], self.embeddings))
             == 3
         )
+
+    def test_running_score(self):
+        scores = np.random.RandomState(0).rand(100)
+        running = RunningScore()
+        for start in range(0, len(scores), 30):
+            running.update(scores[start : start + 30])
+        running.update([])
+        self.assertEqual(running.count, len(scores))
+        for our, their in zip(running.corpus_score(), _compute_corpus_score(scores)):
+            self.assertAlmostEqual(our, their)
+        self.assertTrue(np.isnan(RunningScore().corpus_score().mean))
+
+    def test_merge_running_scores(self):
+        scores = np.random.RandomState(0).rand(100)
+        shards = []
+        for start, stop in [(0, 10), (10, 45), (45, 45), (45, 100)]:
+            shard = RunningScore()
+            shard.update(scores[start:stop], skipped=1)
+            # Through JSON, as between machines.
+            shards.append(
+                RunningScore.from_state(json.loads(json.dumps(shard.state())))
+            )
+        # In any grouping.
+        left = RunningScore().merge(shards[0]).merge(shards[1])
+        right = RunningScore().merge(shards[2]).merge(shards[3])
+        merged = left.merge(right)
+        self.assertEqual(merged.count, len(scores))
+        self.assertEqual(merged.skipped, 4)
+        for our, their in zip(merged.corpus_score(), _compute_corpus_score(scores)):
+            self.assertAlmostEqual(our, their)
+        self.assertEqual(
+            RunningScore.from_state({"count": 0, "mean": 0, "m2": 0}).skipped, 0
+        )
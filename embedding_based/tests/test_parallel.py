@@ -0,0 +1,144 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from embedding_based.batch import score_all
+from embedding_based.metrics import extrema_corpus_level
+from embedding_based.parallel import Workers
+from embedding_based.parallel import map_blocks
+from embedding_based.store import save_embedding_store
+from embedding_based.store import load_embedding_store
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import compare_systems
+from embedding_based.utils import evaluate_files
+from embedding_based.utils import load_corpus_from_file
+
+
+def _row_sums(vectors, rows):
+    return vectors[rows].sum()
+
+
+def _pid(vectors, block):
+    return os.getpid()
+
+
+class TestParallel(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    hypothesis_corpus = load_corpus_from_file(PREDICTED) * 5
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH)[::-1] * 5
+
+    def test_map_blocks(self):
+        blocks = [[0, 1], [2], [3, 4, 5]]
+        vectors = self.embeddings.vectors
+        expected = [_row_sums(vectors, rows) for rows in blocks]
+        self.assertEqual(
+            list(map_blocks(_row_sums, vectors, blocks, n_jobs=2)), expected
+        )
+
+    def _test_against_serial(self, embeddings):
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, embeddings, batch_size=4
+        )
+        for n_jobs in (2, 3):
+            actual = score_all(
+                self.hypothesis_corpus,
+                self.reference_corpus,
+                embeddings,
+                batch_size=4,
+                n_jobs=n_jobs,
+            )
+            for name, result in expected.items():
+                self.assertTrue(np.array_equal(actual[name].scores, result.scores))
+                self.assertTrue(np.array_equal(actual[name].skipped, result.skipped))
+
+    def test_shared_memory(self):
+        self._test_against_serial(self.embeddings)
+
+    def test_memmap(self):
+        path = tempfile.mkdtemp()
+        try:
+            save_embedding_store(self.embeddings, path)
+            self._test_against_serial(load_embedding_store(path))
+        finally:
+            shutil.rmtree(path)
+
+    def test_corpus_level(self):
+        self.assertEqual(
+            extrema_corpus_level(
+                self.hypothesis_corpus, self.reference_corpus, self.embeddings
+            ),
+            extrema_corpus_level(
+                self.hypothesis_corpus,
+                self.reference_corpus,
+                self.embeddings,
+                n_jobs=2,
+            ),
+        )
+
+    def test_workers_reused(self):
+        vectors = self.embeddings.vectors
+        with Workers(vectors, n_jobs=2) as workers:
+            pids = set()
+            for _ in range(3):
+                pids.update(map_blocks(_pid, vectors, range(8), n_jobs=workers))
+                self.assertEqual(
+                    score_all(
+                        self.hypothesis_corpus,
+                        self.reference_corpus,
+                        self.embeddings,
+                        batch_size=4,
+                        n_jobs=workers,
+                    )["average"].scores.tolist(),
+                    score_all(
+                        self.hypothesis_corpus,
+                        self.reference_corpus,
+                        self.embeddings,
+                        batch_size=4,
+                    )["average"].scores.tolist(),
+                )
+            # The same two processes ran every call.
+            self.assertLessEqual(len(pids), 2)
+            self.assertNotIn(os.getpid(), pids)
+            with self.assertRaises(ValueError):
+                list(map_blocks(_pid, vectors.copy(), range(2), n_jobs=workers))
+
+    def test_evaluate_files(self):
+        self.assertEqual(
+            evaluate_files(PREDICTED, GROUND_TRUTH, self.embeddings, chunk_size=2),
+            evaluate_files(
+                PREDICTED, GROUND_TRUTH, self.embeddings, chunk_size=2, n_jobs=2
+            ),
+        )
+        systems = {"a": PREDICTED, "b": GROUND_TRUTH}
+        self.assertEqual(
+            compare_systems(GROUND_TRUTH, systems, self.embeddings),
+            compare_systems(GROUND_TRUTH, systems, self.embeddings, n_jobs=2),
+        )
@@ -0,0 +1,216 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from embedding_based.batch import score_all
+from embedding_based.batch import METRICS
+from embedding_based.metrics import average_sentence_level
+from embedding_based.metrics import extrema_sentence_level
+from embedding_based.metrics import greedy_match_sentence_level
+from embedding_based.metrics import average_corpus_level
+from embedding_based.metrics import extrema_corpus_level
+from embedding_based.metrics import greedy_match_corpus_level
+from embedding_based.origin import average_score
+from embedding_based.origin import extrema_score
+from embedding_based.origin import greedy_match_score
+from embedding_based.store import EmbeddingStore
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.utils import load_word2vec_binary
+
+# The accuracy guarantees documented in the README.
+# Computing in float32 instead of float64, every sentence-level score.
+FLOAT32_TOLERANCE = 1e-6
+# Storing in float16 instead of float32, every sentence-level score of
+# Average and Greedy Matching, and the corpus-level mean of all metrics.
+FLOAT16_TOLERANCE = 1e-3
+
+
+def _random_embeddings(vocab_size, vector_size, seed, positive=False):
+    rng = np.random.RandomState(seed)
+    vectors = rng.randn(vocab_size, vector_size).astype(np.float32)
+    if positive:
+        # Unit vectors with positive components, which the baseline Greedy
+        # Matching takes for granted.
+        vectors = np.abs(vectors)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    words = ["w%d" % i for i in range(vocab_size)]
+    return EmbeddingStore(words, vectors)
+
+
+def _random_corpus(size, vocab_size, seed, oov=True, max_length=50):
+    """
+    Make a corpus of random sentences. If oov, about one word in ten is OOV.
+    """
+    rng = np.random.RandomState(seed)
+    high = vocab_size * 11 // 10 if oov else vocab_size
+    return [
+        ["w%d" % i for i in rng.randint(0, high, length)]
+        for length in rng.randint(1, max_length, size)
+    ]
+
+
+class TestPrecision(unittest.TestCase):
+    embeddings = _random_embeddings(1000, 300, seed=0)
+    hypothesis_corpus = _random_corpus(500, 1000, seed=1)
+    reference_corpus = _random_corpus(500, 1000, seed=2)
+
+    def test_float32(self):
+        float32 = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        float64 = score_all(
+            self.hypothesis_corpus,
+            self.reference_corpus,
+            self.embeddings,
+            dtype=np.float64,
+        )
+        for name in METRICS:
+            np.testing.assert_allclose(
+                float32[name].scores,
+                float64[name].scores,
+                rtol=0,
+                atol=FLOAT32_TOLERANCE,
+            )
+            np.testing.assert_array_equal(float32[name].skipped, float64[name].skipped)
+
+    def test_float32_sentence_level(self):
+        for sentence_fn in (
+            average_sentence_level,
+            extrema_sentence_level,
+            greedy_match_sentence_level,
+        ):
+            for hypothesis, reference in zip(
+                self.hypothesis_corpus[:50], self.reference_corpus[:50]
+            ):
+                self.assertAlmostEqual(
+                    sentence_fn(hypothesis, reference, self.embeddings),
+                    sentence_fn(
+                        hypothesis, reference, self.embeddings, dtype=np.float64
+                    ),
+                    delta=FLOAT32_TOLERANCE,
+                )
+
+    def test_float16_storage(self):
+        embeddings = EmbeddingStore(
+            self.embeddings.index_to_key, self.embeddings.vectors.astype(np.float16)
+        )
+        float16 = score_all(self.hypothesis_corpus, self.reference_corpus, embeddings)
+        float32 = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        for name in METRICS:
+            self.assertAlmostEqual(
+                float16[name].scores.mean(),
+                float32[name].scores.mean(),
+                delta=FLOAT16_TOLERANCE,
+            )
+        # Extrema picks the minimum or the maximum of each dimension, which
+        # rounding may flip when they are close, so only its mean is bounded.
+        for name in ("average", "greedy_match"):
+            np.testing.assert_allclose(
+                float16[name].scores,
+                float32[name].scores,
+                rtol=0,
+                atol=FLOAT16_TOLERANCE,
+            )
+
+    def test_float16_storage_sentence_level(self):
+        embeddings = EmbeddingStore(
+            self.embeddings.index_to_key, self.embeddings.vectors.astype(np.float16)
+        )
+        hypothesis, reference = self.hypothesis_corpus[0], self.reference_corpus[0]
+        score = greedy_match_sentence_level(hypothesis, reference, embeddings)
+        self.assertIsInstance(score, np.float32)
+        self.assertAlmostEqual(
+            score,
+            greedy_match_sentence_level(hypothesis, reference, self.embeddings),
+            delta=FLOAT16_TOLERANCE,
+        )
+
+    def test_unsupported_dtype(self):
+        with self.assertRaises(ValueError):
+            score_all(
+                self.hypothesis_corpus,
+                self.reference_corpus,
+                self.embeddings,
+                dtype=np.float16,
+            )
+        with self.assertRaises(ValueError):
+            average_sentence_level(["w1"], ["w2"], self.embeddings, dtype=np.float16)
+
+    def test_load_float16(self):
+        embeddings = load_word2vec_binary(EMBEDDINGS, dtype=np.float16)
+        self.assertEqual(embeddings.vectors.dtype, np.float16)
+        restricted = load_word2vec_binary(
+            EMBEDDINGS, vocabulary=set(embeddings.index_to_key), dtype=np.float16
+        )
+        self.assertEqual(restricted.vectors.dtype, np.float16)
+        np.testing.assert_array_equal(restricted.vectors, embeddings.vectors)
+        with self.assertRaises(ValueError):
+            load_word2vec_binary(EMBEDDINGS, dtype=np.float64)
+
+
+class TestPrecisionAgainstBaseline(unittest.TestCase):
+    """
+    Compare the float32 corpus-level scores to the baseline, which computes
+    Average in float64. The corpora have no OOV words, on which the baseline
+    and we differ by design.
+    """
+
+    embeddings = _random_embeddings(1000, 300, seed=0, positive=True)
+    hypothesis_corpus = _random_corpus(200, 1000, seed=1, oov=False)
+    reference_corpus = _random_corpus(200, 1000, seed=2, oov=False)
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.hypothesis_file = os.path.join(self.path, "hypothesis.txt")
+        self.reference_file = os.path.join(self.path, "reference.txt")
+        for path, corpus in (
+            (self.hypothesis_file, self.hypothesis_corpus),
+            (self.reference_file, self.reference_corpus),
+        ):
+            with io.open(path, "w") as f:
+                f.writelines("%s\n" % " ".join(sentence) for sentence in corpus)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _test_one_metric(self, our_fn, their_fn):
+        ours = our_fn(self.hypothesis_corpus, self.reference_corpus, self.embeddings)
+        theirs = their_fn(self.hypothesis_file, self.reference_file, self.embeddings)
+        for our, their in zip(ours, theirs):
+            self.assertAlmostEqual(our, their, delta=FLOAT32_TOLERANCE)
+
+    def test_average(self):
+        self._test_one_metric(average_corpus_level, average_score)
+
+    def test_extrema(self):
+        self._test_one_metric(extrema_corpus_level, extrema_score)
+
+    def test_greedy_match(self):
+        self._test_one_metric(greedy_match_corpus_level, greedy_match_score)
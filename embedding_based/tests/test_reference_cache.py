@@ -0,0 +1,129 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from embedding_based.batch import ReferenceCache
+from embedding_based.batch import score_all
+from embedding_based.metrics import average_corpus_level
+from embedding_based.metrics import extrema_corpus_level
+from embedding_based.metrics import greedy_match_corpus_level
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+from embedding_based.utils import load_reference_cache
+
+
+class TestReferenceCache(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    hypothesis_corpus = load_corpus_from_file(PREDICTED) + [["foo"], ["human"]]
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH) + [["trees"], []]
+
+    def _assert_same_scores(self, cache, metrics, **kwargs):
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings, metrics
+        )
+        actual = score_all(
+            self.hypothesis_corpus, cache, self.embeddings, metrics, **kwargs
+        )
+        for name, result in expected.items():
+            self.assertTrue(np.allclose(actual[name].scores, result.scores))
+            self.assertTrue(np.array_equal(actual[name].skipped, result.skipped))
+
+    def test_build(self):
+        cache = ReferenceCache.build(
+            self.reference_corpus, self.embeddings, batch_size=4
+        )
+        self.assertEqual(len(cache), len(self.reference_corpus))
+        self.assertEqual(
+            len(cache.arrays["tokens"]), sum(map(len, self.reference_corpus))
+        )
+        norms = np.linalg.norm(cache.arrays["average"], axis=1)
+        self.assertTrue(np.allclose(norms[:-1], 1.0))
+        self._assert_same_scores(cache, ["average", "extrema", "greedy_match"])
+        self._assert_same_scores(cache, ["greedy_match"], batch_size=3)
+
+    def test_corpus_level(self):
+        cache = ReferenceCache.build(self.reference_corpus, self.embeddings)
+        for corpus_fn in (
+            average_corpus_level,
+            extrema_corpus_level,
+            greedy_match_corpus_level,
+        ):
+            expected = corpus_fn(
+                self.hypothesis_corpus, self.reference_corpus, self.embeddings
+            )
+            actual = corpus_fn(self.hypothesis_corpus, cache, self.embeddings)
+            for our, their in zip(actual, expected):
+                self.assertAlmostEqual(our, their)
+
+    def test_missing_metric(self):
+        cache = ReferenceCache.build(
+            self.reference_corpus, self.embeddings, metrics=["average"]
+        )
+        with self.assertRaises(ValueError):
+            score_all(self.hypothesis_corpus, cache, self.embeddings, ["extrema"])
+
+    def test_empty(self):
+        cache = ReferenceCache.build([], self.embeddings)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(
+            cache.arrays["extrema"].shape, (0, self.embeddings.vector_size)
+        )
+
+    def test_save_and_load(self):
+        path = tempfile.mkdtemp()
+        try:
+            cache = load_reference_cache(
+                GROUND_TRUTH, EMBEDDINGS, self.embeddings, path
+            )
+            files = os.listdir(path)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].endswith(".npz"))
+            loaded = load_reference_cache(
+                GROUND_TRUTH, EMBEDDINGS, self.embeddings, path
+            )
+            self.assertEqual(loaded.metrics, cache.metrics)
+            for key, value in cache.arrays.items():
+                self.assertTrue(np.array_equal(loaded.arrays[key], value))
+            load_reference_cache(
+                GROUND_TRUTH, EMBEDDINGS, self.embeddings, path, metrics=["average"]
+            )
+            self.assertEqual(len(os.listdir(path)), 2, msg="metrics are in the key")
+            load_reference_cache(
+                GROUND_TRUTH,
+                EMBEDDINGS,
+                load_word2vec_binary(EMBEDDINGS, dtype=np.float16),
+                path,
+            )
+            self.assertEqual(
+                len(os.listdir(path)), 3, msg="the storage dtype is in the key"
+            )
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,156 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import warnings
+
+import numpy as np
+
+from embedding_based.batch import ReferenceCache
+from embedding_based.batch import SentenceMemo
+from embedding_based.batch import score_all
+from embedding_based.intern import intern_corpus
+from embedding_based.schedule import contiguous_blocks
+from embedding_based.schedule import padding_waste
+from embedding_based.schedule import schedule_pairs
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+
+
+class TestSchedule(unittest.TestCase):
+    rng = np.random.RandomState(0)
+    hyp_lengths = np.clip(rng.lognormal(3, 1, 5000), 0, 500).astype(int)
+    ref_lengths = np.clip(rng.lognormal(3, 1, 5000), 0, 500).astype(int)
+
+    def test_schedule_pairs(self):
+        budget = 1 << 20
+        schedule = schedule_pairs(self.hyp_lengths, self.ref_lengths, budget, 100)
+        # Every pair lands in exactly one block.
+        np.testing.assert_array_equal(
+            np.sort(np.concatenate(schedule.blocks)), np.arange(5000)
+        )
+        for block in schedule.blocks:
+            if len(block) > 1:
+                items = len(block) * (
+                    3 * self.hyp_lengths[block].max() * self.ref_lengths[block].max()
+                    + 2
+                    * (self.hyp_lengths[block].max() + self.ref_lengths[block].max())
+                    * 100
+                )
+                self.assertLessEqual(items * 4, budget)
+        contiguous = padding_waste(
+            self.hyp_lengths, self.ref_lengths, contiguous_blocks(5000, 128)
+        )
+        self.assertGreater(contiguous, 0.9)
+        self.assertLess(schedule.padding_waste, 0.4)
+
+    def test_padding_waste(self):
+        self.assertEqual(padding_waste([2, 2], [3, 3], [slice(0, 2)]), 0.0)
+        self.assertAlmostEqual(padding_waste([1, 3], [3, 3], [slice(0, 2)]), 1.0 / 3)
+        self.assertEqual(padding_waste([1, 3], [3, 3], [[0], [1]]), 0.0)
+        self.assertEqual(padding_waste([], [], []), 0.0)
+
+    def test_edge_cases(self):
+        self.assertEqual(schedule_pairs([], [], 1000, 10).blocks, [])
+        # A pair over budget still gets a block of its own.
+        schedule = schedule_pairs([500, 500], [500, 500], 1, 10)
+        self.assertEqual([len(block) for block in schedule.blocks], [1, 1])
+        with self.assertRaises(ValueError):
+            schedule_pairs([1], [1], 0, 10)
+
+    def test_empty_sentences(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            schedule = schedule_pairs([0] * 1000 + [3], [0] * 1000 + [0], 1 << 20, 10)
+        # Empty pairs share blocks like any other short pairs.
+        self.assertLessEqual(len(schedule.blocks), 2)
+        np.testing.assert_array_equal(
+            np.sort(np.concatenate(schedule.blocks)), np.arange(1001)
+        )
+
+
+class TestScheduledScoring(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    # Lengths from 0 to a few hundred, with OOV words.
+    hypothesis_corpus = load_corpus_from_file(PREDICTED) + [
+        [],
+        "foo bar".split(),
+        "human interface computer".split() * 100,
+    ]
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH) + [
+        "graph".split(),
+        [],
+        "graph trees minors survey".split() * 60,
+    ]
+
+    def _assert_same(self, results, expected):
+        for name, result in expected.items():
+            np.testing.assert_allclose(results[name].scores, result.scores, atol=1e-6)
+            np.testing.assert_array_equal(results[name].skipped, result.skipped)
+
+    def test_score_all(self):
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        for memory_budget in (1, 1 << 16, 1 << 30):
+            self._assert_same(
+                score_all(
+                    self.hypothesis_corpus,
+                    self.reference_corpus,
+                    self.embeddings,
+                    memory_budget=memory_budget,
+                ),
+                expected,
+            )
+            self._assert_same(
+                score_all(
+                    self.hypothesis_corpus,
+                    self.reference_corpus,
+                    self.embeddings,
+                    memo=SentenceMemo(),
+                    memory_budget=memory_budget,
+                ),
+                expected,
+            )
+            reference = ReferenceCache.build(self.reference_corpus, self.embeddings)
+            self._assert_same(
+                score_all(
+                    self.hypothesis_corpus,
+                    reference,
+                    self.embeddings,
+                    memory_budget=memory_budget,
+                ),
+                expected,
+            )
+
+    def test_interned_take(self):
+        corpus = intern_corpus(self.hypothesis_corpus, self.embeddings)
+        rows = np.array([3, 0, len(corpus) - 2, 3])
+        taken = corpus.take(rows)
+        self.assertEqual(len(taken), 4)
+        for i, row in enumerate(rows):
+            np.testing.assert_array_equal(taken[i], corpus[row])
+        self.assertEqual(len(corpus.take(np.array([], dtype=int))), 0)
@@ -0,0 +1,204 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from embedding_based.batch import BatchScores
+from embedding_based.batch import ReferenceCache
+from embedding_based.batch import score_all
+from embedding_based.metrics import evaluate_all
+from embedding_based.metrics import greedy_match_sentence_level
+from embedding_based.score_cache import ScoreCache
+from embedding_based.score_cache import cached_score_all
+from embedding_based.score_cache import embedding_fingerprint
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+
+
+class TestScoreCache(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    hypothesis_corpus = load_corpus_from_file(PREDICTED) + [
+        "foo trees".split(),
+        "human foo bar".split(),
+    ]
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH) + [
+        "graph foo".split(),
+        "foo bar".split(),
+    ]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "scores.db")
+        self.fingerprint = embedding_fingerprint(self.embeddings)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_cached_score_all(self):
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        with ScoreCache(self.path, self.fingerprint) as cache:
+            first = cached_score_all(
+                self.hypothesis_corpus, self.reference_corpus, self.embeddings, cache
+            )
+            self.assertEqual(cache.hits, 0)
+        # Reopened, every pair is a hit and the embeddings are never used.
+        with ScoreCache(self.path, self.fingerprint) as cache:
+            second = cached_score_all(
+                self.hypothesis_corpus, self.reference_corpus, None, cache
+            )
+            self.assertEqual(cache.misses, 0)
+            self.assertEqual(cache.stats()["hit_rate"], 1.0)
+        for name, result in expected.items():
+            for cached in (first, second):
+                np.testing.assert_allclose(cached[name].scores, result.scores)
+                np.testing.assert_array_equal(cached[name].skipped, result.skipped)
+
+    def test_partial_hits(self):
+        with ScoreCache(self.path, self.fingerprint) as cache:
+            cached_score_all(
+                self.hypothesis_corpus[:3],
+                self.reference_corpus[:3],
+                self.embeddings,
+                cache,
+                ["average"],
+            )
+            result = cached_score_all(
+                self.hypothesis_corpus,
+                self.reference_corpus,
+                self.embeddings,
+                cache,
+                ["average"],
+            )
+            self.assertEqual(cache.hits, 3)
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings, ["average"]
+        )
+        np.testing.assert_allclose(result["average"].scores, expected["average"].scores)
+
+    def test_fingerprint(self):
+        with ScoreCache(self.path, self.fingerprint) as cache:
+            cached_score_all(
+                self.hypothesis_corpus, self.reference_corpus, self.embeddings, cache
+            )
+        with ScoreCache(self.path, "other embeddings") as cache:
+            cached_score_all(
+                self.hypothesis_corpus, self.reference_corpus, self.embeddings, cache
+            )
+            self.assertEqual(cache.hits, 0)
+
+    def test_lru_eviction(self):
+        def put(cache, word, score):
+            cache.put_many(
+                "average",
+                [[word]],
+                [[word]],
+                BatchScores(scores=np.array([score]), skipped=np.zeros(1, bool)),
+            )
+
+        with ScoreCache(self.path, self.fingerprint, max_entries=2) as cache:
+            put(cache, "a", 0.1)
+            put(cache, "b", 0.2)
+            # Using "a" makes "b" the least recently used.
+            cache.get_many("average", [["a"]], [["a"]])
+            put(cache, "c", 0.3)
+            self.assertEqual(len(cache), 2)
+            found, result = cache.get_many(
+                "average", [["a"], ["b"], ["c"]], [["a"], ["b"], ["c"]]
+            )
+            self.assertEqual(found.tolist(), [True, False, True])
+            self.assertEqual(result.scores.tolist(), [0.1, 0.0, 0.3])
+
+    def test_lookups_do_not_write(self):
+        def put(cache, word, score):
+            cache.put_many(
+                "average",
+                [[word]],
+                [[word]],
+                BatchScores(scores=np.array([score]), skipped=np.zeros(1, bool)),
+            )
+
+        with ScoreCache(self.path, self.fingerprint, max_entries=2) as cache:
+            put(cache, "a", 0.1)
+            put(cache, "b", 0.2)
+            put(cache, "a", 0.1)
+            self.assertEqual(len(cache), 2)
+            changes = cache._conn.total_changes
+            cache.get_many("average", [["b"]], [["b"]])
+            self.assertEqual(cache._conn.total_changes, changes)
+        # The recency of "b" is written back on close.
+        with ScoreCache(self.path, self.fingerprint, max_entries=2) as cache:
+            self.assertEqual(len(cache), 2)
+            put(cache, "c", 0.3)
+            found, _ = cache.get_many(
+                "average", [["a"], ["b"], ["c"]], [["a"], ["b"], ["c"]]
+            )
+            self.assertEqual(found.tolist(), [False, True, True])
+
+    def test_sentence_level(self):
+        hypothesis, reference = self.hypothesis_corpus[-1], self.reference_corpus[-1]
+        with ScoreCache(self.path, self.fingerprint) as cache:
+            for _ in range(2):
+                score = greedy_match_sentence_level(
+                    hypothesis, reference, self.embeddings, score_cache=cache
+                )
+                self.assertAlmostEqual(
+                    score,
+                    greedy_match_sentence_level(hypothesis, reference, self.embeddings),
+                )
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_evaluate_all(self):
+        expected = evaluate_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        with ScoreCache(self.path, self.fingerprint) as cache:
+            for _ in range(2):
+                results = evaluate_all(
+                    self.hypothesis_corpus,
+                    self.reference_corpus,
+                    self.embeddings,
+                    score_cache=cache,
+                )
+                for name, result in expected.items():
+                    for our, their in zip(
+                        results[name].corpus_score, result.corpus_score
+                    ):
+                        self.assertAlmostEqual(our, their)
+        with ScoreCache(self.path, self.fingerprint) as cache:
+            with self.assertRaises(ValueError):
+                cached_score_all(
+                    self.hypothesis_corpus,
+                    ReferenceCache.build(self.reference_corpus, self.embeddings),
+                    self.embeddings,
+                    cache,
+                )
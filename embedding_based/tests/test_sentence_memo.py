@@ -0,0 +1,141 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import numpy as np
+
+from embedding_based.batch import ReferenceCache
+from embedding_based.batch import SentenceMemo
+from embedding_based.batch import score_all
+from embedding_based.intern import intern_corpus
+from embedding_based.metrics import average_corpus_level
+from embedding_based.metrics import extrema_corpus_level
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+
+
+class TestSentenceMemo(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    # Duplicate-heavy, with OOV words and an empty sentence.
+    hypothesis_corpus = (load_corpus_from_file(PREDICTED) + [[], "foo bar".split()]) * 3
+    reference_corpus = (load_corpus_from_file(GROUND_TRUTH) + ["foo".split(), []]) * 3
+
+    def _assert_same(self, results, expected):
+        for name, result in expected.items():
+            np.testing.assert_allclose(results[name].scores, result.scores, atol=1e-7)
+            np.testing.assert_array_equal(results[name].skipped, result.skipped)
+
+    def test_score_all(self):
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        memo = SentenceMemo()
+        for batch_size in (4, 128):
+            results = score_all(
+                self.hypothesis_corpus,
+                self.reference_corpus,
+                self.embeddings,
+                batch_size=batch_size,
+                memo=memo,
+            )
+            self._assert_same(results, expected)
+        unique = len(set(map(tuple, self.hypothesis_corpus + self.reference_corpus)))
+        self.assertEqual(memo.misses, unique)
+        self.assertEqual(len(memo), unique)
+        self.assertEqual(memo.hits + memo.misses, 2 * 2 * len(self.hypothesis_corpus))
+
+    def test_reference_cache(self):
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        memo = SentenceMemo()
+        reference = ReferenceCache.build(
+            self.reference_corpus, self.embeddings, memo=memo
+        )
+        results = score_all(
+            self.hypothesis_corpus, reference, self.embeddings, memo=memo
+        )
+        self._assert_same(results, expected)
+
+    def test_missing_arrays(self):
+        memo = SentenceMemo()
+        score_all(
+            self.hypothesis_corpus,
+            self.reference_corpus,
+            self.embeddings,
+            ["average"],
+            memo=memo,
+        )
+        hits = memo.hits
+        # The entries have no Extrema vectors yet, so they all miss.
+        results = score_all(
+            self.hypothesis_corpus,
+            self.reference_corpus,
+            self.embeddings,
+            ["extrema"],
+            memo=memo,
+        )
+        self.assertEqual(memo.hits - hits, 2 * len(self.hypothesis_corpus) - len(memo))
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings, ["extrema"]
+        )
+        self._assert_same(results, expected)
+
+    def test_lru(self):
+        memo = SentenceMemo(max_size=2)
+        memo.put("a", {"sum": 1})
+        memo.put("b", {"sum": 2})
+        self.assertIsNotNone(memo.get("a", ["sum"]))
+        memo.put("c", {"sum": 3})
+        self.assertIsNone(memo.get("b", ["sum"]))
+        self.assertIsNone(memo.get("c", ["norm"]))
+        self.assertEqual(memo.stats()["size"], 2)
+        self.assertEqual((memo.hits, memo.misses), (1, 2))
+
+    def test_corpus_level(self):
+        memo = SentenceMemo()
+        for corpus_fn in (average_corpus_level, extrema_corpus_level):
+            expected = corpus_fn(
+                self.hypothesis_corpus, self.reference_corpus, self.embeddings
+            )
+            result = corpus_fn(
+                self.hypothesis_corpus,
+                self.reference_corpus,
+                self.embeddings,
+                memo=memo,
+            )
+            for our, their in zip(result, expected):
+                self.assertAlmostEqual(our, their)
+
+    def test_interned_corpus(self):
+        with self.assertRaises(ValueError):
+            score_all(
+                intern_corpus(self.hypothesis_corpus, self.embeddings),
+                self.reference_corpus,
+                self.embeddings,
+                memo=SentenceMemo(),
+            )
@@ -0,0 +1,197 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import threading
+import unittest
+from urllib.error import HTTPError
+from urllib.request import Request
+from urllib.request import urlopen
+
+import numpy as np
+
+from embedding_based.batch import score_all
+from embedding_based.server import MicroBatcher
+from embedding_based.server import make_server
+from embedding_based.server import request_scores
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+
+
+class TestMicroBatcher(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    hypothesis_corpus = load_corpus_from_file(PREDICTED)
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH)
+
+    def test_coalesce(self):
+        batcher = MicroBatcher(self.embeddings)
+        # Queued before the scoring thread starts, so they make one batch.
+        futures = [
+            batcher.submit([hypothesis], [reference], ["average", "greedy_match"])
+            for hypothesis, reference in zip(
+                self.hypothesis_corpus, self.reference_corpus
+            )
+        ]
+        with batcher:
+            results = [future.result(timeout=10) for future in futures]
+        expected = score_all(
+            self.hypothesis_corpus,
+            self.reference_corpus,
+            self.embeddings,
+            ["average", "greedy_match"],
+        )
+        for i, result in enumerate(results):
+            self.assertEqual(list(result), ["average", "greedy_match"])
+            for name, scores in result.items():
+                self.assertEqual(scores.scores.tolist(), [expected[name].scores[i]])
+        stats = batcher.stats.snapshot()
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["requests"], len(futures))
+        self.assertEqual(stats["pairs"], len(futures))
+        self.assertIsNotNone(stats["latency_p99_ms"])
+
+    def test_max_batch_size(self):
+        batcher = MicroBatcher(self.embeddings, max_batch_size=2)
+        futures = [
+            batcher.submit(["human".split()], ["graph".split()], ["average"])
+            for _ in range(5)
+        ]
+        with batcher:
+            for future in futures:
+                future.result(timeout=10)
+        self.assertEqual(batcher.stats.snapshot()["batches"], 3)
+
+    def test_bad_request(self):
+        batcher = MicroBatcher(self.embeddings)
+        with self.assertRaises(ValueError):
+            batcher.submit([["human"]], [], ["average"])
+        with self.assertRaises(ValueError):
+            batcher.submit([["human"]], [["graph"]], ["bleu"])
+
+    def test_failing_request_alone_fails(self):
+        batcher = MicroBatcher(self.embeddings)
+        good = [batcher.submit([["human"]], [["graph"]], ["average"]) for _ in range(3)]
+        # Not checked by the batcher, so it fails in score_all.
+        bad = batcher.submit([[["human"]]], [["graph"]], ["average"])
+        with batcher:
+            for future in good:
+                self.assertEqual(len(future.result(timeout=10)["average"].scores), 1)
+            with self.assertRaises(TypeError):
+                bad.result(timeout=10)
+        stats = batcher.stats.snapshot()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["errors"], 1)
+
+
+class TestServer(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    hypothesis_corpus = load_corpus_from_file(PREDICTED)
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH)
+
+    def setUp(self):
+        self.server = make_server(self.embeddings)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = "http://%s:%d" % self.server.server_address[:2]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _get(self, path):
+        with urlopen(self.url + path, timeout=10) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def test_score(self):
+        scores = request_scores(
+            self.url, self.hypothesis_corpus, self.reference_corpus, timeout=10
+        )
+        expected = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        for name, result in expected.items():
+            np.testing.assert_allclose(scores[name], result.scores)
+
+    def test_score_strings(self):
+        scores = request_scores(
+            self.url, ["human graph"], [["human", "trees"]], ["extrema"], timeout=10
+        )
+        expected = score_all(
+            [["human", "graph"]], [["human", "trees"]], self.embeddings, ["extrema"]
+        )
+        np.testing.assert_allclose(scores["extrema"], expected["extrema"].scores)
+
+    def test_concurrent_clients(self):
+        results = [None] * 8
+
+        def client(i):
+            results[i] = request_scores(
+                self.url, [self.hypothesis_corpus[i]], [self.reference_corpus[i]]
+            )
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        expected = score_all(
+            self.hypothesis_corpus[:8], self.reference_corpus[:8], self.embeddings
+        )
+        for i, result in enumerate(results):
+            for name in expected:
+                self.assertAlmostEqual(result[name][0], expected[name].scores[i])
+        stats = self._get("/stats")
+        self.assertEqual(stats["requests"], 8)
+        self.assertLessEqual(stats["batches"], 8)
+
+    def test_stats_and_health(self):
+        self.assertEqual(self._get("/health"), {"status": "ok"})
+        stats = self._get("/stats")
+        self.assertEqual(stats["requests"], 0)
+        self.assertIsNone(stats["latency_p99_ms"])
+
+    def test_bad_request(self):
+        request = Request(
+            self.url + "/score",
+            data=json.dumps({"hypotheses": [["human"]]}).encode("utf-8"),
+        )
+        with self.assertRaises(HTTPError) as cm:
+            urlopen(request, timeout=10)
+        self.assertEqual(cm.exception.code, 400)
+        cm.exception.close()
+
+    def test_non_string_tokens(self):
+        request = Request(
+            self.url + "/score",
+            data=json.dumps(
+                {"hypotheses": [[["human"], 1]], "references": [["graph"]]}
+            ).encode("utf-8"),
+        )
+        with self.assertRaises(HTTPError) as cm:
+            urlopen(request, timeout=10)
+        self.assertEqual(cm.exception.code, 400)
+        cm.exception.close()
@@ -0,0 +1,110 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from embedding_based.metrics import average_corpus_level
+from embedding_based.metrics import extrema_corpus_level
+from embedding_based.metrics import greedy_match_corpus_level
+from embedding_based.metrics import extrema_sentence_level
+
+from embedding_based.store import EmbeddingStore
+from embedding_based.store import save_embedding_store
+from embedding_based.store import load_embedding_store
+from embedding_based.store import is_embedding_store
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+from embedding_based.utils import load_word2vec_binary
+from embedding_based.utils import load_corpus_from_file
+from embedding_based.utils import load_embeddings
+
+
+class TestStore(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_round_trip(self):
+        save_embedding_store(self.embeddings, self.path)
+        self.assertTrue(is_embedding_store(self.path))
+        store = load_embedding_store(self.path)
+        self.assertIsInstance(store.vectors, np.memmap)
+        self.assertEqual(store.vector_size, self.embeddings.vector_size)
+        self.assertEqual(len(store), len(self.embeddings.index_to_key))
+        for word in self.embeddings.index_to_key:
+            self.assertIn(word, store)
+            self.assertTrue((store[word] == self.embeddings[word]).all())
+        self.assertNotIn("foo", store)
+        with self.assertRaises(KeyError):
+            store["foo"]
+
+    def test_round_trip_line_breaks(self):
+        words = ["a\x85b", "c\u2028d", "e\rf", "g\x0ch", "i\x1ej"]
+        vectors = np.arange(10, dtype=np.float32).reshape(5, 2)
+        save_embedding_store(EmbeddingStore(words, vectors), self.path)
+        store = load_embedding_store(self.path)
+        self.assertEqual(store.index_to_key, words)
+        self.assertTrue((store["e\rf"] == vectors[2]).all())
+
+    def test_load_embeddings(self):
+        save_embedding_store(self.embeddings, self.path)
+        self.assertIsInstance(load_embeddings(self.path), EmbeddingStore)
+        # A file is read into memory, not memory-mapped as a store.
+        loaded = load_embeddings(EMBEDDINGS)
+        self.assertNotIsInstance(loaded.vectors, np.memmap)
+        self.assertEqual(loaded.index_to_key, load_embeddings(self.path).index_to_key)
+
+    def test_float16(self):
+        save_embedding_store(self.embeddings, self.path, dtype=np.float16)
+        store = load_embedding_store(self.path)
+        self.assertEqual(store.vectors.dtype, np.float16)
+        self.assertEqual(store["human"].dtype, np.float32)
+        with self.assertRaises(ValueError):
+            save_embedding_store(self.embeddings, self.path, dtype=np.int8)
+
+    def test_metrics_accept_store(self):
+        save_embedding_store(self.embeddings, self.path)
+        store = load_embedding_store(self.path)
+        hypothesis_corpus = load_corpus_from_file(PREDICTED)
+        reference_corpus = load_corpus_from_file(GROUND_TRUTH)
+        for corpus_fn in (
+            average_corpus_level,
+            extrema_corpus_level,
+            greedy_match_corpus_level,
+        ):
+            expected = corpus_fn(hypothesis_corpus, reference_corpus, self.embeddings)
+            actual = corpus_fn(hypothesis_corpus, reference_corpus, store)
+            for our, their in zip(actual, expected):
+                self.assertAlmostEqual(our, their)
+        self.assertAlmostEqual(
+            extrema_sentence_level(["human", "foo"], ["trees"], store),
+            extrema_sentence_level(["human", "foo"], ["trees"], self.embeddings),
+        )
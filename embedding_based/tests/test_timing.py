@@ -0,0 +1,135 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from embedding_based.batch import score_all
+from embedding_based.metrics import evaluate_all
+from embedding_based.timing import StageTimer
+from embedding_based.utils import evaluate_files
+from embedding_based.utils import load_corpus_from_file
+from embedding_based.utils import load_word2vec_binary
+
+from embedding_based.tests import EMBEDDINGS
+from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
+
+
+class TestStageTimer(unittest.TestCase):
+    def test_stages_and_counts(self):
+        timer = StageTimer()
+        timer.add("lookup", 1.0)
+        timer.add("math", 3.0)
+        timer.add("lookup", 1.0)
+        timer.count("pairs", 10)
+        timer.count("tokens", 50)
+        timer.count("looked_up_tokens", 50)
+        timer.count("oov_tokens", 5)
+        timer.count("skipped_pairs.average", 2)
+        with timer.stage("write"):
+            pass
+
+        self.assertEqual(list(timer.seconds), ["lookup", "math", "write"])
+        self.assertEqual(timer.seconds["lookup"], 2.0)
+        rates = timer.rates()
+        self.assertEqual(rates["oov_rate"], 0.1)
+        self.assertEqual(rates["skip_rate.average"], 0.2)
+        # Over the lookup and math stages only.
+        self.assertEqual(rates["pairs_per_second"], 2.0)
+        self.assertEqual(rates["tokens_per_second"], 10.0)
+        report = timer.report()
+        self.assertEqual(report["counts"]["oov_tokens"], 5)
+        self.assertGreaterEqual(report["total_seconds"], 5.0)
+        self.assertIn("skip_rate.average", timer.format())
+
+    def test_empty(self):
+        timer = StageTimer()
+        self.assertEqual(timer.rates(), {})
+        self.assertEqual(timer.report()["total_seconds"], 0)
+        timer.format()
+
+
+class TestInstrumentedScoring(unittest.TestCase):
+    embeddings = load_word2vec_binary(EMBEDDINGS)
+    hypothesis_corpus = load_corpus_from_file(PREDICTED) + [
+        "foo bar".split(),
+        "human foo".split(),
+    ]
+    reference_corpus = load_corpus_from_file(GROUND_TRUTH) + [
+        "human interface".split(),
+        "computer".split(),
+    ]
+
+    def test_score_all(self):
+        timer = StageTimer()
+        results = score_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings, timer=timer
+        )
+        tokens = sum(map(len, self.hypothesis_corpus + self.reference_corpus))
+        self.assertEqual(timer.counts["pairs"], len(self.hypothesis_corpus))
+        self.assertEqual(timer.counts["tokens"], tokens)
+        self.assertEqual(timer.counts["looked_up_tokens"], tokens)
+        self.assertEqual(timer.counts["oov_tokens"], 3)
+        for name, result in results.items():
+            self.assertEqual(
+                timer.counts["skipped_pairs." + name], result.skipped.sum()
+            )
+        self.assertEqual(timer.counts["skipped_pairs.average"], 1)
+        self.assertEqual(list(timer.seconds), ["lookup", "math"])
+
+    def test_evaluate_all_matches_uninstrumented(self):
+        timer = StageTimer()
+        timed = evaluate_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings, timer=timer
+        )
+        plain = evaluate_all(
+            self.hypothesis_corpus, self.reference_corpus, self.embeddings
+        )
+        for name in plain:
+            self.assertEqual(timed[name].corpus_score, plain[name].corpus_score)
+        self.assertEqual(timer.counts["pairs"], len(self.hypothesis_corpus))
+
+    def test_evaluate_files(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            timer = StageTimer()
+            evaluate_files(
+                PREDICTED,
+                GROUND_TRUTH,
+                self.embeddings,
+                chunk_size=4,
+                score_files={"average": os.path.join(tmp_dir, "average.txt")},
+                timer=timer,
+            )
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(timer.counts["pairs"], len(load_corpus_from_file(PREDICTED)))
+        self.assertEqual(
+            set(timer.seconds), {"load corpora", "lookup", "math", "write"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,14 +20,27 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import collections
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
+from embedding_based import loaders
 from embedding_based.utils import load_word2vec_binary
 from embedding_based.utils import load_corpus_from_file
+from embedding_based.utils import corpus_vocabulary
+from embedding_based.utils import iter_corpus_chunks
+from embedding_based.utils import evaluate_files
+from embedding_based.utils import compare_systems
+from embedding_based.utils import format_comparison
+from embedding_based.metrics import evaluate_all
 
 from embedding_based.tests import EMBEDDINGS
 from embedding_based.tests import VOCAB
 from embedding_based.tests import GROUND_TRUTH
+from embedding_based.tests import PREDICTED
 
 
 class TestUtils(unittest.TestCase):
@@ -42,3 +55,117 @@ class TestUtils(unittest.TestCase):
         corpus = load_corpus_from_file(GROUND_TRUTH)
         self.assertTrue(isinstance(corpus, list))
         self.assertTrue(isinstance(corpus[0], list))
+
+    def test_corpus_vocabulary(self):
+        vocabulary = corpus_vocabulary([["a", "b"], ["b"]], [["c"], []])
+        self.assertEqual(vocabulary, {"a", "b", "c"})
+
+    def test_load_restricted_embeddings(self):
+        embeddings = load_word2vec_binary(EMBEDDINGS)
+        vocabulary = corpus_vocabulary(
+            load_corpus_from_file(PREDICTED), load_corpus_from_file(GROUND_TRUTH)
+        ) | {"foo"}
+        # Small chunks make the reader split records across reads.
+        for chunk_size in (loaders._CHUNK_SIZE, 1, 7, 100):
+            with mock.patch.object(loaders, "_CHUNK_SIZE", chunk_size):
+                restricted = load_word2vec_binary(EMBEDDINGS, vocabulary=vocabulary)
+            self.assertEqual(
+                set(restricted.index_to_key), vocabulary & set(embeddings.index_to_key)
+            )
+            for word in restricted.index_to_key:
+                self.assertTrue((restricted[word] == embeddings[word]).all())
+
+        restricted = load_word2vec_binary(EMBEDDINGS, vocabulary={"human"})
+        self.assertEqual(restricted.index_to_key, ["human"])
+        self.assertNotIn("trees", restricted)
+
+    def test_iter_corpus_chunks(self):
+        chunks = list(iter_corpus_chunks(PREDICTED, GROUND_TRUTH, chunk_size=4))
+        self.assertEqual([len(h) for h, _ in chunks], [4, 4, 1])
+        hypothesis = [s for h, _ in chunks for s in h]
+        reference = [s for _, r in chunks for s in r]
+        self.assertEqual(hypothesis, load_corpus_from_file(PREDICTED))
+        self.assertEqual(reference, load_corpus_from_file(GROUND_TRUTH))
+
+    def test_iter_corpus_chunks_unaligned(self):
+        path = tempfile.mkdtemp()
+        try:
+            short = os.path.join(path, "short.txt")
+            with open(short, "w") as f:
+                f.write("human trees\n")
+            with self.assertRaises(ValueError):
+                list(iter_corpus_chunks(PREDICTED, short))
+        finally:
+            shutil.rmtree(path)
+
+    def test_evaluate_files(self):
+        embeddings = load_word2vec_binary(EMBEDDINGS)
+        expected = evaluate_all(
+            load_corpus_from_file(PREDICTED),
+            load_corpus_from_file(GROUND_TRUTH),
+            embeddings,
+        )
+        path = tempfile.mkdtemp()
+        try:
+            score_file = os.path.join(path, "extrema.txt")
+            actual = evaluate_files(
+                PREDICTED,
+                GROUND_TRUTH,
+                embeddings,
+                chunk_size=2,
+                score_files={"extrema": score_file},
+            )
+            with open(score_file) as f:
+                scores = [float(line) for line in f]
+        finally:
+            shutil.rmtree(path)
+        self.assertEqual(list(actual), list(expected))
+        for name, result in expected.items():
+            for our, their in zip(actual[name], result.corpus_score):
+                self.assertAlmostEqual(our, their)
+        self.assertEqual(scores, expected["extrema"].sentence_scores.tolist())
+
+    def test_evaluate_files_partial(self):
+        embeddings = load_word2vec_binary(EMBEDDINGS)
+        expected = evaluate_files(PREDICTED, GROUND_TRUTH, embeddings)
+        partial = evaluate_files(PREDICTED, GROUND_TRUTH, embeddings, partial=True)
+        for name, running in partial.items():
+            self.assertEqual(running.count + running.skipped, 9)
+            self.assertEqual(running.corpus_score(), expected[name])
+
+    def test_compare_systems(self):
+        embeddings = load_word2vec_binary(EMBEDDINGS)
+        systems = collections.OrderedDict([("a", PREDICTED), ("b", GROUND_TRUTH)])
+        comparison = compare_systems(
+            GROUND_TRUTH, systems, embeddings, metrics=["extrema", "greedy_match"]
+        )
+        self.assertEqual(list(comparison), ["a", "b"])
+        for name, hypothesis_file in systems.items():
+            expected = evaluate_all(
+                load_corpus_from_file(hypothesis_file),
+                load_corpus_from_file(GROUND_TRUTH),
+                embeddings,
+                metrics=["extrema", "greedy_match"],
+            )
+            self.assertEqual(list(comparison[name]), list(expected))
+            for metric, result in expected.items():
+                for our, their in zip(comparison[name][metric], result.corpus_score):
+                    self.assertAlmostEqual(our, their)
+
+        table = format_comparison(comparison).splitlines()
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table[0].split(), ["system", "extrema", "greedy_match"])
+        self.assertTrue(table[1].startswith("a "))
+
+    def test_compare_systems_unaligned(self):
+        embeddings = load_word2vec_binary(EMBEDDINGS)
+        path = tempfile.mkdtemp()
+        try:
+            short_file = os.path.join(path, "short.txt")
+            with open(PREDICTED) as f, open(short_file, "w") as g:
+                g.writelines(f.readlines()[:-1])
+            systems = collections.OrderedDict([("a", PREDICTED), ("short", short_file)])
+            with self.assertRaisesRegex(ValueError, "short"):
+                compare_systems(GROUND_TRUTH, systems, embeddings)
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,160 @@
+# MIT License
+#
+# Copyright (c) 2019 Cong Feng.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Wall-clock timing of the stages of a run, and counters of what it processed.
+
+`batch.score_all` and the functions built on it take an optional StageTimer
+and record in it:
+
+- stages "lookup" (interning the words into embedding rows) and "math"
+  (gathering the vectors and computing the scores), and "load corpora" and
+  "write" where they read or write files;
+- counters "pairs", "tokens", "looked_up_tokens", "oov_tokens" and
+  "skipped_pairs.<metric>", the pairs left out of the corpus-level score
+  because none of their hypothesis words have embeddings.
+"""
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import collections
+import contextlib
+import json
+import time
+
+__all__ = [
+    "StageTimer",
+]
+
+# Stages the throughput is measured over.
+_SCORING_STAGES = ("lookup", "math")
+
+
+class StageTimer(object):
+    """
+    Accumulate the wall-clock time spent in named stages, and named counts.
+    A stage entered several times adds up; stages are reported in the order
+    first entered.
+    """
+
+    def __init__(self):
+        self.seconds = collections.OrderedDict()
+        self.counts = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time the body of a with statement as stage name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        """
+        Add seconds to stage name.
+        """
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        """
+        Add n to counter name.
+        """
+        self.counts[name] = self.counts.get(name, 0) + int(n)
+
+    def rates(self):
+        """
+        Derive the OOV rate, the rate of skipped pairs of each metric and the
+        throughput of the lookup and math stages from the counters of the
+        module docstring, as far as they were recorded.
+
+        :return: an OrderedDict.
+        """
+        rates = collections.OrderedDict()
+        counts = self.counts
+        if counts.get("looked_up_tokens"):
+            rates["oov_rate"] = counts.get("oov_tokens", 0) / counts["looked_up_tokens"]
+        for name, skipped in counts.items():
+            if name.startswith("skipped_pairs.") and counts.get("pairs"):
+                rates["skip_rate." + name.split(".", 1)[1]] = skipped / counts["pairs"]
+        scoring = sum(self.seconds.get(name, 0.0) for name in _SCORING_STAGES)
+        if scoring:
+            for name in ("pairs", "tokens"):
+                if name in counts:
+                    rates["%s_per_second" % name] = counts[name] / scoring
+        return rates
+
+    def report(self):
+        """
+        Return the stages, counters and rates as a dict that `json.dump` takes.
+
+        :return: a dict.
+        """
+        return {
+            "seconds": dict(self.seconds),
+            "total_seconds": sum(self.seconds.values()),
+            "counts": dict(self.counts),
+            "rates": dict(self.rates()),
+        }
+
+    def write_report(self, path):
+        """
+        Write `report` as JSON to path.
+
+        :param path: a path-like object.
+        """
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def format(self):
+        """
+        Format the stages as a table with their share of the total, followed
+        by the counters and rates.
+
+        :return: a string.
+        """
+        total = sum(self.seconds.values())
+        rates = self.rates()
+        width = max(
+            [len("total")]
+            + [len(name) for name in self.seconds]
+            + [len(name) for name in self.counts]
+            + [len(name) for name in rates]
+        )
+        lines = [
+            "%s  %8.4f s  %5.1f%%"
+            % (name.ljust(width), seconds, 100 * seconds / total if total else 0)
+            for name, seconds in self.seconds.items()
+        ]
+        lines.append("%s  %8.4f s" % ("total".ljust(width), total))
+        lines.extend(
+            "%s  %d" % (name.ljust(width), n) for name, n in self.counts.items()
+        )
+        lines.extend(
+            "%s  %.4g" % (name.ljust(width), rate) for name, rate in rates.items()
+        )
+        return "\n".join(lines)
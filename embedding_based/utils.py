@@ -25,12 +25,43 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
-from gensim.models.keyedvectors import Word2VecKeyedVectors
+import collections
+import hashlib
+import io
+import itertools
+import os
+
+import numpy as np
+
+from embedding_based.batch import METRICS
+from embedding_based.batch import _DEFAULT_DTYPE
+from embedding_based.batch import ReferenceCache
+from embedding_based.batch import score_all
+from embedding_based.metrics import RunningScore
+from embedding_based.metrics import _compute_corpus_score
+from embedding_based.metrics import _unskipped
+from embedding_based.parallel import open_workers
+from embedding_based.loaders import read_embeddings
+from embedding_based.loaders import read_word2vec_binary
+from embedding_based.score_cache import cached_score_all
+from embedding_based.store import is_embedding_store
+from embedding_based.store import load_embedding_store
+from embedding_based.timing import StageTimer
 
 __all__ = [
     "load_corpus_from_file",
+    "iter_corpus_chunks",
+    "evaluate_files",
     "apply_metric_on_files",
     "load_word2vec_binary",
+    "corpus_vocabulary",
+    "load_embeddings",
+    "reference_cache_key",
+    "load_reference_cache",
+    "embedding_file_fingerprint",
+    "score_systems",
+    "compare_systems",
+    "format_comparison",
 ]
 
 
@@ -42,7 +73,152 @@ def load_corpus_from_file(path):
     :return: a list of sentences.
     """
     with open(path) as f:
-        return [line.split() for line in f.readlines()]
+        return [line.split() for line in f]
+
+
+# Number of sentence pairs in a chunk when streaming two files.
+_DEFAULT_CHUNK_SIZE = 10000
+
+
+def iter_corpus_chunks(hypothesis_file, reference_file, chunk_size=_DEFAULT_CHUNK_SIZE):
+    """
+    Stream two files of tokenized sentences in aligned chunks.
+    Only one chunk is held in memory at a time.
+    :param hypothesis_file: a path-like object.
+    :param reference_file: a path-like object.
+    :param chunk_size: number of sentence pairs in a chunk.
+    :return: a generator of (hypothesis_chunk, reference_chunk), two lists of sentences.
+    """
+    with open(hypothesis_file) as hypothesis, open(reference_file) as reference:
+        pairs = itertools.zip_longest(hypothesis, reference)
+        while True:
+            chunk = list(itertools.islice(pairs, chunk_size))
+            if not chunk:
+                return
+            if any(h is None or r is None for h, r in chunk):
+                raise ValueError(
+                    "%r and %r have different numbers of lines"
+                    % (hypothesis_file, reference_file)
+                )
+            yield [h.split() for h, _ in chunk], [r.split() for _, r in chunk]
+
+
+def _score_chunk(
+    chunk, embeddings, metrics, running, outputs, timer, score_cache=None, **kwargs
+):
+    """
+    Score a chunk of sentence pairs for `evaluate_files`, add the scores to
+    the running statistics and write them to the open score files.
+    :param chunk: a tuple of (hypothesis_chunk, reference_chunk).
+    :param running: a dict mapping each metric name to a RunningScore.
+    :param outputs: a dict mapping some metric names to text files.
+    :param timer: a StageTimer.
+    :param score_cache: a ScoreCache to look the scores up in first.
+    :param kwargs: other keyword arguments of `batch.score_all`.
+    """
+    hypothesis_chunk, reference_chunk = chunk
+    if score_cache is not None:
+        results = cached_score_all(
+            hypothesis_chunk,
+            reference_chunk,
+            embeddings,
+            score_cache,
+            metrics,
+            timer=timer,
+            **kwargs
+        )
+    else:
+        results = score_all(
+            hypothesis_chunk,
+            reference_chunk,
+            embeddings,
+            metrics,
+            timer=timer,
+            **kwargs
+        )
+    for name, result in results.items():
+        running[name].update(
+            result.scores[~result.skipped], np.count_nonzero(result.skipped)
+        )
+        if name in outputs:
+            with timer.stage("write"):
+                outputs[name].writelines("%s\n" % score for score in result.scores)
+
+
+def evaluate_files(
+    hypothesis_file,
+    reference_file,
+    embeddings,
+    metrics=METRICS,
+    chunk_size=_DEFAULT_CHUNK_SIZE,
+    score_files=None,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    score_cache=None,
+    memo=None,
+    memory_budget=None,
+    timer=None,
+    partial=False,
+):
+    """
+    Compute several metrics on two files in constant memory.
+    The files are streamed chunk by chunk and the corpus-level scores are
+    accumulated as running statistics.
+    :param hypothesis_file: a path-like object.
+    :param reference_file: a path-like object.
+    :param embeddings: a KeyedVectors.
+    :param metrics: names of the metrics, see `evaluate_all`.
+    :param chunk_size: number of sentence pairs in a chunk.
+    :param score_files: if given, a dict mapping some metric names to paths.
+        Sentence-level scores of these metrics are written there, one per line.
+    :param n_jobs: number of worker processes, see `batch.score_all`.
+        The pool is started once and shared by all the chunks.
+    :param dtype: the dtype to compute in, see `batch.score_all`.
+    :param score_cache: a ScoreCache to look the scores up in first.
+    :param memo: a SentenceMemo, which is kept across chunks.
+    :param memory_budget: the working memory of a block in bytes, to
+        group the pairs by length, see `batch.score_all`.
+    :param timer: a StageTimer to record the stages and counters in, see
+        `timing`. Reading the chunks is timed as "load corpora", writing the
+        sentence-level scores as "write".
+    :param partial: if True, return the RunningScore of each metric instead
+        of its CorpusLevelScore, to merge with those of other shards of a
+        corpus, see `RunningScore.merge`.
+    :return: an OrderedDict mapping each metric name to a CorpusLevelScore.
+    """
+    score_files = score_files or {}
+    timer = StageTimer() if timer is None else timer
+    running = collections.OrderedDict((name, RunningScore()) for name in metrics)
+    outputs = {name: io.open(path, "w") for name, path in score_files.items()}
+    chunks = iter_corpus_chunks(hypothesis_file, reference_file, chunk_size)
+    try:
+        with open_workers(embeddings.vectors, n_jobs) as workers:
+            while True:
+                with timer.stage("load corpora"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                _score_chunk(
+                    chunk,
+                    embeddings,
+                    metrics,
+                    running,
+                    outputs,
+                    timer,
+                    score_cache=score_cache,
+                    n_jobs=workers,
+                    dtype=dtype,
+                    memo=memo,
+                    memory_budget=memory_budget,
+                )
+    finally:
+        for output in outputs.values():
+            output.close()
+    if partial:
+        return running
+    return collections.OrderedDict(
+        (name, stats.corpus_score()) for name, stats in running.items()
+    )
 
 
 def apply_metric_on_files(metric, hypothesis_file, reference_file):
@@ -59,10 +235,289 @@ def apply_metric_on_files(metric, hypothesis_file, reference_file):
     )
 
 
-def load_word2vec_binary(file):
+def corpus_vocabulary(*corpora):
+    """
+    Collect the set of tokens appearing in some corpora.
+    :param corpora: lists of sentences.
+    :return: a set of strings.
+    """
+    return {word for corpus in corpora for sentence in corpus for word in sentence}
+
+
+# Bytes read from a file at a time when hashing it.
+_CHUNK_SIZE = 1 << 20
+
+
+def load_word2vec_binary(file, vocabulary=None, dtype=np.float32):
     """
     Load a word2vec embeddings in binary format as in the origin C tool.
-    :param file: a binary file.
-    :return: KeyedVectors
+    :param file: a binary file, possibly gzipped.
+    :param vocabulary: if given, a set of words. Only these words are loaded,
+        so memory scales with the vocabulary instead of the file.
+    :param dtype: np.float32 or np.float16, the dtype the vectors are kept in.
+        float16 halves the memory; the metrics still compute in float32 or up.
+    :return: an EmbeddingStore. Until gensim became optional this returned a
+        gensim KeyedVectors; an EmbeddingStore only has its `vectors`,
+        `key_to_index`, `index_to_key`, `vector_size`, `len`, `in` and
+        lookup by word. Use `gensim.models.KeyedVectors.load_word2vec_format`
+        for the other methods of KeyedVectors; the metrics accept either.
+    """
+    return read_word2vec_binary(file, vocabulary=vocabulary, dtype=dtype)
+
+
+def load_embeddings(path, vocabulary=None, dtype=None, format=None):
+    """
+    Load embeddings from either an embedding store or an embedding file.
+    :param path: a store directory, or a word2vec binary, word2vec text,
+        fastText .vec or GloVe text file, possibly gzipped.
+    :param vocabulary: if given, a set of words to restrict a file to.
+        A store is memory-mapped as a whole anyway.
+    :param dtype: np.float32 or np.float16, the dtype the vectors are kept in.
+        None means float32 for a file and the saved dtype for a store.
+    :param format: the format of a file, see `loaders.EMBEDDING_FORMATS`.
+        None detects it from the file.
+    :return: an EmbeddingStore.
+    """
+    if is_embedding_store(path):
+        return load_embedding_store(path, dtype=dtype)
+    return read_embeddings(
+        path, format=format, vocabulary=vocabulary, dtype=dtype or np.float32
+    )
+
+
+def _hash_file_contents(digest, path):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+
+def _hash_file_stats(digest, path):
+    paths = [path]
+    if os.path.isdir(path):
+        paths = sorted(os.path.join(path, name) for name in os.listdir(path))
+    for path in paths:
+        stat = os.stat(path)
+        stats = "%s:%d:%d;" % (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest.update(stats.encode("utf-8"))
+
+
+def reference_cache_key(
+    reference_file,
+    embedding_file,
+    metrics=METRICS,
+    dtype=_DEFAULT_DTYPE,
+    storage_dtype=None,
+):
+    """
+    Compute the key of the reference cache of a pair of files.
+    The reference file is hashed by contents. The embedding file is hashed by
+    path, size and modification time, since reading it is what we want to avoid.
+    :param reference_file: a path-like object.
+    :param embedding_file: a binary file or a store directory.
+    :param metrics: names of the cached metrics.
+    :param dtype: the dtype the cache is computed in.
+    :param storage_dtype: the dtype the embeddings are kept in, such as
+        `embeddings.vectors.dtype`. A store loaded as float16 gives other
+        vectors than the same store loaded as float32.
+    :return: a hex string.
+    """
+    digest = hashlib.sha1()
+    _hash_file_contents(digest, reference_file)
+    _hash_file_stats(digest, embedding_file)
+    digest.update(",".join(sorted(metrics)).encode("utf-8"))
+    digest.update(np.dtype(dtype).name.encode("utf-8"))
+    digest.update(
+        ("%s" % (storage_dtype and np.dtype(storage_dtype).name)).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+def load_reference_cache(
+    reference_file,
+    embedding_file,
+    embeddings,
+    cache_dir,
+    metrics=METRICS,
+    dtype=_DEFAULT_DTYPE,
+):
+    """
+    Load the reference cache of a pair of files from cache_dir, building and
+    saving it there first if it does not exist.
+    :param reference_file: a path-like object.
+    :param embedding_file: the file embeddings were loaded from.
+    :param embeddings: a KeyedVectors.
+    :param cache_dir: the directory of the .npz files.
+    :param metrics: names of the metrics to cache for.
+    :param dtype: the dtype to compute the cache in.
+    :return: a ReferenceCache.
+    """
+    key = reference_cache_key(
+        reference_file, embedding_file, metrics, dtype, embeddings.vectors.dtype
+    )
+    path = os.path.join(cache_dir, "%s.npz" % key)
+    if os.path.exists(path):
+        return ReferenceCache.load(path)
+    cache = ReferenceCache.build(
+        load_corpus_from_file(reference_file), embeddings, metrics, dtype=dtype
+    )
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    cache.save(path)
+    return cache
+
+
+def embedding_file_fingerprint(embedding_file, dtype=None):
+    """
+    Compute a fingerprint of an embedding file for a ScoreCache.
+    Like `reference_cache_key`, the file is hashed by path, size and
+    modification time, so the fingerprint does not depend on which words
+    were loaded from it.
+    :param embedding_file: a binary file or a store directory.
+    :param dtype: the dtype the vectors are kept in, None for the default.
+    :return: a hex string.
     """
-    return Word2VecKeyedVectors.load_word2vec_format(file, binary=True)
+    digest = hashlib.sha1()
+    _hash_file_stats(digest, embedding_file)
+    digest.update(("%s" % (dtype and np.dtype(dtype).name)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def score_systems(
+    reference_file,
+    hypothesis_files,
+    embeddings,
+    metrics=METRICS,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+    timer=None,
+):
+    """
+    Compute the sentence-level scores of several systems against the same
+    reference file. The references are loaded and embedded only once.
+    :param reference_file: a path-like object.
+    :param hypothesis_files: a dict mapping the name of each system to its file.
+    :param embeddings: a KeyedVectors.
+    :param metrics: names of the metrics, see `evaluate_all`.
+    :param n_jobs: number of worker processes, see `batch.score_all`.
+        The pool is started once and shared by all the systems.
+    :param dtype: the dtype to compute in, see `batch.score_all`.
+    :param memo: a SentenceMemo shared by the systems, see `batch.score_all`.
+    :param memory_budget: the working memory of a block in bytes, to
+        group the pairs by length, see `batch.score_all`.
+    :param timer: a StageTimer to record the stages and counters in, see
+        `timing`. Embedding the references is timed as "reference vectors".
+    :return: an OrderedDict mapping each system name to an OrderedDict,
+        which maps each metric name to a BatchScores.
+    :raise ValueError: if a system file has another number of lines than
+        the reference file.
+    """
+    timer = StageTimer() if timer is None else timer
+    with timer.stage("load corpora"):
+        reference_corpus = load_corpus_from_file(reference_file)
+    with timer.stage("reference vectors"):
+        reference = ReferenceCache.build(
+            reference_corpus, embeddings, metrics, dtype=dtype
+        )
+    system_scores = collections.OrderedDict()
+    with open_workers(embeddings.vectors, n_jobs) as workers:
+        for name, hypothesis_file in hypothesis_files.items():
+            with timer.stage("load corpora"):
+                hypothesis_corpus = load_corpus_from_file(hypothesis_file)
+            if len(hypothesis_corpus) != len(reference_corpus):
+                raise ValueError(
+                    "system %r has %d lines but %r has %d"
+                    % (
+                        name,
+                        len(hypothesis_corpus),
+                        reference_file,
+                        len(reference_corpus),
+                    )
+                )
+            system_scores[name] = score_all(
+                hypothesis_corpus,
+                reference,
+                embeddings,
+                metrics,
+                n_jobs=workers,
+                dtype=dtype,
+                memo=memo,
+                memory_budget=memory_budget,
+                timer=timer,
+            )
+    return system_scores
+
+
+def compare_systems(
+    reference_file,
+    hypothesis_files,
+    embeddings,
+    metrics=METRICS,
+    n_jobs=1,
+    dtype=_DEFAULT_DTYPE,
+    memo=None,
+    memory_budget=None,
+    timer=None,
+):
+    """
+    Score several systems against the same reference file.
+    The references are loaded and embedded only once.
+    :param reference_file: a path-like object.
+    :param hypothesis_files: a dict mapping the name of each system to its file.
+    :param embeddings: a KeyedVectors.
+    :param metrics: names of the metrics, see `evaluate_all`.
+    :param n_jobs: number of worker processes, see `batch.score_all`.
+    :param dtype: the dtype to compute in, see `batch.score_all`.
+    :param memo: a SentenceMemo shared by the systems, see `batch.score_all`.
+    :param memory_budget: the working memory of a block in bytes, to
+        group the pairs by length, see `batch.score_all`.
+    :param timer: a StageTimer, see `score_systems`.
+    :return: an OrderedDict mapping each system name to an OrderedDict,
+        which maps each metric name to a CorpusLevelScore.
+    """
+    system_scores = score_systems(
+        reference_file,
+        hypothesis_files,
+        embeddings,
+        metrics,
+        n_jobs=n_jobs,
+        dtype=dtype,
+        memo=memo,
+        memory_budget=memory_budget,
+        timer=timer,
+    )
+    return collections.OrderedDict(
+        (
+            name,
+            collections.OrderedDict(
+                (metric, _compute_corpus_score(_unskipped(scores)))
+                for metric, scores in metric_scores.items()
+            ),
+        )
+        for name, metric_scores in system_scores.items()
+    )
+
+
+def format_comparison(comparison):
+    """
+    Format the result of `compare_systems` as a table, one row per system and
+    one column per metric. Each cell is the mean and its confidence interval.
+    :param comparison: what `compare_systems` returns.
+    :return: a string.
+    """
+    metrics = list(next(iter(comparison.values()), {}))
+    rows = [["system"] + metrics]
+    for name, scores in comparison.items():
+        rows.append(
+            [name]
+            + [
+                "%.4f +- %.4f" % (scores[m].mean, scores[m].confidence_interval)
+                for m in metrics
+            ]
+        )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
@@ -0,0 +1,314 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmark the throughput and memory of the metrics on synthetic data."""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import embedding_based as eb
+from embedding_based import origin
+from embedding_based.schedule import contiguous_blocks
+from embedding_based.schedule import padding_waste
+from embedding_based.schedule import schedule_pairs
+from embedding_based.store import EmbeddingStore
+
+LENGTH_DISTRIBUTIONS = ('poisson', 'uniform', 'lognormal')
+
+
+def make_embeddings(vocab_size, dim, seed=0):
+    """
+    Make random embeddings of vocab_size words named w0, w1, ...
+    :return: an EmbeddingStore.
+    """
+    rng = np.random.RandomState(seed)
+    words = ['w%d' % i for i in range(vocab_size)]
+    vectors = rng.standard_normal((vocab_size, dim)).astype(np.float32)
+    return EmbeddingStore(words, vectors)
+
+
+def sample_lengths(rng, size, distribution, mean_length, max_length):
+    """
+    Sample sentence lengths from a distribution, clipped to [1, max_length].
+    """
+    if distribution == 'poisson':
+        lengths = rng.poisson(mean_length, size)
+    elif distribution == 'uniform':
+        lengths = rng.randint(1, 2 * mean_length, size)
+    elif distribution == 'lognormal':
+        sigma = 1.0
+        lengths = rng.lognormal(np.log(mean_length) - sigma**2 / 2, sigma, size)
+    else:
+        raise ValueError('unknown length distribution %r' % distribution)
+    return np.clip(np.round(lengths), 1, max_length).astype(int)
+
+
+def make_corpus(rng, size, vocab_size, oov_rate, **length_kwargs):
+    """
+    Make a corpus of random sentences. Word frequencies follow Zipf's law and
+    a fraction oov_rate of the tokens are not in the embeddings.
+    :return: a list of sentences.
+    """
+    lengths = sample_lengths(rng, size, **length_kwargs)
+    ranks = np.arange(1, vocab_size + 1)
+    probs = 1.0 / ranks
+    probs /= probs.sum()
+    tokens = rng.choice(vocab_size, size=lengths.sum(), p=probs)
+    oov = rng.random_sample(len(tokens)) < oov_rate
+    words = np.where(oov, np.char.add('oov', tokens.astype(str)), np.char.add('w', tokens.astype(str)))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return [words[offsets[i]:offsets[i + 1]].tolist() for i in range(size)]
+
+
+def write_corpus(corpus, path):
+    with open(path, 'w') as f:
+        f.writelines('%s\n' % ' '.join(sentence) for sentence in corpus)
+
+
+def sentence_level(fn):
+    def run(hypothesis_corpus, reference_corpus, embeddings):
+        return [fn(h, r, embeddings) for h, r in zip(hypothesis_corpus, reference_corpus)]
+    return run
+
+
+def make_benchmarks(files, memory_budget=None):
+    """
+    Return the functions to benchmark, by name. Each takes the hypothesis corpus,
+    the reference corpus and the embeddings.
+    :param files: paths of the hypothesis and reference files, used by the baselines.
+    :param memory_budget: if given, also benchmark the corpus-level metrics with
+        blocks grouped by length under this budget in bytes.
+    """
+    hypothesis_file, reference_file = files
+    benchmarks = [
+        ('average_sentence_level', sentence_level(eb.average_sentence_level)),
+        ('average_corpus_level', eb.average_corpus_level),
+        ('extrema_sentence_level', sentence_level(eb.extrema_sentence_level)),
+        ('extrema_corpus_level', eb.extrema_corpus_level),
+        ('greedy_match_sentence_level', sentence_level(eb.greedy_match_sentence_level)),
+        ('greedy_match_corpus_level', eb.greedy_match_corpus_level),
+        ('evaluate_all', eb.evaluate_all),
+    ]
+    if memory_budget is not None:
+        for name in ('extrema_corpus_level', 'greedy_match_corpus_level', 'evaluate_all'):
+            fn = getattr(eb, name)
+            benchmarks.append(
+                (name + '_bucketed', lambda h, r, e, fn=fn: fn(h, r, e, memory_budget=memory_budget)))
+    for name in ('average_score', 'extrema_score', 'greedy_match_score'):
+        fn = getattr(origin, name)
+        benchmarks.append(
+            ('origin.' + name, lambda h, r, e, fn=fn: fn(hypothesis_file, reference_file, e)))
+    return benchmarks
+
+
+def measure(fn, args, repeat, memory):
+    """
+    Run fn(*args) repeat times and return the best wall time in seconds and
+    the peak memory in bytes traced in one more run (None if not memory).
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+# Statements timed by --imports, each in a fresh interpreter.
+IMPORT_BENCHMARKS = [
+    ('import embedding_based', ['-c', 'import embedding_based']),
+    ('import embedding_based.utils', ['-c', 'import embedding_based.utils']),
+    ('embedding_metrics.py --help', [os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                  'embedding_metrics.py'), '--help']),
+]
+
+# Modules whose loading --imports reports.
+HEAVY_MODULES = ['numpy', 'gensim', 'scipy', 'sqlite3', 'multiprocessing', 'gzip', 'agenda']
+
+
+def measure_imports(repeat):
+    """
+    Time each of IMPORT_BENCHMARKS in a fresh interpreter, less the start-up of
+    an interpreter that imports nothing, and list the heavy modules each loads.
+    :return: a list of dicts.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        + [path for path in [env.get('PYTHONPATH')] if path])
+
+    def best_of(command):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + command, env=env, check=True, stdout=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    baseline = best_of(['-c', 'pass'])
+    rows = []
+    for name, command in IMPORT_BENCHMARKS:
+        seconds = best_of(command)
+        loaded = []
+        if command[0] == '-c':
+            probe = '%s; import sys; print(" ".join(m for m in %r if m in sys.modules))' % (
+                command[1], HEAVY_MODULES)
+            loaded = subprocess.run([sys.executable, '-c', probe], env=env, check=True,
+                                    stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+        rows.append({
+            'name': name,
+            'milliseconds': 1000 * max(seconds - baseline, 0.0),
+            'heavy_modules': loaded,
+        })
+    return rows
+
+
+def format_report(rows):
+    header = ['benchmark', 'seconds', 'pairs/s', 'tokens/s', 'peak MB']
+    lines = [header] + [[
+        row['name'],
+        '%.4f' % row['seconds'],
+        '%.0f' % row['pairs_per_second'],
+        '%.0f' % row['tokens_per_second'],
+        '-' if row['peak_bytes'] is None else '%.1f' % (row['peak_bytes'] / 2 ** 20),
+    ] for row in rows]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return '\n'.join('  '.join(cell.rjust(w) if i else cell.ljust(w)
+                               for i, (cell, w) in enumerate(zip(line, widths)))
+                     for line in lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pairs', type=int, default=2000, help='number of sentence pairs')
+    parser.add_argument('--vocab-size', type=int, default=50000, help='number of words with embeddings')
+    parser.add_argument('--dim', type=int, default=300, help='dimension of the embeddings')
+    parser.add_argument('--length-dist', choices=LENGTH_DISTRIBUTIONS, default='poisson',
+                        help='distribution of the sentence lengths')
+    parser.add_argument('--mean-length', type=int, default=12, help='mean sentence length')
+    parser.add_argument('--max-length', type=int, default=100, help='maximum sentence length')
+    parser.add_argument('--oov-rate', type=float, default=0.05, help='fraction of tokens without embeddings')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the best is reported')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure peak memory')
+    parser.add_argument('-k', '--filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the report to this JSON file')
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help='also benchmark blocks grouped by length under this budget, '
+                             'and report their padding waste')
+    parser.add_argument('--imports', action='store_true',
+                        help='also time importing the package and starting the script')
+    parser.add_argument('--max-import-ms', type=float, metavar='MS',
+                        help='with --imports, exit with status 1 if any import takes longer')
+    args = parser.parse_args()
+    if args.max_import_ms is not None and not args.imports:
+        parser.error('--max-import-ms needs --imports')
+
+    imports = None
+    if args.imports:
+        imports = measure_imports(args.repeat)
+        for row in imports:
+            print('%s: %.1f ms, loads %s' % (row['name'], row['milliseconds'],
+                                             ', '.join(row['heavy_modules']) or 'no heavy modules'),
+                  flush=True)
+
+    rng = np.random.RandomState(args.seed)
+    embeddings = make_embeddings(args.vocab_size, args.dim, args.seed)
+    corpus_kwargs = dict(
+        vocab_size=args.vocab_size,
+        oov_rate=args.oov_rate,
+        distribution=args.length_dist,
+        mean_length=args.mean_length,
+        max_length=args.max_length,
+    )
+    hypothesis_corpus = make_corpus(rng, args.pairs, **corpus_kwargs)
+    reference_corpus = make_corpus(rng, args.pairs, **corpus_kwargs)
+    tokens = sum(map(len, hypothesis_corpus)) + sum(map(len, reference_corpus))
+
+    memory_budget = None
+    padding = None
+    if args.memory_budget is not None:
+        memory_budget = int(args.memory_budget * 2 ** 20)
+        hyp_lengths = [len(sentence) for sentence in hypothesis_corpus]
+        ref_lengths = [len(sentence) for sentence in reference_corpus]
+        schedule = schedule_pairs(hyp_lengths, ref_lengths, memory_budget, args.dim)
+        padding = {
+            'corpus_order': padding_waste(hyp_lengths, ref_lengths, contiguous_blocks(args.pairs, 128)),
+            'bucketed': schedule.padding_waste,
+            'bucketed_blocks': len(schedule.blocks),
+        }
+        print('greedy matching padding waste: %.1f%% in corpus order, %.1f%% in %d length buckets' % (
+            100 * padding['corpus_order'], 100 * padding['bucketed'], padding['bucketed_blocks']))
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        files = os.path.join(tmp_dir, 'hypothesis.txt'), os.path.join(tmp_dir, 'reference.txt')
+        write_corpus(hypothesis_corpus, files[0])
+        write_corpus(reference_corpus, files[1])
+
+        rows = []
+        for name, fn in make_benchmarks(files, memory_budget):
+            if args.filter and args.filter not in name:
+                continue
+            seconds, peak = measure(
+                fn, (hypothesis_corpus, reference_corpus, embeddings), args.repeat, not args.no_memory)
+            rows.append({
+                'name': name,
+                'seconds': seconds,
+                'pairs_per_second': args.pairs / seconds,
+                'tokens_per_second': tokens / seconds,
+                'peak_bytes': peak,
+            })
+            print('%s: %.4f s' % (name, seconds), flush=True)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print()
+    print(format_report(rows))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'params': vars(args), 'results': rows, 'padding_waste': padding,
+                       'imports': imports},
+                      f, indent=2)
+    if imports is not None and args.max_import_ms is not None:
+        slow = [row for row in imports if row['milliseconds'] > args.max_import_ms]
+        for row in slow:
+            print('import regression: %s took %.1f ms, more than %g ms' % (
+                row['name'], row['milliseconds'], args.max_import_ms))
+        if slow:
+            sys.exit(1)
@@ -0,0 +1,48 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Convert an embedding file into an embedding store that can be memory-mapped."""
+import argparse
+import logging
+
+from embedding_based import load_embeddings
+from embedding_based import save_embedding_store
+from embedding_based.loaders import EMBEDDING_FORMATS
+
+logging.basicConfig(level=logging.INFO)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('input', help='embeddings file: word2vec binary or text, fastText .vec or GloVe, '
+                                      'optionally gzipped')
+    parser.add_argument('output', help='directory of the embedding store')
+    parser.add_argument('--format', choices=EMBEDDING_FORMATS,
+                        help='format of the input (default: detected from the file)')
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32',
+                        help='dtype of the stored vectors (default: float32)')
+    args = parser.parse_args()
+
+    logging.info("loading embeddings file...")
+    embeddings = load_embeddings(args.input, format=args.format)
+
+    logging.info("writing embedding store to %r...", args.output)
+    save_embedding_store(embeddings, args.output, dtype=args.dtype)
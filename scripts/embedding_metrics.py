@@ -20,58 +20,467 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import embedding_based as eb
-from embedding_based import load_word2vec_binary
-from embedding_based import load_corpus_from_file
-from agenda.metric_helper import write_score
-
 import argparse
+import collections
+import json
 import logging
+import importlib
+import sys
 from pathlib import Path
 
+# Everything below is imported lazily, so that --help and argument errors
+# return before numpy is loaded; see --profile-startup.
+import embedding_based as eb
+from embedding_based.timing import StageTimer
+
 logging.basicConfig(level=logging.INFO)
 
 
 class MetricWrapper:
 
-    def __init__(self, name, score_fn, corpus_score_fn):
+    def __init__(self, name, key):
         self.name = name
-        self.score_fn = score_fn
-        self.corpus_score_fn = corpus_score_fn
+        self.key = key
+
+    def params(self, embedding_file, dtype):
+        return {
+            'embedding': embedding_file,
+            'dtype': dtype,
+        }
+
+    def write(self, result, embedding_file, dtype, output_dir):
+        from agenda.metric_helper import write_score
 
-    def eval(self, hypo_corpus, ref_corpus, embeddings, embedding_file, output_dir):
-        scores = [self.score_fn(h, r, embeddings) for h, r in zip(hypo_corpus, ref_corpus)]
         write_score(
             name=self.name,
-            scores=scores,
-            system=self.corpus_score_fn(hypo_corpus, ref_corpus, embeddings).mean,
+            scores=result.sentence_scores.tolist(),
+            system=result.corpus_score.mean,
             output=Path(output_dir).joinpath(self.name).with_suffix('.json'),
-            params={
-                'embedding': embedding_file,
-            }
+            params=self.params(embedding_file, dtype),
         )
 
+    def write_streamed(self, running, scores_file, embedding_file, dtype, output_dir):
+        self.write_partial(running, output_dir, self.params(embedding_file, dtype),
+                           scores_file=str(scores_file))
+
+    def write_partial(self, running, output_dir, params, **extra):
+        # 'partial' is what merging the scores of shards needs, see merge_shards().
+        corpus_score = running.corpus_score()
+        output = Path(output_dir).joinpath(self.name).with_suffix('.json')
+        with output.open('w') as f:
+            json.dump(dict({
+                'name': self.name,
+                'system': corpus_score.mean,
+                'confidence_interval': corpus_score.confidence_interval,
+                'standard_deviation': corpus_score.standard_deviation,
+                'partial': running.state(),
+                'params': params,
+            }, **extra), f, indent=2)
+
+    def scores_file(self, output_dir):
+        return Path(output_dir).joinpath(self.name).with_suffix('.scores.txt')
+
+    # Maps our output names to the metric names of eb.evaluate_all().
     known_metrics = {
-        'vector_average': (eb.average_sentence_level, eb.average_corpus_level),
-        'vector_extrema': (eb.extrema_sentence_level, eb.extrema_corpus_level),
-        'greedy_matching': (eb.greedy_match_sentence_level, eb.greedy_match_corpus_level)
+        'vector_average': 'average',
+        'vector_extrema': 'extrema',
+        'greedy_matching': 'greedy_match',
     }
 
     @classmethod
     def factory(cls, name):
-        args = cls.known_metrics[name]
-        return cls(name, *args)
+        return cls(name, cls.known_metrics[name])
+
+
+def merge_shards(paths, output_dir):
+    """Merge the score files of shards written with --stream or --incremental, metric by metric."""
+    shards = collections.OrderedDict()
+    for path in paths:
+        with open(path) as f:
+            try:
+                data = json.load(f)
+            except ValueError:
+                raise ValueError('%s is not a score file' % path)
+        if 'partial' not in data:
+            raise ValueError('%s has no partial statistics, score the shards with --stream or '
+                             '--incremental' % path)
+        shards.setdefault(data['name'], []).append((path, data))
+
+    for name, parts in shards.items():
+        params = parts[0][1]['params']
+        for path, data in parts:
+            if data['params'] != params:
+                raise ValueError('%s was scored with other parameters than %s' % (path, parts[0][0]))
+        running = eb.RunningScore()
+        for _, data in parts:
+            running.merge(eb.RunningScore.from_state(data['partial']))
+        # Merged files can be merged again, keeping their shards.
+        shard_paths = [shard for path, data in parts for shard in data.get('shards', [str(path)])]
+        MetricWrapper.factory(name).write_partial(
+            running, output_dir, params,
+            shards=shard_paths,
+            scores_files=[scores_file for _, data in parts
+                          for scores_file in data.get('scores_files', [data.get('scores_file')])
+                          if scores_file],
+        )
+        logging.info("%s: %d shards, %d pairs, %d skipped, mean %.4f",
+                     name, len(shard_paths), running.count, running.skipped, running.corpus_score().mean)
+
+
+def merge_main(argv):
+    parser = argparse.ArgumentParser(
+        prog='embedding_metrics.py merge',
+        description='Merge the corpus-level scores of shards of a corpus scored with --stream or '
+                    '--incremental into those of the whole corpus. The sentence-level score files '
+                    'of the shards are listed in the order given, not copied.')
+    parser.add_argument('shards', nargs='+', metavar='JSON',
+                        help='score files of the shards, such as shard1/vector_average.json')
+    parser.add_argument('-p', '--prefix', required=True,
+                        help='directory to write the merged score files to')
+    args = parser.parse_args(argv)
+    try:
+        merge_shards(args.shards, args.prefix)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def log_vocabulary_matches(vocabulary, embeddings):
+    matched = sum(word in embeddings for word in vocabulary)
+    logging.info("%d distinct tokens: %d matched, %d OOV",
+                 len(vocabulary), matched, len(vocabulary) - matched)
+
+
+def open_score_cache(args):
+    if not args.score_cache:
+        return None
+    from embedding_based.score_cache import ScoreCache
+
+    return ScoreCache(
+        args.score_cache,
+        eb.embedding_file_fingerprint(args.embeddings, args.storage_dtype),
+        max_entries=args.score_cache_size,
+    )
+
+
+def log_score_cache(score_cache):
+    if score_cache is not None:
+        stats = score_cache.stats()
+        logging.info("score cache: %d hits, %d misses (hit rate %.1f%%)",
+                     stats['hits'], stats['misses'], 100 * stats['hit_rate'])
+        score_cache.close()
+
+
+def make_memo(args):
+    if not args.sentence_memo:
+        return None
+    return eb.SentenceMemo(args.sentence_memo)
+
+
+def log_memo(memo):
+    if memo is not None:
+        stats = memo.stats()
+        logging.info("sentence memo: %d hits, %d misses (hit rate %.1f%%), %d sentences kept",
+                     stats['hits'], stats['misses'], 100 * stats['hit_rate'], stats['size'])
+
+
+def memory_budget(args):
+    if args.memory_budget is None:
+        return None
+    return int(args.memory_budget * 2 ** 20)
+
+
+def log_padding_waste(args, predicted, reference, embeddings):
+    if args.memory_budget is None:
+        return
+    from embedding_based.batch import _DEFAULT_BATCH_SIZE
+    from embedding_based.schedule import contiguous_blocks, padding_waste, schedule_pairs
+
+    hyp_lengths = [len(sentence) for sentence in predicted]
+    ref_lengths = [len(sentence) for sentence in reference]
+    schedule = schedule_pairs(hyp_lengths, ref_lengths, memory_budget(args), embeddings.vector_size,
+                              4 if args.dtype == 'float32' else 8)
+    logging.info("greedy matching padding waste: %.1f%% in %d length buckets, %.1f%% in corpus order",
+                 100 * schedule.padding_waste, len(schedule.blocks),
+                 100 * padding_waste(hyp_lengths, ref_lengths, contiguous_blocks(len(predicted), _DEFAULT_BATCH_SIZE)))
+
+
+def load_embeddings_file(args, vocabulary, timer):
+    logging.info("loading embeddings file...")
+    with timer.stage('load embeddings'):
+        embeddings = eb.load_embeddings(args.embeddings, vocabulary=vocabulary, dtype=args.storage_dtype,
+                                        format=args.embedding_format)
+    if vocabulary is not None:
+        log_vocabulary_matches(vocabulary, embeddings)
+    return embeddings
+
+
+def run_in_memory(args, metrics, timer):
+    with timer.stage('load corpora'):
+        logging.info("loading predicted file...")
+        predicted = eb.load_corpus_from_file(args.predicted)
+
+        logging.info("loading ground_truth file...")
+        reference = eb.load_corpus_from_file(args.ground_truth)
+
+        vocabulary = None
+        if args.restrict_vocab:
+            vocabulary = eb.corpus_vocabulary(predicted, reference)
+
+    embeddings = load_embeddings_file(args, vocabulary, timer)
+
+    log_padding_waste(args, predicted, reference, embeddings)
+    keys = [metric.key for metric in metrics]
+    if args.reference_cache:
+        logging.info("loading reference cache...")
+        with timer.stage('load reference cache'):
+            reference = eb.load_reference_cache(
+                args.ground_truth, args.embeddings, embeddings, args.reference_cache, keys,
+                dtype=args.dtype)
+
+    score_cache = open_score_cache(args)
+    memo = make_memo(args)
+    results = eb.evaluate_all(
+        hypothesis_corpus=predicted,
+        reference_corpus=reference,
+        embeddings=embeddings,
+        metrics=keys,
+        n_jobs=args.jobs,
+        dtype=args.dtype,
+        score_cache=score_cache,
+        memo=memo,
+        memory_budget=memory_budget(args),
+        timer=timer,
+    )
+    log_score_cache(score_cache)
+    log_memo(memo)
+    with timer.stage('write'):
+        for metric in metrics:
+            metric.write(
+                result=results[metric.key],
+                embedding_file=args.embeddings,
+                dtype=args.dtype,
+                output_dir=args.prefix,
+            )
+
+
+def run_streaming(args, metrics, timer):
+    vocabulary = None
+    if args.restrict_vocab:
+        logging.info("scanning predicted and ground_truth files...")
+        with timer.stage('load corpora'):
+            vocabulary = set()
+            for chunk in eb.iter_corpus_chunks(args.predicted, args.ground_truth, args.chunk_size):
+                vocabulary.update(eb.corpus_vocabulary(*chunk))
+
+    embeddings = load_embeddings_file(args, vocabulary, timer)
+
+    logging.info("streaming predicted and ground_truth files...")
+    score_cache = open_score_cache(args)
+    memo = make_memo(args)
+    results = eb.evaluate_files(
+        hypothesis_file=args.predicted,
+        reference_file=args.ground_truth,
+        embeddings=embeddings,
+        metrics=[metric.key for metric in metrics],
+        chunk_size=args.chunk_size,
+        score_files={metric.key: metric.scores_file(args.prefix) for metric in metrics},
+        n_jobs=args.jobs,
+        dtype=args.dtype,
+        score_cache=score_cache,
+        memo=memo,
+        memory_budget=memory_budget(args),
+        timer=timer,
+        partial=True,
+    )
+    log_score_cache(score_cache)
+    log_memo(memo)
+    with timer.stage('write'):
+        for metric in metrics:
+            metric.write_streamed(
+                running=results[metric.key],
+                scores_file=metric.scores_file(args.prefix),
+                embedding_file=args.embeddings,
+                dtype=args.dtype,
+                output_dir=args.prefix,
+            )
+
+
+def run_incremental(args, metrics, timer):
+    from embedding_based.incremental import evaluate_appended, iter_appended_chunks, read_checkpoint
+
+    checkpoint = read_checkpoint(args.incremental)
+    vocabulary = None
+    if args.restrict_vocab:
+        logging.info("scanning the lines appended to predicted and ground_truth files...")
+        with timer.stage('load corpora'):
+            vocabulary = set()
+            for hypothesis_chunk, reference_chunk, _ in iter_appended_chunks(
+                    args.predicted, args.ground_truth, checkpoint['offsets'] if checkpoint else (0, 0),
+                    args.chunk_size):
+                vocabulary.update(eb.corpus_vocabulary(hypothesis_chunk, reference_chunk))
+
+    embeddings = load_embeddings_file(args, vocabulary, timer)
+
+    logging.info("scoring the lines appended since %s...",
+                 'the checkpoint' if checkpoint else 'the start')
+    score_cache = open_score_cache(args)
+    memo = make_memo(args)
+    results = evaluate_appended(
+        hypothesis_file=args.predicted,
+        reference_file=args.ground_truth,
+        embeddings=embeddings,
+        checkpoint=args.incremental,
+        metrics=[metric.key for metric in metrics],
+        chunk_size=args.chunk_size,
+        score_files={metric.key: metric.scores_file(args.prefix) for metric in metrics},
+        fingerprint=eb.embedding_file_fingerprint(args.embeddings, args.storage_dtype),
+        n_jobs=args.jobs,
+        dtype=args.dtype,
+        score_cache=score_cache,
+        memo=memo,
+        memory_budget=memory_budget(args),
+        timer=timer,
+        partial=True,
+    )
+    log_score_cache(score_cache)
+    log_memo(memo)
+    logging.info("%d pairs scored in all", read_checkpoint(args.incremental)['pairs'])
+    with timer.stage('write'):
+        for metric in metrics:
+            metric.write_streamed(
+                running=results[metric.key],
+                scores_file=metric.scores_file(args.prefix),
+                embedding_file=args.embeddings,
+                dtype=args.dtype,
+                output_dir=args.prefix,
+            )
+
+
+def parse_system(value):
+    name, sep, path = value.partition('=')
+    if not sep or not name or not path:
+        raise argparse.ArgumentTypeError('expect NAME=FILE, got %r' % value)
+    return name, path
+
+
+def run_comparison(args, metrics, timer):
+    systems = collections.OrderedDict(args.system)
+
+    vocabulary = None
+    if args.restrict_vocab:
+        logging.info("scanning ground_truth and system files...")
+        with timer.stage('load corpora'):
+            vocabulary = eb.corpus_vocabulary(*(
+                eb.load_corpus_from_file(path) for path in [args.ground_truth] + list(systems.values())))
+
+    embeddings = load_embeddings_file(args, vocabulary, timer)
+
+    logging.info("scoring %d systems...", len(systems))
+    memo = make_memo(args)
+    options = dict(
+        reference_file=args.ground_truth,
+        hypothesis_files=systems,
+        embeddings=embeddings,
+        metrics=[metric.key for metric in metrics],
+        n_jobs=args.jobs,
+        dtype=args.dtype,
+        memo=memo,
+        memory_budget=memory_budget(args),
+        timer=timer,
+    )
+    if args.bootstrap:
+        from embedding_based.bootstrap import bootstrap_systems, format_bootstrap
+
+        system_scores = eb.score_systems(**options)
+        logging.info("bootstrapping with %d resamples against %s...", args.bootstrap, next(iter(systems)))
+        with timer.stage('bootstrap'):
+            table = format_bootstrap(bootstrap_systems(system_scores, resamples=args.bootstrap))
+    else:
+        table = eb.format_comparison(eb.compare_systems(**options))
+    log_memo(memo)
+    print(table)
+    if args.prefix:
+        with timer.stage('write'):
+            Path(args.prefix).joinpath('comparison.txt').write_text(table + '\n')
+
+
+# Modules whose presence in sys.modules --profile-startup reports.
+HEAVY_MODULES = ['numpy', 'gensim', 'scipy', 'sqlite3', 'multiprocessing', 'gzip', 'agenda']
+
+
+def log_startup_profile(timer):
+    logging.info("stage timings (interpreter start-up excluded, see python -X importtime):\n%s",
+                 timer.format())
+    logging.info("modules loaded: %s",
+                 ', '.join(name for name in HEAVY_MODULES if name in sys.modules) or 'none')
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
+    if sys.argv[1:2] == ['merge']:
+        merge_main(sys.argv[2:])
+        sys.exit()
+
+    parser = argparse.ArgumentParser(
+        epilog='To merge the scores of shards, see: embedding_metrics.py merge --help')
     parser.add_argument('-predicted', help="predicted text file, one example per line")
     parser.add_argument('-ground_truth', help="ground truth text file, one example per line")
-    parser.add_argument('-e', '-embeddings', dest='embeddings', help="embeddings bin file")
+    parser.add_argument('-e', '-embeddings', dest='embeddings',
+                        help="embeddings file (word2vec binary or text, fastText .vec or GloVe, "
+                             "optionally gzipped) or embedding store directory")
+    parser.add_argument('--embedding-format', choices=['word2vec_binary', 'word2vec_text', 'glove_text'],
+                        help='format of the embeddings file (default: detected from the file)')
     parser.add_argument('-p', '--prefix')
     parser.add_argument('-A', action='store_true', help='compute embedding average')
     parser.add_argument('-X', action='store_true', help='compute vector extrema')
     parser.add_argument('-G', action='store_true', help='compute greedy matching')
+    parser.add_argument('--restrict-vocab', action='store_true',
+                        help='only load the embeddings of words appearing in the corpora')
+    parser.add_argument('--stream', action='store_true',
+                        help='stream the corpora in chunks and write sentence-level scores '
+                             'to text files instead of holding them in memory')
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help='number of lines per chunk in --stream mode (default: 10000)')
+    parser.add_argument('--incremental', metavar='CHECKPOINT',
+                        help='only score the lines appended to predicted and ground_truth since '
+                             'the last run with this checkpoint file, and merge them into its '
+                             'corpus-level scores; sentence-level scores are appended to text '
+                             'files as in --stream mode')
+    parser.add_argument('--reference-cache', metavar='DIR',
+                        help='directory to keep the sentence vectors of ground_truth in, '
+                             'so that later runs against the same file reuse them')
+    parser.add_argument('--system', action='append', type=parse_system, metavar='NAME=FILE',
+                        help='compare several systems against ground_truth (repeatable); '
+                             'replaces -predicted')
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help='with --system, report 95%% bootstrap intervals from N resamples, '
+                             'and the paired bootstrap difference and p-value of each system '
+                             'against the first one (default: 0, off)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes, -1 for all CPUs (default: 1)')
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32',
+                        help='precision the metrics are computed in (default: float32)')
+    parser.add_argument('--storage-dtype', choices=['float32', 'float16'],
+                        help='precision the embeddings are kept in memory in; float16 halves '
+                             'the memory (default: float32, or that of an embedding store)')
+    parser.add_argument('--score-cache', metavar='FILE',
+                        help='SQLite file to keep sentence-level scores in, so that pairs '
+                             'scored by earlier runs are not scored again')
+    parser.add_argument('--score-cache-size', type=int, default=10000000,
+                        help='most scores kept in --score-cache, the least recently used '
+                             'are evicted (default: 10000000)')
+    parser.add_argument('--sentence-memo', type=int, default=0, metavar='N',
+                        help='keep the vectors of up to N recent sentences in memory, so that '
+                             'repeated sentences are computed once (default: 0, off)')
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help='group sentence pairs of similar lengths into blocks of at most MB '
+                             'megabytes of working memory, instead of blocks in corpus order')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='log the time spent importing, loading the corpora and embeddings, '
+                             'scoring and writing, and which heavy modules were loaded')
+    parser.add_argument('--profile', action='store_true',
+                        help='write the time spent in each stage, the numbers of pairs, tokens, '
+                             'OOV tokens and skipped pairs, and the throughput to profile.json '
+                             'in the prefix directory')
     args = parser.parse_args()
 
     metrics = []
@@ -84,21 +493,30 @@ if __name__ == "__main__":
 
     if not metrics:
         parser.error('no metrics specified!')
+    if args.score_cache and (args.system or args.reference_cache):
+        parser.error('--score-cache cannot be used with --system or --reference-cache')
 
-    logging.info("loading embeddings file...")
-    embeddings = load_word2vec_binary(args.embeddings)
-
-    logging.info("loading predicted file...")
-    predicted = load_corpus_from_file(args.predicted)
+    if args.bootstrap and not args.system:
+        parser.error('--bootstrap needs --system')
+    if args.incremental and (args.system or args.reference_cache):
+        parser.error('--incremental cannot be used with --system or --reference-cache')
+    if args.stream and args.reference_cache:
+        parser.error('--stream cannot be used with --reference-cache')
+    if args.profile and not args.prefix:
+        parser.error('--profile needs --prefix')
 
-    logging.info("loading ground_truth file...")
-    reference = load_corpus_from_file(args.ground_truth)
-
-    for metric in metrics:
-        metric.eval(
-            hypo_corpus=predicted,
-            ref_corpus=reference,
-            embeddings=embeddings,
-            embedding_file=args.embeddings,
-            output_dir=args.prefix,
-        )
+    timer = StageTimer()
+    with timer.stage('import'):
+        importlib.import_module('embedding_based.utils')
+    if args.system:
+        run_comparison(args, metrics, timer)
+    elif args.incremental:
+        run_incremental(args, metrics, timer)
+    elif args.stream:
+        run_streaming(args, metrics, timer)
+    else:
+        run_in_memory(args, metrics, timer)
+    if args.profile_startup:
+        log_startup_profile(timer)
+    if args.profile:
+        timer.write_report(Path(args.prefix).joinpath('profile.json'))
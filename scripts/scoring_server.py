@@ -0,0 +1,72 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Serve the embedding-based metrics over HTTP on localhost, with the embeddings loaded once."""
+import argparse
+import logging
+
+from embedding_based import load_embeddings
+from embedding_based.server import make_server
+
+logging.basicConfig(level=logging.INFO)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-e', '-embeddings', dest='embeddings', required=True,
+                        help="embeddings file (word2vec binary or text, fastText .vec or GloVe, "
+                             "optionally gzipped) or embedding store directory")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to bind to; there is no authentication, so keep it local '
+                             '(default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8750, help='port to bind to (default: 8750)')
+    parser.add_argument('--max-batch-size', type=int, default=1024,
+                        help='most sentence pairs scored in one batch (default: 1024)')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help='milliseconds to wait for a batch to fill up (default: 2)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes, -1 for all CPUs (default: 1)')
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32',
+                        help='precision the metrics are computed in (default: float32)')
+    parser.add_argument('--storage-dtype', choices=['float32', 'float16'],
+                        help='precision the embeddings are kept in memory in (default: float32, '
+                             'or that of an embedding store)')
+    args = parser.parse_args()
+
+    logging.info("loading embeddings file...")
+    embeddings = load_embeddings(args.embeddings, dtype=args.storage_dtype)
+
+    server = make_server(
+        embeddings,
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        dtype=args.dtype,
+        n_jobs=args.jobs,
+    )
+    logging.info("serving on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -37,7 +37,7 @@ setup(
         'computational linguistics',
         'machine translation',
     ],
-    scripts=['scripts/embedding_metrics.py', ],
+    scripts=['scripts/embedding_metrics.py', 'scripts/convert_embeddings.py', 'scripts/scoring_server.py', ],
     packages=[
         'embedding_based',
         'embedding_based.tests',
@@ -53,5 +53,7 @@ setup(
     ],
     license='LICENCE.txt',
     long_description=open('README.md').read(),
-    install_requires=['gensim', 'numpy'],
+    python_requires='>=3.7',
+    install_requires=['numpy'],
+    extras_require={'gensim': ['gensim']},
 )